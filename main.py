@@ -1,22 +1,31 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import date, datetime, time, timedelta
 import importlib
 
 # --- IMPORTS FROM UNIVERSAL PARSER ---
 import src.parser as p_module
-from src.parser import extract_data_from_pdf, extract_payroll_data, get_unique_codes, get_vacation_periods
+from src.parser import extract_data_from_pdf, extract_payroll_data, get_unique_codes, get_vacation_periods, assign_vacation_periods
 import src.exporter as e_module
 from src.exporter import generate_excel
 import src.calculator as c_module
 from src.calculator import calculate_nocturnal_hours
+from src.incremental import IncrementalCalculation
+from src.holiday_dataset import load_holiday_dataset, merge_holidays
+from src.rules import DEFAULT_RULES
+from src.money import to_cents, to_euros
+from src.session_store import get_calculation_cache, get_frame_store
+from src.pdf_backend import DEFAULT_BACKEND, PDF_BACKENDS
+from src.diagnostics import ExtractionRecorder
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # FORCING RELOAD (Critical for Dev)
 importlib.reload(p_module)
 importlib.reload(e_module)
 importlib.reload(c_module)
 # Re-import functions after reload
-from src.parser import extract_data_from_pdf, extract_payroll_data, get_unique_codes, get_vacation_periods
+from src.parser import extract_data_from_pdf, extract_payroll_data, get_unique_codes, get_vacation_periods, assign_vacation_periods
 from src.exporter import generate_excel
 
 # --- CONFIGURACIÓN ---
@@ -185,23 +194,52 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- ESTADO DE SESIÓN ---
+# El cuadrante no se guarda en la sesión: solo su clave en el almacén compartido
+# (igual el cálculo del dashboard, en la caché de cálculos)
+frame_store = get_frame_store()
+calc_cache = get_calculation_cache()
+ctx = get_script_run_ctx()
+session_id = ctx.session_id if ctx else "local"
+
 if 'step' not in st.session_state: st.session_state.step = 1
-if 'df_raw' not in st.session_state: st.session_state.df_raw = pd.DataFrame()
+if 'df_key' not in st.session_state: st.session_state.df_key = None
 if 'detected_shifts' not in st.session_state: st.session_state.detected_shifts = {}
 if 'detected_holidays' not in st.session_state: st.session_state.detected_holidays = [] # Nueva variable de estado
+if 'roster_holidays' not in st.session_state: st.session_state.roster_holidays = [] # Festivos leídos del cuadrante (sin calendario oficial)
 
 # Variables para inputs auto-rellenados
 if 'auto_worker_name' not in st.session_state: st.session_state.auto_worker_name = ""
 if 'auto_company_name' not in st.session_state: st.session_state.auto_company_name = ""
 if 'payroll_data' not in st.session_state: st.session_state.payroll_data = {}
 
+def set_roster(df):
+    # También un cuadrante sin filas: la clave distingue "vacío" de "caducado"
+    st.session_state.df_key = frame_store.put(df, session_id)
+
+def get_roster():
+    # Copia superficial (copy-on-write) del cuadrante compartido
+    df = frame_store.get(st.session_state.df_key)
+    return df if df is not None else pd.DataFrame()
+
 def reset_app():
     st.session_state.step = 1
-    st.session_state.df_raw = pd.DataFrame()
+    st.session_state.df_key = None
+    frame_store.release(session_id)
+    calc_cache.release(session_id)
     st.session_state.detected_shifts = {}
     st.session_state.detected_holidays = []
+    st.session_state.roster_holidays = []
     st.rerun()
 
+# Actividad de esta sesión y limpieza de las inactivas
+frame_store.touch(session_id, st.session_state.df_key)
+for idle_id in frame_store.evict_idle(): calc_cache.release(idle_id)
+# Caducada = la sesión tiene clave pero el almacén ya no guarda su cuadrante
+if st.session_state.step > 1 and st.session_state.df_key and frame_store.get(st.session_state.df_key) is None:
+    st.session_state.step = 1
+    st.session_state.df_key = None
+    st.warning("La sesión ha caducado por inactividad. Vuelva a cargar el cuadrante.")
+
 # ==========================================
 # SIDEBAR (PASO 1 + CONFIGURACIÓN)
 # ==========================================
@@ -218,6 +256,8 @@ with st.sidebar:
     if 'auto_year' not in st.session_state: st.session_state.auto_year = 2025
     
     uploaded_file = st.file_uploader("Cuadrante (PDF)", type=['pdf'])
+    pdf_backend = st.selectbox("Motor de lectura PDF", list(PDF_BACKENDS), index=list(PDF_BACKENDS).index(DEFAULT_BACKEND),
+                               help="pdfium es bastante más rápido; pdfplumber es el motor de referencia.")
     
     # Input de Año vinculado a session_state
     year = st.number_input("Año Fiscal", min_value=2020, max_value=2030, value=st.session_state.auto_year, key="input_year")
@@ -230,7 +270,7 @@ with st.sidebar:
                 try:
                     # Importamos la nueva función
                     from src.parser import analyze_annual_payroll
-                    p_data = analyze_annual_payroll(uploaded_payrolls)
+                    p_data = analyze_annual_payroll(uploaded_payrolls, pdf_backend)
                     
                     if p_data:
                         st.session_state.payroll_data = p_data
@@ -255,6 +295,16 @@ with st.sidebar:
         st.markdown("---")
         st.header("🎉 Días Festivos Detectados")
         
+        # Calendario oficial (dataset offline): se une a los festivos del cuadrante
+        holiday_dataset = load_holiday_dataset()
+        comunidad = st.selectbox("Calendario Oficial (Comunidad)", ["(Solo cuadrante)"] + holiday_dataset.communities(), key="holiday_comunidad")
+        if comunidad == "(Solo cuadrante)":
+            st.session_state.detected_holidays = list(st.session_state.roster_holidays)
+        else:
+            municipio = st.selectbox("Municipio", ["(Ninguno)"] + holiday_dataset.municipalities(comunidad), key="holiday_municipio")
+            if municipio == "(Ninguno)": municipio = None
+            st.session_state.detected_holidays = merge_holidays(st.session_state.roster_holidays, year, comunidad, municipio)
+        
         current_holidays = sorted(list(set(st.session_state.detected_holidays)))
         
         if not current_holidays:
@@ -294,11 +344,12 @@ with st.sidebar:
         plus_agreement = st.number_input("Plus Convenio (€)", value=float(p_data.get('plus_convenio', 0.0)), step=10.0)
         
         # B. Precio Hora Ordinaria
-        # Fórmula Usuario: (Base + Antigüedad + Plus) / 160
+        # Fórmula Usuario (reglas del convenio): (Base + Antigüedad + Plus) / 160
         total_fijo_mes = base_salary + seniority + plus_agreement
-        hourly_rate = total_fijo_mes / 160.0
+        rate_rule = DEFAULT_RULES.hourly_rates['dashboard']
+        hourly_rate = DEFAULT_RULES.hourly_rate({'base_salary': base_salary, 'seniority': seniority, 'plus_agreement': plus_agreement}, 'dashboard')
         
-        st.info(f"ℹ️ Precio Hora Calc: **{hourly_rate:.4f} €**\n(Base: {total_fijo_mes:.2f}€ / 160h)")
+        st.info(f"ℹ️ Precio Hora Calc: **{hourly_rate:.4f} €**\n(Base: {total_fijo_mes:.2f}€ / {rate_rule['divisor']}h)")
         
         # C. Conceptos Variables (Auditados -> SUM)
         st.markdown("---")
@@ -328,7 +379,7 @@ with st.sidebar:
         'base_salary': base_salary,
         'seniority': seniority,
         'plus_agreement': plus_agreement,
-        'annual_pay': 160,
+        'annual_pay': rate_rule['divisor'],
         'include_extra_pay': include_extra_pay,
         'val_extra_pay': diferencia_reclamar,
         'categoria': p_data.get('categoria', 'N/D'),
@@ -369,16 +420,23 @@ if uploaded_file and st.session_state.step == 1:
     if st.button("🚀 Analizar Cuadrante Ahora", type="primary"):
         with st.spinner("Procesando estructura del PDF..."):
             try:
-                df, detected_shifts, detected_holidays = extract_data_from_pdf(uploaded_file, year)
+                # Registro mínimo (1 celda): solo interesan avisos y errores por página (p. ej. OCR)
+                recorder = ExtractionRecorder(capacity=1)
+                df, detected_shifts, detected_holidays = extract_data_from_pdf(uploaded_file, year, backend=pdf_backend, recorder=recorder)
                 codes = get_unique_codes(df)
+                st.session_state.extraction_notes = [
+                    f"Página {w['page'] + 1}: {w['warning']}" for w in recorder.warnings
+                ] + [f"Página {e['page'] + 1}: {e['error']}" if e['page'] is not None else e['error'] for e in recorder.errors]
                 
                 if df.empty:
                     st.error("No se detectaron turnos válidos.")
+                    for note in st.session_state.extraction_notes: st.warning(note)
                 else:
-                    st.session_state.df_raw = df
+                    set_roster(df)
                     st.session_state.unique_codes = codes
                     st.session_state.detected_shifts = detected_shifts
                     st.session_state.detected_holidays = detected_holidays # Persistencia de festivos
+                    st.session_state.roster_holidays = detected_holidays
                     st.session_state.step = 2
                     st.rerun()
             except Exception as e:
@@ -389,6 +447,7 @@ if uploaded_file and st.session_state.step == 1:
 # ==========================================
 elif st.session_state.step == 2:
     st.subheader("2. Validación de Códigos Detectados")
+    for note in st.session_state.get('extraction_notes', []): st.warning(note)
     
     # --- ÁREA: CÓDIGOS DESCONOCIDOS (EXPANDER AMARILLO) ---
     detected = st.session_state.detected_shifts
@@ -456,7 +515,7 @@ elif st.session_state.step == 2:
         valid_codes = [c for c in st.session_state.unique_codes if st.session_state.detected_shifts.get(c, {}).get('type') != 'DELETE']
         
         # Calcular periodos de vacaciones antes del bucle de configuración
-        _, all_vac_periods = get_vacation_periods(st.session_state.df_raw)
+        _, all_vac_periods = get_vacation_periods(get_roster())
         
         cols = st.columns(3)
         for i, code in enumerate(sorted(valid_codes)):
@@ -526,7 +585,9 @@ Si divides 1 entre 4, te da 0.25 (un cuarto).
         if st.form_submit_button("✅ Confirmar y Calcular Informe", type="primary"):
             st.session_state.mapping = local_mapping
             to_del = [c for c, inf in st.session_state.detected_shifts.items() if inf.get('type') == 'DELETE']
-            if to_del: st.session_state.df_raw = st.session_state.df_raw[~st.session_state.df_raw['Codigo'].isin(to_del)]
+            if to_del:
+                df_raw = get_roster()
+                set_roster(df_raw[~df_raw['Codigo'].isin(to_del)])
             st.session_state.step = 3
             st.rerun()
 
@@ -551,31 +612,64 @@ elif st.session_state.step == 3:
     st.markdown("## 📊 Dashboard de Resultados")
     
     # Procesamiento
-    df = st.session_state.df_raw.copy()
+    df = get_roster()
     mapping = st.session_state.mapping
     detected_info = st.session_state.detected_shifts
     
-    def calculate_rest_debt(dh):
-        if 7.5 <= dh <= 8.5: return 0.5
-        elif 11.5 <= dh <= 12.5: return 1.0
-        elif 23.5 <= dh <= 24.5: return 2.0
-        else: return round(dh * (1/12), 2)
-
-    df['Horas_Totales'] = df['Codigo'].apply(lambda x: mapping.get(x, {}).get('total', 0.0))
-    df['Horas_Nocturnas'] = df['Codigo'].apply(lambda x: mapping.get(x, {}).get('nocturnal', 0.0))
-    
-    df['Deuda_Descanso_Horas'] = 0.0
-    for idx, row in df.iterrows():
-        cod = row['Codigo']
-        h_total = row['Horas_Totales']
-        info = detected_info.get(cod, {})
-        es_absentismo = info.get('type') == 'Absentismo' or info.get('is_vacation')
-        if not es_absentismo and h_total > 0:
-            df.at[idx, 'Deuda_Descanso_Horas'] = calculate_rest_debt(h_total)
-
-    total_deuda_horas = df['Deuda_Descanso_Horas'].sum()
-    total_recl_euros = total_deuda_horas * prices['price_normal']
-    grand_total = total_recl_euros + prices['val_extra_pay']
+    def build_month_html(month_df):
+        # Formato: 📅 Día DD | ⏱️ HH:MM-HH:MM | ❌ Deuda: -X.XX h
+        # Estilo Neutro (NEGRO PURO) + ROJO SOLO EN LA DEUDA
+        # Usamos HTML directo para evitar que Streamlit "resetee" el color
+        month_df = month_df.sort_values('Dia') # Ordenar por día para consistencia
+        day_div = "<div style='color:#000000; font-size:1rem; margin-bottom:4px;'><strong>📅 Día {}</strong>"
+        parts = []
+        for fecha, cod, debt, start, end, vac_range_str in zip(
+            month_df['Fecha'], month_df['Codigo'], month_df['Deuda_Descanso_Horas'],
+            month_df['Hora_Inicio'], month_df['Hora_Fin'], month_df['Vac_Periodo']
+        ):
+            d_str = fecha.strftime("%d")
+            info = detected_info.get(cod, {})
+            # Recuperar horas (Prioridad: DataFrame > Info > "?")
+            if pd.isna(start) or not start: start = info.get('start_time') or info.get('start', '?')
+            if pd.isna(end) or not end: end = info.get('end_time') or info.get('end', '?')
+            
+            base_html = day_div.format(d_str) + f" | ⏱️ {start}-{end} ({cod})"
+            if debt > 0:
+                parts.append(f"{base_html} | <span style='color:#dc3545; font-weight:bold;'>❌ Deuda: -{debt:.2f} h</span></div>")
+            elif info.get('is_vacation'):
+                parts.append(day_div.format(d_str) + f" | V 🌴 <strong>{vac_range_str}</strong></div>")
+            else:
+                parts.append(f"{base_html} | <span style='color:#28a745; font-weight:bold;'>✅ Correcto</span></div>")
+        return "".join(parts)
+
+    # Cálculo incremental en la caché del proceso (la sesión solo guarda la clave):
+    # base = (cuadrante, festivos, precio hora); variante = mapeo y leyenda. Si solo
+    # cambia la variante se recalculan únicamente las filas de los códigos editados
+    calc_base = (st.session_state.df_key, tuple(sorted(map(str, st.session_state.detected_holidays))), prices['price_normal'])
+    calc_variant = (tuple(sorted((c, float(v.get('total', 0.0)), float(v.get('nocturnal', 0.0))) for c, v in mapping.items())),
+                    tuple(sorted((c, str(v.get('type') or ""), bool(v.get('is_vacation'))) for c, v in detected_info.items())))
+
+    def build_calc():
+        # Periodos de vacaciones y cruce por intervalos: periodo de cada fila (índice -1 -> "")
+        _, periods = get_vacation_periods(df)
+        vac_labels = np.array([f"{vs.strftime('%d/%m')}–{ve.strftime('%d/%m')}" for vs, ve in periods] + [""], dtype=object)
+        df['Vac_Periodo'] = vac_labels[assign_vacation_periods(df['Fecha'], periods)]
+
+        # Horas, deuda de descanso y agregación mensual única (compartida con el exportador)
+        return IncrementalCalculation(df, mapping, detected_info, st.session_state.detected_holidays, prices['price_normal'], rules=DEFAULT_RULES), periods
+
+    def update_calc(entry):
+        entry[0].update_mapping(mapping, detected_info)
+        return entry
+
+    calc, vac_periods = calc_cache.get_or_build(session_id, (calc_base, calc_variant), build_calc, update_calc)
+    df, cube = calc.frame, calc.cube
+    
+    # Totales en céntimos (el cubo usa price_normal como precio hora); euros solo al mostrar
+    total_deuda_horas = cube.grand_totals['Deuda_Descanso_Horas']
+    recl_cents = cube.units['Importe_Deuda']['grand']
+    total_recl_euros = float(to_euros(recl_cents))
+    grand_total = float(to_euros(recl_cents + to_cents(prices['val_extra_pay'])))
     
     # --- RESUMEN EJECUTIVO (3 COLUMNAS) ---
     col_sum1, col_sum2, col_sum3 = st.columns(3)
@@ -604,7 +698,6 @@ elif st.session_state.step == 3:
     st.markdown("---")
     
     # --- VISUALIZACIÓN VACACIONES ---
-    _, vac_periods = get_vacation_periods(df)
     if vac_periods:
         st.subheader("🏖️ Períodos de Vacaciones Detectados")
         cols_vac = st.columns(len(vac_periods) if len(vac_periods) <= 3 else 3)
@@ -623,10 +716,9 @@ elif st.session_state.step == 3:
     # --- VISUALIZACIÓN MENSUAL (GRID 2 COLUMNAS) ---
     st.subheader("📅 Desglose Mensual")
     
-    # Agrupar
-    df['Mes_Num'] = df['Fecha'].apply(lambda x: x.month)
-    monthly = df.groupby('Mes_Num')['Deuda_Descanso_Horas'].sum()
-    months = sorted(monthly.index.unique())
+    # Agrupar (precalculado en el cubo mensual)
+    monthly = cube.totals['Deuda_Descanso_Horas']
+    months = cube.months
     month_names = {1:"Enero", 2:"Febrero", 3:"Marzo", 4:"Abril", 5:"Mayo", 6:"Junio", 
                    7:"Julio", 8:"Agosto", 9:"Septiembre", 10:"Octubre", 11:"Noviembre", 12:"Diciembre"}
     
@@ -694,44 +786,11 @@ elif st.session_state.step == 3:
         # Label del Expander: "ENERO               -2.00 h"
         expander_label = f"**{m_name}**  —  {debt_md}"
         
-        with st.expander(expander_label, expanded=False):
-            # --- DETALLE DIARIO ---
-            month_df = df[df['Mes_Num'] == m_num]
-            # Ordenar por día para consistencia
-            month_df = month_df.sort_values('Dia')
-            
-            for _, row in month_df.iterrows():
-                d_str = row['Fecha'].strftime("%d")
-                cod = row['Codigo']
-                debt = row['Deuda_Descanso_Horas']
-                info = detected_info.get(cod, {})
-                # Recuperar horas (Prioridad: DataFrame > Info > "?")
-                start = row.get('Hora_Inicio')
-                if not start: start = info.get('start_time') or info.get('start', '?')
-                
-                end = row.get('Hora_Fin')
-                if not end: end = info.get('end_time') or info.get('end', '?')
-                
-                # Formato: 📅 Día DD | ⏱️ HH:MM-HH:MM | ❌ Deuda: -X.XX h
-                # Estilo Neutro (NEGRO PURO) + ROJO SOLO EN LA DEUDA
-                # Usamos HTML directo para evitar que Streamlit "resetee" el color
-                
-                # Base Style (Negro)
-                base_html = f"<div style='color:#000000; font-size:1rem; margin-bottom:4px;'><strong>📅 Día {d_str}</strong> | ⏱️ {start}-{end} ({cod})"
-                
-                if debt > 0:
-                    st.markdown(f"{base_html} | <span style='color:#dc3545; font-weight:bold;'>❌ Deuda: -{debt:.2f} h</span></div>", unsafe_allow_html=True)
-                elif info.get('is_vacation'):
-                    # Buscar el periodo exacto
-                    vac_range_str = ""
-                    for v_start, v_end in vac_periods:
-                        if v_start <= row['Fecha'] <= v_end:
-                            vac_range_str = f"{v_start.strftime('%d/%m')}–{v_end.strftime('%d/%m')}"
-                            break
-                    
-                    st.markdown(f"<div style='color:#000000; font-size:1rem; margin-bottom:4px;'><strong>📅 Día {d_str}</strong> | V 🌴 <strong>{vac_range_str}</strong></div>", unsafe_allow_html=True)
-                else:
-                    st.markdown(f"{base_html} | <span style='color:#28a745; font-weight:bold;'>✅ Correcto</span></div>", unsafe_allow_html=True)
+        # Carga perezosa: el detalle solo se construye y envía si el mes está abierto
+        month_exp = st.expander(expander_label, expanded=False, key=f"exp_mes_{m_num}", on_change="rerun")
+        if month_exp.open:
+            # --- DETALLE DIARIO (UN ÚNICO ELEMENTO HTML POR MES) ---
+            month_exp.markdown(build_month_html(cube.month_rows(m_num)), unsafe_allow_html=True)
 
     # --- EXPORTAR ---
     st.markdown("---")
@@ -750,7 +809,7 @@ elif st.session_state.step == 3:
         worker_name = p_data_final.get('worker', st.session_state.get('auto_worker_name', 'Trabajador'))
         company_name = p_data_final.get('company', st.session_state.get('auto_company_name', 'Empresa'))
         
-        excel_data = generate_excel(df, detected_info, prices, current_holidays, worker_name, company_name)
+        excel_data = generate_excel(df, detected_info, prices, current_holidays, worker_name, company_name, cube=cube)
         st.download_button(
             "📥 Descargar Informe Jurídico (Excel)",
             data=excel_data,
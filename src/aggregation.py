@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.calendar_index import get_calendar, to_day_numbers, DAY_TYPE_LABELS
+from src.money import CENTS, HUNDREDTHS, amount_cents, group_sum, to_fixed
+
+# Métricas que se agregan si existen en el DataFrame
+CUBE_METRICS = ['Horas_Totales', 'Horas_Nocturnas', 'Deuda_Descanso_Horas', 'Total_Euros']
+# Métricas en punto fijo (src.money): se agregan como enteros exactos y se
+# muestran divididas por su escala. Importe_Deuda (céntimos) se calcula por jornada.
+FIXED_METRICS = {'Deuda_Descanso_Horas': HUNDREDTHS, 'Total_Euros': CENTS, 'Importe_Deuda': CENTS}
+
+class MonthlyCube:
+    """
+    Agregación mensual construida UNA vez por cálculo y compartida por el
+    dashboard y el exportador:
+    - Filas ordenadas por (mes, fecha) con un único sort + offsets por mes.
+    - Totales por mes y por (mes, tipo de jornada) de horas, nocturnas, deuda y euros.
+    - Deuda y euros se suman en enteros (centésimas de hora y céntimos): `units`
+      guarda esas sumas exactas y totals / totals_by_type / grand_totals son su
+      conversión para mostrar. Importe_Deuda se redondea a céntimos en cada
+      jornada (como el detalle del informe) y todos sus totales son sumas de esos
+      céntimos, por lo que detalle, meses y total cuadran siempre.
+    """
+    def __init__(self, df: pd.DataFrame, holidays: Iterable[Any] = (), price_hour: Optional[float] = None):
+        self.price_hour = price_hour
+        if df.empty:
+            self.frame = df
+            self.months = np.zeros(0, dtype=np.int64)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.positions = np.zeros(0, dtype=np.int64)
+            self.day_types = np.zeros(0, dtype=np.int8)
+            self.totals = pd.DataFrame(columns=self.metrics)
+            self.totals_by_type = pd.DataFrame(columns=self.metrics)
+            self.grand_totals = pd.Series(0.0, index=self.metrics)
+            self.units = {m: {'month': np.zeros(0, dtype=np.int64), 'type': np.zeros(0, dtype=np.int64),
+                              'grand': np.int64(0)} for m in FIXED_METRICS}
+            return
+
+        days = to_day_numbers(df['Fecha'])
+        month_nums = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12 + 1
+
+        # Único sort (estable): mes y, dentro del mes, fecha
+        order = np.lexsort((days, month_nums))
+        self.frame = df.iloc[order].reset_index(drop=True)
+        # Posición en self.frame de cada fila del DataFrame original
+        self.positions = np.empty(len(order), dtype=np.int64)
+        self.positions[order] = np.arange(len(order))
+        sorted_months = month_nums[order]
+        self.months, starts = np.unique(sorted_months, return_index=True)
+        self.offsets = np.append(starts, len(order))
+        self.day_types = get_calendar(holidays).day_types(self.frame['Fecha'])
+
+        values = self._metric_values(self.frame)
+        month_idx = np.searchsorted(self.months, sorted_months)
+        flat = month_idx * len(DAY_TYPE_LABELS) + self.day_types
+        n_months = len(self.months)
+        n_cells = n_months * len(DAY_TYPE_LABELS)
+
+        self.units = {}
+        month_sums, cell_sums = {}, {}
+        for m, v in values.items():
+            if m in FIXED_METRICS:
+                self.units[m] = {'month': group_sum(month_idx, v, n_months), 'type': group_sum(flat, v, n_cells)}
+                self.units[m]['grand'] = self.units[m]['month'].sum()
+            else:
+                month_sums[m] = np.bincount(month_idx, weights=v, minlength=n_months)
+                cell_sums[m] = np.bincount(flat, weights=v, minlength=n_cells)
+
+        self.totals = pd.DataFrame(month_sums, index=pd.Index(self.months, name='Mes_Num'))
+        self.totals_by_type = pd.DataFrame(
+            cell_sums, index=pd.MultiIndex.from_product([self.months, DAY_TYPE_LABELS], names=['Mes_Num', 'Tipo_Jornada'])
+        )
+        # Totales generales de horas sobre el DataFrame original (mismo orden de suma que antes)
+        self.grand_totals = pd.Series({m: float(v.sum()) for m, v in self._metric_values(df).items() if m not in FIXED_METRICS}, dtype=float)
+        self._refresh(FIXED_METRICS)
+        self.totals = self.totals[self.metrics]
+        self.totals_by_type = self.totals_by_type[self.metrics]
+        self.grand_totals = self.grand_totals[self.metrics]
+
+    @property
+    def metrics(self) -> List[str]:
+        return CUBE_METRICS + ['Importe_Deuda']
+
+    def _metric_values(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        values = {}
+        for m in CUBE_METRICS:
+            v = df[m].to_numpy(dtype=float) if m in df.columns else np.zeros(len(df))
+            values[m] = to_fixed(v, FIXED_METRICS[m]) if m in FIXED_METRICS else v
+        values['Importe_Deuda'] = amount_cents(values['Deuda_Descanso_Horas'], self.price_hour or 0.0)
+        return values
+
+    def debt_amount_cents(self, price_hour: Optional[float] = None) -> int:
+        """
+        Importe total de la deuda en céntimos a price_hour (None = el del cubo):
+        suma de los importes por jornada ya redondeados, igual que el detalle.
+        """
+        if price_hour is None or price_hour == self.price_hour: return int(self.units['Importe_Deuda']['grand'])
+        if 'Deuda_Descanso_Horas' not in self.frame.columns: return 0
+        # Pocos valores de deuda distintos: un importe por valor x número de jornadas
+        debt, counts = np.unique(to_fixed(self.frame['Deuda_Descanso_Horas'].to_numpy(dtype=float), HUNDREDTHS), return_counts=True)
+        return int(amount_cents(debt, price_hour) @ counts)
+
+    def _refresh(self, metrics: Iterable[str]) -> None:
+        # Vista para mostrar de las sumas en punto fijo
+        for m in metrics:
+            scale = FIXED_METRICS[m]
+            self.totals[m] = self.units[m]['month'] / scale
+            self.totals_by_type[m] = self.units[m]['type'] / scale
+            self.grand_totals[m] = float(self.units[m]['grand'] / scale)
+
+    def update_rows(self, positions: np.ndarray, new_values: Dict[str, np.ndarray]) -> None:
+        """
+        Sustituye métricas en filas concretas (posiciones en self.frame) y ajusta por
+        diferencia los totales por mes, por (mes, tipo de jornada) y generales.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) == 0: return
+        month_idx = np.searchsorted(self.offsets, positions, side='right') - 1
+        flat = month_idx * len(DAY_TYPE_LABELS) + self.day_types[positions]
+        n_months = len(self.months)
+        n_cells = n_months * len(DAY_TYPE_LABELS)
+
+        fixed = []
+        for m, new in new_values.items():
+            new = np.asarray(new, dtype=float)
+            if m not in self.frame.columns: self.frame[m] = 0.0
+            old = self.frame[m].to_numpy(dtype=float)[positions]
+            self.frame.iloc[positions, self.frame.columns.get_loc(m)] = new
+            if m in FIXED_METRICS:
+                new_u, old_u = to_fixed(new, FIXED_METRICS[m]), to_fixed(old, FIXED_METRICS[m])
+                deltas = {m: new_u - old_u}
+                if m == 'Deuda_Descanso_Horas':
+                    price = self.price_hour or 0.0
+                    deltas['Importe_Deuda'] = amount_cents(new_u, price) - amount_cents(old_u, price)
+                for f, delta in deltas.items():
+                    units = self.units[f]
+                    units['month'] += group_sum(month_idx, delta, n_months)
+                    units['type'] += group_sum(flat, delta, n_cells)
+                    units['grand'] = units['grand'] + delta.sum()
+                    fixed.append(f)
+            else:
+                delta = new - old
+                self.totals[m] = self.totals[m].to_numpy() + np.bincount(month_idx, weights=delta, minlength=n_months)
+                self.totals_by_type[m] = self.totals_by_type[m].to_numpy() + np.bincount(flat, weights=delta, minlength=n_cells)
+                self.grand_totals[m] += float(delta.sum())
+        self._refresh(fixed)
+
+    def month_rows(self, month: int) -> pd.DataFrame:
+        """Filas del mes (ordenadas por fecha) como slice posicional, sin re-filtrar."""
+        pos = np.searchsorted(self.months, month)
+        if pos >= len(self.months) or self.months[pos] != month: return self.frame.iloc[0:0]
+        return self.frame.iloc[self.offsets[pos]:self.offsets[pos + 1]]
+
+    def iter_months(self):
+        for pos, month in enumerate(self.months):
+            yield int(month), self.frame.iloc[self.offsets[pos]:self.offsets[pos + 1]]
+
+def build_monthly_cube(df: pd.DataFrame, holidays: Iterable[Any] = (), price_hour: Optional[float] = None) -> MonthlyCube:
+    return MonthlyCube(df, holidays, price_hour)
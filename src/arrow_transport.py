@@ -0,0 +1,158 @@
+import os
+import uuid
+import tempfile
+import pandas as pd
+from datetime import date
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.parser import WORKER_COLUMN, _source_name
+
+# --- TRANSPORTE DE RESULTADOS EN FORMATO ARROW (OPCIONAL) ---
+# Los trabajadores del pool escriben su cuadrante como fichero Arrow IPC en
+# memoria compartida (/dev/shm si existe) y devuelven solo la ruta. El agregador
+# los mapea en memoria (sin copiar ni deserializar), los concatena sin copia y
+# convierte a pandas una única vez antes del calculador. Usa 'pyarrow' (incluido
+# en requirements.txt); sin él, collect_rosters recibe los DataFrames con pickle.
+
+class ArrowHandle(NamedTuple):
+    path: str
+    rows: int
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow
+    except ImportError:
+        return False
+    return True
+
+def _require_arrow() -> Any:
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError as e:
+        raise ImportError("El transporte Arrow requiere 'pyarrow' (pip install pyarrow)") from e
+    return pa
+
+def transport_dir() -> str:
+    """Memoria compartida (/dev/shm) si está disponible; si no, el temporal del sistema."""
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK): return shm
+    return tempfile.gettempdir()
+
+def write_frame(df: pd.DataFrame, directory: Optional[str] = None) -> ArrowHandle:
+    """Escribe el DataFrame como fichero Arrow IPC (lado del trabajador)."""
+    pa = _require_arrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    path = os.path.join(directory or transport_dir(), f"cuadrante-{os.getpid()}-{uuid.uuid4().hex}.arrow")
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return ArrowHandle(path, table.num_rows)
+
+def read_table(handle: ArrowHandle, unlink: bool = True) -> Any:
+    """
+    Tabla Arrow mapeada en memoria (sin copia). Con unlink=True se borra el
+    fichero: en POSIX el mapeo sigue siendo válido hasta liberar la tabla.
+    """
+    pa = _require_arrow()
+    table = pa.ipc.open_file(pa.memory_map(handle.path)).read_all()
+    if unlink: discard(handle)
+    return table
+
+def discard(handle: Optional[ArrowHandle]) -> None:
+    if handle is None: return
+    try: os.unlink(handle.path)
+    except OSError: pass
+
+def concat_frames(handles: Sequence[Optional[ArrowHandle]], labels: Optional[Sequence[Any]] = None,
+                  label_column: str = WORKER_COLUMN) -> pd.DataFrame:
+    """
+    Concatena los resultados (concat_tables no copia los buffers) y convierte a
+    pandas una sola vez. labels: valor de label_column para cada resultado (no se
+    añade si la tabla ya tiene esa columna). None = resultado vacío.
+    """
+    pa = _require_arrow()
+    tables = []
+    try:
+        for i, handle in enumerate(handles):
+            if handle is None: continue
+            table = read_table(handle)
+            if labels is not None and label_column not in table.column_names:
+                table = table.append_column(label_column, pa.array([str(labels[i])] * table.num_rows, pa.string()))
+            tables.append(table)
+    finally:
+        for handle in handles: discard(handle)   # Los ya leídos se borraron: no hace nada
+    if not tables: return pd.DataFrame()
+    return pa.concat_tables(tables, promote_options="default").to_pandas()
+
+def collect_rosters(sources: Sequence[Any], year: Optional[int] = None, pool: Any = None,
+                    labels: Optional[Sequence[Any]] = None, **kwargs: Any) -> Tuple[pd.DataFrame, Dict[str, Dict[str, Any]], List[date]]:
+    """
+    Lee varios cuadrantes en el pool (src.worker_pool) con transporte Arrow y
+    devuelve (DataFrame único, leyendas por trabajador, festivos combinados), listo
+    para partition_by_worker + calculate_hours. Cada fila lleva en 'Trabajador' la
+    etiqueta de su documento (labels; por defecto, el nombre del documento).
+    Leyendas: { valor de 'Trabajador': leyenda de su documento }, porque dos
+    documentos pueden definir el mismo código con horas distintas. ValueError si un
+    mismo trabajador aparece en documentos con un código distinto (horas o vacaciones).
+    La leyenda y los festivos (pocos elementos) viajan serializados con pickle.
+    Sin pyarrow, los cuadrantes también (trabajos 'roster' + pd.concat).
+    """
+    if pool is None:
+        from src.worker_pool import get_worker_pool
+        pool = get_worker_pool()
+    if labels is None: labels = [_source_name(s) for s in sources]
+    if not arrow_available(): return _collect_pickled(sources, year, pool, labels, **kwargs)
+    futures = [pool.submit('roster_arrow', source, year, **kwargs) for source in sources]
+    results = []
+    try:
+        for f in futures: results.append(f.result())
+    except BaseException:
+        for handle, _, _ in results: discard(handle)
+        for f in futures[len(results):]:
+            try: discard(f.result()[0])
+            except Exception: pass
+        raise
+
+    holidays = set()
+    for _, _, doc_holidays in results: holidays.update(doc_holidays)
+    docs = [(handle.rows if handle is not None else 0, label, doc_info) for (handle, doc_info, _), label in zip(results, labels)]
+    frame = concat_frames([handle for handle, _, _ in results], labels)
+    return frame, legends_by_worker(frame, docs), sorted(holidays)
+
+def _collect_pickled(sources: Sequence[Any], year: Optional[int], pool: Any, labels: Sequence[Any],
+                     label_column: str = WORKER_COLUMN, **kwargs: Any) -> Tuple[pd.DataFrame, Dict[str, Dict[str, Any]], List[date]]:
+    # Alternativa sin pyarrow: mismo resultado que collect_rosters, con copia y deserialización
+    frames = []
+    docs = []
+    holidays = set()
+    for label, (df, doc_info, doc_holidays) in zip(labels, pool.map('roster', sources, year, **kwargs)):
+        holidays.update(doc_holidays)
+        docs.append((len(df), label, doc_info))
+        if not len(df): continue
+        if label_column not in df.columns: df = df.assign(**{label_column: str(label)})
+        frames.append(df)
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return frame, legends_by_worker(frame, docs, label_column), sorted(holidays)
+
+def legends_by_worker(frame: pd.DataFrame, docs: Sequence[Tuple[int, Any, Dict[str, Any]]],
+                      label_column: str = WORKER_COLUMN) -> Dict[str, Dict[str, Any]]:
+    """
+    Leyenda de cada valor de label_column. docs: (filas, etiqueta, leyenda) de cada
+    documento en el orden en que sus filas están en frame (un documento leído con
+    split_workers aporta su leyenda a todos sus trabajadores).
+    """
+    legends: Dict[str, Dict[str, Any]] = {}
+    start = 0
+    for rows, label, doc_info in docs:
+        if rows and label_column in frame.columns: workers = frame[label_column].iloc[start:start + rows].unique().tolist()
+        else: workers = [label]
+        start += rows
+        for worker in map(str, workers):
+            legend = legends.setdefault(worker, {})
+            for code, shift in doc_info.items():
+                prev = legend.get(code)
+                if prev is not None and (prev.get('hours'), prev.get('is_vacation')) != (shift.get('hours'), shift.get('is_vacation')):
+                    raise ValueError(f"El código {code} de '{worker}' tiene leyendas distintas en varios documentos: "
+                                     f"{prev.get('hours')} h / {shift.get('hours')} h")
+                legend[code] = shift
+    return legends
@@ -0,0 +1,211 @@
+import os
+import json
+import mmap
+import pickle
+import hashlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from src.parser import extract_data_from_pdf, analyze_annual_payroll
+from src.calculator import calculate_hours, calculate_rest_debt
+from src.exporter import generate_excel, _safe_filename
+from src.rules import DEFAULT_RULES
+from src.diagnostics import ExtractionRecorder
+
+# --- LOTES REANUDABLES CON DIARIO DE PUNTOS DE CONTROL ---
+# Cada trabajador pasa por tres etapas: cuadrante (extract_data_from_pdf), nóminas
+# (analyze_annual_payroll) e informe (cálculo + generate_excel). Al terminar una
+# etapa su resultado se guarda en disco y se añade una línea al diario
+# (journal.jsonl, solo se añade) con la clave de su entrada (hash del contenido y
+# los parámetros). Un lote relanzado tras un fallo salta las etapas ya completadas
+# y carga su resultado: solo se recalcula lo que quedó a medias.
+
+STAGES = ('roster', 'payroll', 'report')
+JOURNAL_FILENAME = "journal.jsonl"
+
+HASH_CHUNK = 1 << 20   # Lectura por bloques al calcular claves (no se carga el PDF entero)
+
+def _source_digest(source: Any) -> bytes:
+    # SHA-1 del contenido sin copiarlo entero en memoria: buffers directamente,
+    # rutas y ficheros por bloques de HASH_CHUNK
+    h = hashlib.sha1()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f: _hash_stream(h, f)
+    elif isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        h.update(source)
+    elif hasattr(source, 'getbuffer'):
+        with source.getbuffer() as view: h.update(view)
+    else:
+        if hasattr(source, 'seek'): source.seek(0)
+        _hash_stream(h, source)
+        if hasattr(source, 'seek'): source.seek(0)
+    return h.digest()
+
+def _hash_stream(h: Any, f: Any) -> None:
+    for chunk in iter(lambda: f.read(HASH_CHUNK), b""): h.update(chunk)
+
+def input_hash(sources: Iterable[Any] = (), **params: Any) -> str:
+    """Clave de una etapa: contenido de sus PDFs + parámetros (repr ordenado)."""
+    h = hashlib.sha1()
+    for source in sources:
+        h.update(_source_digest(source))
+    h.update(repr(sorted(params.items())).encode())
+    return h.hexdigest()
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    # Fichero temporal + rename: una etapa interrumpida nunca deja una salida a medias
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class BatchJournal:
+    """
+    Diario de unidades completadas: una línea JSON por (clave de entrada, etapa)
+    con la ruta de su salida. Se relee entero al abrir; una última línea
+    incompleta (proceso muerto al escribirla) se ignora.
+    """
+    def __init__(self, directory: Any):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / JOURNAL_FILENAME
+        self._done: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try: entry = json.loads(line)
+                    except ValueError: continue
+                    self._done[(entry['key'], entry['stage'])] = entry
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def output_path(self, key: str, stage: str, ext: str) -> Path:
+        return self.directory / "stages" / stage / f"{key}.{ext}"
+
+    def is_done(self, key: str, stage: str) -> bool:
+        entry = self._done.get((key, stage))
+        return entry is not None and (self.directory / entry['output']).exists()
+
+    def output_of(self, key: str, stage: str) -> Path:
+        return self.directory / self._done[(key, stage)]['output']
+
+    def record(self, key: str, stage: str, output: Path, **extra: Any) -> None:
+        entry = {'key': key, 'stage': stage, 'output': str(output.relative_to(self.directory)),
+                 'at': datetime.now().isoformat(timespec='seconds'), **extra}
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._done[(key, stage)] = entry
+
+    def run_stage(self, key: str, stage: str, ext: str, compute: Callable[[], Any],
+                  dump: Callable[[Any], bytes] = pickle.dumps, load: Callable[[bytes], Any] = pickle.loads,
+                  **extra: Any) -> Tuple[Any, bool]:
+        """Resultado de la etapa: del disco si ya estaba completada, si no se calcula y se registra. Retorna (resultado, reanudado)."""
+        if self.is_done(key, stage):
+            return load(self.output_of(key, stage).read_bytes()), True
+        result = compute()
+        path = self.output_path(key, stage, ext)
+        _atomic_write(path, dump(result))
+        self.record(key, stage, path, **extra)
+        return result, False
+
+# --- ENTRADAS POR DEFECTO (COMO EL DASHBOARD) ---
+
+def default_mapping(shift_info: Mapping[str, Dict]) -> Dict[str, Dict[str, float]]:
+    """Horas por código según la leyenda; vacaciones y códigos sin horas a 0."""
+    mapping = {}
+    for code, info in shift_info.items():
+        hours = float(info.get('hours', 0.0) or 0.0)
+        if info.get('is_vacation') or code == 'V' or hours == 0.0: mapping[code] = {'total': 0.0, 'nocturnal': 0.0}
+        else: mapping[code] = {'total': hours, 'nocturnal': 0.0}
+    return mapping
+
+def prices_from_payroll(p_data: Mapping[str, Any], include_extra_pay: Optional[bool] = None, rules=None) -> Dict[str, Any]:
+    """Diccionario de precios del informe a partir del resumen anual de nóminas."""
+    rules = rules or DEFAULT_RULES
+    fixed = {'base_salary': float(p_data.get('salario_base', 0.0)), 'seniority': float(p_data.get('antiguedad', 0.0)),
+             'plus_agreement': float(p_data.get('plus_convenio', 0.0))}
+    if include_extra_pay is None: include_extra_pay = not p_data.get('is_prorated', False)
+    extra = max(0.0, float(p_data.get('tercera_paga_teorica', 0.0)) - float(p_data.get('total_abonado_tercera', 0.0)))
+    return {
+        **fixed,
+        'price_normal': rules.hourly_rate(fixed, 'dashboard'),
+        'include_extra_pay': include_extra_pay,
+        'val_extra_pay': extra if include_extra_pay else 0.0,
+        'categoria': p_data.get('categoria', 'N/D'),
+    }
+
+# --- LOTE ---
+
+def _parse_roster(source: Any, year: Optional[int], backend: Any) -> Tuple[Any, Dict[str, Any], List[Any]]:
+    # El parser informa de un PDF ilegible devolviendo un resultado vacío: se usa el
+    # registro de diagnóstico para no dar por completada una etapa que ha fallado
+    recorder = ExtractionRecorder(capacity=1)
+    result = extract_data_from_pdf(source, year, recorder=recorder, backend=backend)
+    if recorder.errors: raise RuntimeError(recorder.errors[0]['error'])
+    return result
+
+def run_batch(items: List[Dict[str, Any]], directory: Any, year: Optional[int] = None, backend: Any = None,
+              shift_mapping: Optional[Mapping[str, Dict]] = None, include_extra_pay: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """
+    Procesa un lote de trabajadores de forma reanudable (ver BatchJournal).
+
+    items: dicts con 'worker' (nombre), 'roster' (cuadrante: ruta, bytes o fichero),
+           'payrolls' (lista de nóminas) y, opcionalmente, 'shift_mapping' y 'company'.
+    directory: carpeta del lote (diario, salidas de cada etapa e informes).
+    shift_mapping: mapeo de horas común; por defecto, el de la leyenda (default_mapping).
+    Un trabajador que falla no detiene el lote: su error queda en el resumen y, al
+    relanzar, se reanuda desde su primera etapa no completada.
+    Retorna un resumen por trabajador (mismo orden que items).
+    """
+    journal = BatchJournal(directory)
+    reports_dir = journal.directory / "informes"
+    summaries = []
+    for i, item in enumerate(items, 1):
+        worker = item.get('worker') or f"Trabajador {i}"
+        summary = {'worker': worker, 'status': 'ok', 'resumed': [], 'computed': [], 'report': None, 'error': None}
+        stage = STAGES[0]
+        try:
+            roster_key = input_hash([item['roster']], stage='roster', year=year, backend=str(backend))
+            (df, info, holidays), resumed = journal.run_stage(
+                roster_key, 'roster', 'pkl', lambda: _parse_roster(item['roster'], year, backend), worker=worker)
+            summary['resumed' if resumed else 'computed'].append('roster')
+
+            stage = 'payroll'
+            payrolls = list(item.get('payrolls') or [])
+            payroll_key = input_hash(payrolls, stage='payroll', backend=str(backend))
+            p_data, resumed = journal.run_stage(
+                payroll_key, 'payroll', 'pkl', lambda: analyze_annual_payroll(payrolls, backend) if payrolls else {}, worker=worker)
+            summary['resumed' if resumed else 'computed'].append('payroll')
+
+            stage = 'report'
+            mapping = item.get('shift_mapping') or shift_mapping or default_mapping(info)
+            prices = prices_from_payroll(p_data, include_extra_pay)
+            company = item.get('company') or p_data.get('company', "N/D")
+            report_key = input_hash(stage='report', roster=roster_key, payroll=payroll_key, worker=worker,
+                                    company=company, mapping=sorted(mapping.items()), prices=sorted(prices.items()))
+
+            def build_report() -> bytes:
+                calc = calculate_hours(df, mapping, prices, holidays)
+                if not calc.empty: calc['Deuda_Descanso_Horas'] = calculate_rest_debt(calc, info)
+                return generate_excel(calc, info, prices, holidays, worker, company).getvalue()
+
+            report, resumed = journal.run_stage(report_key, 'report', 'xlsx', build_report,
+                                                dump=lambda data: data, load=lambda data: data, worker=worker)
+            summary['resumed' if resumed else 'computed'].append('report')
+
+            # Copia con nombre legible (la salida de la etapa está en stages/report)
+            path = reports_dir / f"{i:04d}_{_safe_filename(worker)}.xlsx"
+            _atomic_write(path, report)
+            summary['report'] = str(path)
+        except Exception as e:
+            summary['status'] = f"error en {stage}"
+            summary['error'] = f"{type(e).__name__}: {e}"
+        summaries.append(summary)
+    return summaries
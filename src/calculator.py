@@ -1,7 +1,12 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
-def calculate_hours(df, user_mapping, prices, holidays):
+from src.calendar_index import get_calendar
+from src.rules import compile_rules
+from src.money import to_euros, to_hours, to_hundredths
+
+def calculate_hours(df, user_mapping, prices, holidays, rules=None):
     """
     Aplica el mapeo de horas y calcula importes económicos.
     
@@ -9,6 +14,7 @@ def calculate_hours(df, user_mapping, prices, holidays):
     user_mapping: Dict { 'Code': {'total': float, 'nocturnal': float} }
     prices: Dict con precios globales
     holidays: Lista de strings 'YYYY-MM-DD' o objetos date
+    rules: Reglas de convenio (dict o compiladas). None = convenio por defecto
     """
     if df.empty:
         return df
@@ -19,68 +25,26 @@ def calculate_hours(df, user_mapping, prices, holidays):
         print(f"Error: No se encuentra columna de código en {df.columns}")
         return df
 
-    # Convertir holidays a set de fechas para búsqueda rápida
-    holiday_set = set()
-    for h in holidays:
-        try:
-            holiday_set.add(pd.to_datetime(h).date())
-        except:
-            pass
-
-    # Preparar listas para nuevas columnas
-    total_horas = []
-    horas_nocturnas = []
-    tipos_jornada = []
-    total_euros = []
-
-    for _, row in df.iterrows():
-        code = row[col_codigo]
-        fecha = row['Fecha']
-        day_date = pd.to_datetime(fecha).date()
-        
-        # Obtener datos del turno (Default 0.0 si no existe)
-        shift_data = user_mapping.get(code, {'total': 0.0, 'nocturnal': 0.0})
-        h_total = float(shift_data.get('total', 0.0))
-        h_noct = float(shift_data.get('nocturnal', 0.0))
-        
-        # Determinar tipo de jornada y tarifa base
-        # Prioridad: Festivo > Domingo > Normal
-        
-        is_sunday = day_date.weekday() == 6
-        is_holiday = day_date in holiday_set
-        
-        # Precios base (defaults por si fallan referencias)
-        p_normal = prices.get('price_normal', 0.0)
-        p_extra = prices.get('price_extra', 0.0)
-        plus_h = prices.get('plus_holiday', 0.0)
-        plus_s = prices.get('plus_sunday', 0.0)
-        plus_n = prices.get('plus_nocturnal', 0.0)
-
-        rate = p_normal
-        tipo = "Normal"
-        
-        if is_holiday:
-            rate = p_normal + plus_h
-            tipo = "Festivo"
-        elif is_sunday:
-            rate = p_normal + plus_s
-            tipo = "Domingo"
-            
-        # Cálculo económico
-        # Diurnas pagan a tasa base (o penalizada/premiada según tipo)
-        # Nocturnas pagan a tasa base + plus nocturnidad
-        
-        h_diurnas = max(0.0, h_total - h_noct)
-        
-        pago_base = h_diurnas * rate
-        pago_noct = h_noct * (rate + plus_n)
-        
-        total_dia = pago_base + pago_noct
-        
-        total_horas.append(h_total)
-        horas_nocturnas.append(h_noct)
-        tipos_jornada.append(tipo)
-        total_euros.append(total_dia)
+    # Calendario precalculado (memoizado por conjunto de festivos)
+    cal = get_calendar(holidays)
+    rules = compile_rules(rules)
+
+    # Datos del turno por código (Default 0.0 si no existe)
+    totals = {c: float(v.get('total', 0.0)) for c, v in user_mapping.items()}
+    nocturnals = {c: float(v.get('nocturnal', 0.0)) for c, v in user_mapping.items()}
+    codes = df[col_codigo]
+    total_horas = codes.map(totals).fillna(0.0).to_numpy(dtype=float)
+    horas_nocturnas = codes.map(nocturnals).fillna(0.0).to_numpy(dtype=float)
+
+    # Determinar tipo de jornada según la prioridad del convenio
+    # (por defecto: Festivo > Domingo > Normal)
+    day_codes = rules.day_type_codes(cal.flags_for(df['Fecha']))
+
+    # Cálculo económico
+    # Diurnas pagan a tasa base (o penalizada/premiada según tipo)
+    # Nocturnas pagan a tasa base + plus nocturnidad
+    total_euros = rules.day_amounts(total_horas, horas_nocturnas, day_codes, prices)
+    tipos_jornada = rules.day_type_labels[day_codes]
 
     # Asignar columnas de forma segura
     df_result = df.copy()
@@ -91,6 +55,106 @@ def calculate_hours(df, user_mapping, prices, holidays):
     
     return df_result
 
+def calculate_rest_debt(df, shift_info, rules=None):
+    """
+    Deuda de descanso por jornada (array alineado con df), según las bandas del convenio.
+    Absentismos y vacaciones no generan deuda.
+
+    df: DataFrame con 'Codigo' y 'Horas_Totales'
+    shift_info: Dict { 'Code': {'type': str, 'is_vacation': bool, ...} }
+    """
+    rules = compile_rules(rules)
+    if df.empty: return np.zeros(0)
+
+    # Elegibilidad por código único (pocos) y expansión a filas
+    uniq, inv = np.unique(df['Codigo'].astype(str).to_numpy(), return_inverse=True)
+    infos = [shift_info.get(c, {}) for c in uniq.tolist()]
+    code_types = np.array([info.get('type') or "" for info in infos], dtype=object)
+    code_vac = np.array([bool(info.get('is_vacation')) for info in infos], dtype=bool)
+    eligible = rules.debt_eligible(code_types, code_vac)[inv]
+
+    horas = df['Horas_Totales'].to_numpy(dtype=float)
+    eligible &= horas > 0
+    return np.where(eligible, rules.rest_debt(horas), 0.0)
+
+# --- CÁLCULO COMPRIMIDO POR PARES (CÓDIGO, TIPO DE JORNADA) ---
+# El importe y la deuda de una jornada solo dependen de su código y de su tipo de
+# día. Se cuentan las filas de cada par y las fórmulas se evalúan una vez por par;
+# solo se expande a filas si se pide el detalle.
+
+GROUP_COLUMNS = ['Codigo', 'Tipo_Jornada', 'Jornadas', 'Horas_Jornada', 'Nocturnas_Jornada', 'Euros_Jornada', 'Deuda_Jornada',
+                 'Horas_Totales', 'Horas_Nocturnas', 'Total_Euros', 'Deuda_Descanso_Horas']
+
+def group_code_day_pairs(df, holidays, rules=None, by=None):
+    """
+    Comprime el cuadrante en pares (código, tipo de jornada).
+    by: columna de partición (p. ej. 'Trabajador'): los pares se cuentan por cada valor.
+    Retorna (pares: DataFrame con [by,] 'Codigo', 'Tipo_Jornada', 'Dia_Tipo' y 'Jornadas'; índice de par por fila).
+    """
+    rules = compile_rules(rules)
+    lead = [by] if by is not None else []
+    if df.empty:
+        return pd.DataFrame(columns=lead + ['Codigo', 'Tipo_Jornada', 'Dia_Tipo', 'Jornadas']), np.zeros(0, dtype=np.int64)
+    col_codigo = 'Codigo' if 'Codigo' in df.columns else 'Codigo_Limpio'
+    code_idx, uniques = pd.factorize(df[col_codigo], use_na_sentinel=False)
+    day_codes = rules.day_type_codes(get_calendar(holidays).flags_for(df['Fecha'])).astype(np.int64)
+
+    n_types = len(rules.day_type_labels)
+    n_codes = max(len(uniques), 1)
+    flat = code_idx * n_types + day_codes
+    if by is not None:
+        part_idx, parts = pd.factorize(df[by], use_na_sentinel=False)
+        flat = flat + part_idx.astype(np.int64) * (n_codes * n_types)
+    present, pair_idx = np.unique(flat, return_inverse=True)
+    pair_codes = (present // n_types) % n_codes
+    pair_days = (present % n_types).astype(np.int8)
+    pairs = pd.DataFrame({
+        'Codigo': np.asarray(uniques, dtype=object)[pair_codes],
+        'Tipo_Jornada': rules.day_type_labels[pair_days],
+        'Dia_Tipo': pair_days,
+        'Jornadas': np.bincount(pair_idx, minlength=len(present)),
+    })
+    if by is not None: pairs.insert(0, by, np.asarray(parts, dtype=object)[present // (n_codes * n_types)])
+    return pairs, pair_idx
+
+def calculate_grouped(pairs, user_mapping, prices, shift_info=None, rules=None):
+    """
+    Horas, importe y deuda de descanso por par (código, tipo de jornada): coste
+    proporcional al número de pares, no de filas.
+
+    pairs: resultado de group_code_day_pairs (con by='Trabajador', una fila por trabajador y par)
+    shift_info: Dict { 'Code': {'type': str, 'is_vacation': bool} }. None = sin deuda
+    """
+    rules = compile_rules(rules)
+    out = pairs.copy()
+    codes = out['Codigo'].tolist()
+    total = np.array([float(user_mapping.get(c, {}).get('total', 0.0)) for c in codes])
+    noct = np.array([float(user_mapping.get(c, {}).get('nocturnal', 0.0)) for c in codes])
+    cents = rules.day_amounts_cents(total, noct, out['Dia_Tipo'].to_numpy(dtype=np.int64), prices)
+    if shift_info is None:
+        debt = np.zeros(len(out))
+    else:
+        infos = [shift_info.get(str(c), {}) for c in codes]
+        eligible = rules.debt_eligible(np.array([info.get('type') or "" for info in infos], dtype=object),
+                                       np.array([bool(info.get('is_vacation')) for info in infos], dtype=bool))
+        debt = np.where(eligible & (total > 0), rules.rest_debt(total), 0.0)
+
+    # Euros y deuda por par en céntimos / centésimas de hora: el producto por nº de jornadas es exacto
+    n = out['Jornadas'].to_numpy(dtype=np.int64)
+    out['Horas_Jornada'], out['Nocturnas_Jornada'] = total, noct
+    out['Euros_Jornada'], out['Deuda_Jornada'] = to_euros(cents), debt
+    out['Horas_Totales'], out['Horas_Nocturnas'] = total * n, noct * n
+    out['Total_Euros'], out['Deuda_Descanso_Horas'] = to_euros(cents * n), to_hours(to_hundredths(debt) * n)
+    return out[[c for c in pairs.columns if c not in GROUP_COLUMNS and c != 'Dia_Tipo'] + GROUP_COLUMNS]
+
+def expand_grouped(df, grouped, pair_idx):
+    """Detalle por fila (como calculate_hours + deuda) a partir del cálculo por pares."""
+    df_result = df.copy()
+    for col, src in (('Horas_Totales', 'Horas_Jornada'), ('Horas_Nocturnas', 'Nocturnas_Jornada'),
+                     ('Tipo_Jornada', 'Tipo_Jornada'), ('Total_Euros', 'Euros_Jornada'), ('Deuda_Descanso_Horas', 'Deuda_Jornada')):
+        df_result[col] = grouped[src].to_numpy()[pair_idx]
+    return df_result
+
 def calculate_nocturnal_hours(start_str: str, end_str: str) -> float:
     """
     Calcula horas nocturnas en el rango 22:00 - 06:00.
@@ -0,0 +1,109 @@
+import calendar
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, Optional
+
+# --- FLAGS POR DÍA (bitmask uint8) ---
+LABORABLE = 1            # Lunes a viernes
+SABADO = 2
+DOMINGO = 4
+FESTIVO_NACIONAL = 8
+FESTIVO_AUTONOMICO = 16
+FESTIVO_LOCAL = 32       # Festivos detectados en el cuadrante o añadidos a mano
+FESTIVO = FESTIVO_NACIONAL | FESTIVO_AUTONOMICO | FESTIVO_LOCAL
+
+# Tipo de jornada a efectos de tarifa (Prioridad: Festivo > Domingo > Normal)
+DAY_NORMAL, DAY_SUNDAY, DAY_HOLIDAY = 0, 1, 2
+DAY_TYPE_LABELS = np.array(["Normal", "Domingo", "Festivo"], dtype=object)
+
+def to_date(value: Any) -> Optional[date]:
+    """Normaliza date/datetime/str 'YYYY-MM-DD' a date. None si no es interpretable."""
+    if isinstance(value, datetime): return value.date()
+    if isinstance(value, date): return value
+    try:
+        return pd.to_datetime(value).date()
+    except (ValueError, TypeError, AttributeError):
+        return None  # None / NaT / texto no interpretable
+
+def to_day_numbers(dates: Any) -> np.ndarray:
+    """Fechas -> días desde 1970-01-01 (int64), vectorizado. Permite diff/cumsum sobre fechas."""
+    return pd.to_datetime(pd.Index(dates)).values.astype('datetime64[D]').astype(np.int64)
+
+def from_day_numbers(days: np.ndarray) -> np.ndarray:
+    """Inverso de to_day_numbers: array de objetos date."""
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype(object)
+
+def _normalize(dates: Iterable[Any]) -> FrozenSet[date]:
+    return frozenset(d for d in (to_date(x) for x in dates or ()) if d is not None)
+
+class CalendarIndex:
+    """
+    Calendario precalculado: por cada año, un array denso (día del año) con los
+    flags del día. Toda clasificación de fechas se hace por indexado O(1) o
+    vectorizado sobre estos arrays. Las vacaciones no son un flag del calendario:
+    dependen del trabajador y van por fila en el cuadrante ('is_vacation', Vac_Periodo).
+    """
+    def __init__(self, local: FrozenSet[date] = frozenset(), regional: FrozenSet[date] = frozenset(),
+                 national: FrozenSet[date] = frozenset()):
+        self._marks = ((national, FESTIVO_NACIONAL), (regional, FESTIVO_AUTONOMICO), (local, FESTIVO_LOCAL))
+        self._years: Dict[int, np.ndarray] = {}
+
+    def year_flags(self, year: int) -> np.ndarray:
+        flags = self._years.get(year)
+        if flags is not None: return flags
+
+        n_days = 366 if calendar.isleap(year) else 365
+        weekday = (np.arange(n_days) + date(year, 1, 1).weekday()) % 7
+        flags = np.zeros(n_days, dtype=np.uint8)
+        flags[weekday < 5] |= LABORABLE
+        flags[weekday == 5] |= SABADO
+        flags[weekday == 6] |= DOMINGO
+
+        for dates, flag in self._marks:
+            doy = [d.timetuple().tm_yday - 1 for d in dates if d.year == year]
+            if doy: flags[doy] |= flag
+
+        flags.setflags(write=False)
+        self._years[year] = flags
+        return flags
+
+    # --- CONSULTAS ESCALARES (O(1)) ---
+    def flags_of(self, d: date) -> int:
+        return int(self.year_flags(d.year)[d.timetuple().tm_yday - 1])
+
+    def is_holiday(self, d: date) -> bool: return bool(self.flags_of(d) & FESTIVO)
+    def is_sunday(self, d: date) -> bool: return bool(self.flags_of(d) & DOMINGO)
+
+    # --- CONSULTAS VECTORIZADAS ---
+    def flags_for(self, dates: Any) -> np.ndarray:
+        """Flags de una secuencia de fechas (date, datetime64, str...) como array uint8."""
+        idx = pd.DatetimeIndex(pd.to_datetime(pd.Index(dates), errors='coerce'))
+        out = np.zeros(len(idx), dtype=np.uint8)
+        valid = ~idx.isna()
+        if not valid.any(): return out
+        years = idx[valid].year.to_numpy()
+        doy = idx[valid].dayofyear.to_numpy() - 1
+        valid_out = np.zeros(len(years), dtype=np.uint8)
+        for y in np.unique(years):
+            sel = years == y
+            valid_out[sel] = self.year_flags(int(y))[doy[sel]]
+        out[valid] = valid_out
+        return out
+
+    def day_types(self, dates: Any) -> np.ndarray:
+        """Código de tipo de jornada por fecha: DAY_HOLIDAY > DAY_SUNDAY > DAY_NORMAL."""
+        flags = self.flags_for(dates)
+        return np.where(flags & FESTIVO, DAY_HOLIDAY, np.where(flags & DOMINGO, DAY_SUNDAY, DAY_NORMAL)).astype(np.int8)
+
+@lru_cache(maxsize=128)
+def _cached_calendar(local: FrozenSet[date], regional: FrozenSet[date], national: FrozenSet[date]) -> CalendarIndex:
+    return CalendarIndex(local, regional, national)
+
+def get_calendar(holidays: Iterable[Any] = (), regional: Iterable[Any] = (), national: Iterable[Any] = ()) -> CalendarIndex:
+    """
+    Devuelve (memoizado) el calendario para un conjunto de festivos.
+    holidays: festivos detectados en el cuadrante o introducidos a mano (se marcan como locales).
+    """
+    return _cached_calendar(_normalize(holidays), _normalize(regional), _normalize(national))
@@ -0,0 +1,127 @@
+import threading
+import traceback
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+# --- DIAGNÓSTICO DE EXTRACCIÓN (OPCIONAL) ---
+# Registro columnar en buffer circular: arrays preasignados + índice de escritura.
+# Registrar una celda son unas pocas asignaciones, sin crear dicts ni DataFrames,
+# por lo que puede quedarse activado en producción.
+
+SOURCES = np.array(["texto", "ocr"], dtype=object)
+SOURCE_TEXT, SOURCE_OCR = 0, 1
+
+STATUSES = np.array(["libre", "turno", "vacaciones"], dtype=object)
+STATUS_FREE, STATUS_SHIFT, STATUS_VACATION = 0, 1, 2
+
+class ExtractionRecorder:
+    """
+    Registro por celda de extract_data_from_pdf: documento, página, mes, día,
+    origen (texto/OCR), texto bruto, clasificación y tiempo empleado. Conserva las
+    últimas `capacity` celdas; además guarda tiempos por página, los errores y los
+    avisos (p. ej. páginas escaneadas sin OCR disponible).
+    """
+    def __init__(self, capacity: int = 100_000):
+        if capacity <= 0: raise ValueError("capacity debe ser positiva")
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._doc = np.zeros(capacity, dtype=np.int32)
+        self._page = np.zeros(capacity, dtype=np.int32)
+        self._month = np.zeros(capacity, dtype=np.int8)
+        self._day = np.zeros(capacity, dtype=np.int8)
+        self._source = np.zeros(capacity, dtype=np.int8)
+        self._status = np.zeros(capacity, dtype=np.int8)
+        self._elapsed_ns = np.zeros(capacity, dtype=np.int64)
+        self._raw_text = np.empty(capacity, dtype=object)
+        self._code = np.empty(capacity, dtype=object)
+        self._acronym = np.empty(capacity, dtype=object)
+        self._n = 0
+        self.documents: List[str] = []
+        self.pages: List[Dict[str, Any]] = []
+        self.errors: List[Dict[str, Any]] = []
+        self.warnings: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return min(self._n, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """Celdas sobrescritas por el buffer circular."""
+        return max(0, self._n - self.capacity)
+
+    def begin_document(self, name: Any) -> int:
+        with self._lock:
+            self.documents.append(str(name))
+            return len(self.documents) - 1
+
+    def record_cell(self, doc: int, page: int, month: int, day: int, source: int, raw_text: str,
+                    code: Optional[str], acronym: Optional[str], elapsed_ns: int) -> None:
+        if code is None: status = STATUS_FREE
+        elif code == "V": status = STATUS_VACATION
+        else: status = STATUS_SHIFT
+        with self._lock:
+            i = self._n % self.capacity
+            self._doc[i] = doc; self._page[i] = page; self._month[i] = month; self._day[i] = day
+            self._source[i] = source; self._status[i] = status; self._elapsed_ns[i] = elapsed_ns
+            self._raw_text[i] = raw_text; self._code[i] = code; self._acronym[i] = acronym
+            self._n += 1
+
+    def record_page(self, doc: int, page: int, source: int, n_cells: int, elapsed_ns: int) -> None:
+        with self._lock:
+            self.pages.append({'doc': doc, 'page': page, 'source': SOURCES[source], 'cells': n_cells, 'elapsed_ms': elapsed_ns / 1e6})
+
+    def record_error(self, doc: int, exc: BaseException, page: Optional[int] = None) -> None:
+        with self._lock:
+            self.errors.append({
+                'doc': doc, 'document': self.documents[doc] if 0 <= doc < len(self.documents) else "",
+                'page': page, 'error': f"{type(exc).__name__}: {exc}",
+                'traceback': "".join(traceback.format_exception(type(exc), exc, exc.__traceback__)),
+            })
+
+    def record_warning(self, doc: int, message: str, page: Optional[int] = None) -> None:
+        with self._lock:
+            self.warnings.append({
+                'doc': doc, 'document': self.documents[doc] if 0 <= doc < len(self.documents) else "",
+                'page': page, 'warning': message,
+            })
+
+    def clear(self) -> None:
+        with self._lock:
+            self._n = 0
+            self._raw_text[:] = None; self._code[:] = None; self._acronym[:] = None
+            self.documents.clear(); self.pages.clear(); self.errors.clear(); self.warnings.clear()
+
+    # --- CONSULTAS ---
+    def to_frame(self) -> pd.DataFrame:
+        """Celdas registradas en orden cronológico (las más antiguas pueden haberse descartado)."""
+        with self._lock:
+            n = len(self)
+            order = (np.arange(n) + (self._n - n)) % self.capacity
+            docs = np.array(self.documents + [""], dtype=object)
+            return pd.DataFrame({
+                'Documento': docs[np.minimum(self._doc[order], len(docs) - 1)],
+                'Pagina': self._page[order] + 1,
+                'Mes': self._month[order],
+                'Dia': self._day[order],
+                'Origen': SOURCES[self._source[order]],
+                'Texto': self._raw_text[order],
+                'Codigo': self._code[order],
+                'Siglas': self._acronym[order],
+                'Estado': STATUSES[self._status[order]],
+                'Tiempo_ms': self._elapsed_ns[order] / 1e6,
+            })
+
+    def pages_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.pages, columns=['doc', 'page', 'source', 'cells', 'elapsed_ms'])
+
+    def summary(self) -> pd.DataFrame:
+        """Celdas y tiempo por documento, origen y estado."""
+        df = self.to_frame()
+        if df.empty: return pd.DataFrame(columns=['Documento', 'Origen', 'Estado', 'Celdas', 'Tiempo_ms'])
+        return (df.groupby(['Documento', 'Origen', 'Estado'], sort=False)
+                  .agg(Celdas=('Dia', 'size'), Tiempo_ms=('Tiempo_ms', 'sum'))
+                  .reset_index())
+
+    def slowest(self, n: int = 20) -> pd.DataFrame:
+        return self.to_frame().nlargest(n, 'Tiempo_ms')
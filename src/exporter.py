@@ -2,13 +2,140 @@ import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import os
+import re
+import unicodedata
+import zipfile
+import numpy as np
 import pandas as pd
 
-def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", company_name="N/D"):
+from src.calendar_index import get_calendar, FESTIVO
+from src.aggregation import build_monthly_cube
+from src.rules import DEFAULT_RULES, compile_rules
+from src.money import amount_cents, to_cents, to_euros, to_hours, to_hundredths
+
+# --- MODELO DE FILAS (ORIENTADO A COLUMNAS) ---
+
+EXPORT_COLUMNS = ['Fecha', 'Entrada', 'Salida', 'Codigo', 'Horas', 'Deuda_Horas', 'Tiempo_Descanso', 'Estado', 'Importe']
+
+class ExportRows:
+    """
+    Filas del detalle ya calculadas y formateadas, como columnas (arrays NumPy),
+    ordenadas por mes y fecha con offsets por mes. No referencia al DataFrame de
+    origen, por lo que se puede cachear, compartir o enviar a otro proceso.
+    """
+    def __init__(self, columns, months, offsets, dates=None):
+        self.columns = columns
+        self.months = months
+        self.offsets = offsets
+        self.dates = dates if dates is not None else np.zeros(0, dtype='datetime64[D]')
+
+    def __len__(self):
+        return int(self.offsets[-1]) if len(self.offsets) else 0
+
+    def iter_months(self):
+        """(mes, lista de filas) con valores nativos de Python listos para escribir."""
+        lists = [self.columns[c].tolist() for c in EXPORT_COLUMNS]
+        for pos, m_num in enumerate(self.months):
+            lo, hi = int(self.offsets[pos]), int(self.offsets[pos + 1])
+            yield int(m_num), list(zip(*(col[lo:hi] for col in lists)))
+
+    def to_frame(self, typed=False):
+        """
+        Detalle como DataFrame. typed=True (ingesta en otros sistemas): Fecha como
+        fecha real en lugar de texto dd/mm/aaaa y columna Mes.
+        """
+        data = {c: self.columns[c] for c in EXPORT_COLUMNS}
+        if typed:
+            data['Fecha'] = self.dates
+            data = {'Mes': np.repeat(np.asarray(self.months, dtype=np.int64), np.diff(self.offsets)), **data}
+        return pd.DataFrame(data)
+
+def build_export_rows(df, shift_mapping, holidays, precio_hora, cube=None):
+    """Construye el ExportRows de forma vectorizada (sin iterrows ni mutar df)."""
+    if cube is None: cube = build_monthly_cube(df, holidays, precio_hora)
+    frame = cube.frame
+    n = len(frame)
+    if n == 0:
+        return ExportRows({c: np.zeros(0, dtype=object) for c in EXPORT_COLUMNS}, cube.months, cube.offsets)
+
+    codes = frame['Codigo'].astype(object).to_numpy() if 'Codigo' in frame.columns else np.full(n, '', dtype=object)
+    code_idx, uniq_codes = pd.factorize(codes, use_na_sentinel=False)
+
+    # Datos por código único (pocos) -> se difunden a filas por índice
+    infos = [shift_mapping.get(c, {}) for c in uniq_codes]
+    vac_u = np.array([bool(i.get('is_vacation')) or c == 'V' for c, i in zip(uniq_codes, infos)], dtype=bool)
+    start_u = np.array(["-" if v else i.get('start', '-') for i, v in zip(infos, vac_u)], dtype=object)
+    end_u = np.array(["-" if v else i.get('end', '-') for i, v in zip(infos, vac_u)], dtype=object)
+    type_u = np.array([i.get('type') for i in infos], dtype=object)
+    desc_u = np.array([i.get('description', 'Absentismo') for i in infos], dtype=object)
+
+    is_vac = vac_u[code_idx]
+    row_type = type_u[code_idx]
+
+    debt_h = frame['Deuda_Descanso_Horas'].to_numpy(dtype=float) if 'Deuda_Descanso_Horas' in frame.columns else np.zeros(n)
+    minutes = np.rint(debt_h * 60).astype(np.int64)
+    rest_str = np.where(debt_h > 0, np.char.add(minutes.astype(str), " min"), "-").astype(object)
+
+    # Estado Logic (Prioridad: Festivo > Vacaciones > Absentismo > Revisar > Ordinario)
+    is_holiday = (get_calendar(holidays).flags_for(frame['Fecha']) & FESTIVO) != 0
+    if 'Tipo_Jornada' in frame.columns:
+        is_holiday |= (frame['Tipo_Jornada'] == 'Festivo').to_numpy(dtype=bool)
+    estado = np.select(
+        [is_holiday, is_vac, row_type == 'Absentismo', row_type == 'Unknown'],
+        [np.array("Festivo", dtype=object), np.array("Vacaciones", dtype=object),
+         desc_u[code_idx], np.array("Revisar", dtype=object)],
+        default=np.array("Ordinario", dtype=object)
+    )
+
+    horas = frame['Horas_Totales'].to_numpy() if 'Horas_Totales' in frame.columns else np.zeros(n, dtype=np.int64)
+    columns = {
+        'Fecha': pd.to_datetime(frame['Fecha']).dt.strftime("%d/%m/%Y").to_numpy(dtype=object),
+        'Entrada': start_u[code_idx],
+        'Salida': end_u[code_idx],
+        'Codigo': codes,
+        'Horas': horas,
+        'Deuda_Horas': debt_h,
+        'Tiempo_Descanso': rest_str,
+        'Estado': estado,
+        'Importe': to_euros(amount_cents(to_hundredths(debt_h), precio_hora)),
+    }
+    dates = pd.to_datetime(frame['Fecha']).to_numpy().astype('datetime64[D]')
+    return ExportRows(columns, cube.months, cube.offsets, dates)
+
+# --- TOTALES DEL INFORME ---
+
+def report_hourly_rate(prices, rules=None):
+    """Precio hora ordinaria del informe según el convenio (por defecto (Base + Antigüedad + Plus) x 15 / 1776)."""
+    return compile_rules(rules).hourly_rate(prices, 'report')
+
+def report_totals(cube, prices, rules=None):
+    """
+    Totales del RESUMEN EJECUTIVO a partir del cubo mensual (sin releer el Excel).
+    Se calculan en céntimos y centésimas de hora; los euros solo para escribir.
+    El importe es la suma de los importes por jornada del detalle (ya en céntimos).
+    """
+    precio_hora = report_hourly_rate(prices, rules)
+    deuda = cube.units['Deuda_Descanso_Horas']['grand']
+    importe_descansos = cube.debt_amount_cents(precio_hora)
+    reclamacion_extra = to_cents(prices.get('val_extra_pay', 0.0))
+    return {
+        'total_horas_deuda': float(to_hours(deuda)),
+        'precio_hora': precio_hora,
+        'importe_descansos': float(to_euros(importe_descansos)),
+        'reclamacion_extra': float(to_euros(reclamacion_extra)),
+        'total_final': float(to_euros(importe_descansos + reclamacion_extra)),
+    }
+
+def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", company_name="N/D", cube=None):
     """
     Genera un Excel con:
     1. Pestaña "RESUMEN EJECUTIVO".
     2. Pestaña por cada Mes "ENERO", "FEBRERO", etc.
+    
+    cube: MonthlyCube ya calculado (dashboard). Si no se pasa, se construye aquí.
     """
     output = BytesIO()
     wb = openpyxl.Workbook()
@@ -74,10 +201,9 @@ def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", compa
     
     # Calcular totales internos para consistencia (aunque el usuario pase el precio ya calculado, 
     # aquí mostramos el desglose "teórico" de su fórmula anual)
-    total_mensual = base + antiguedad + plus
-    total_anual = total_mensual * 15
-    divisor_horas = 1776
-    precio_hora_formula = total_anual / divisor_horas if divisor_horas else 0.0
+    report_rule = DEFAULT_RULES.hourly_rates['report']
+    divisor_horas = report_rule['divisor']
+    precio_hora_formula = report_hourly_rate(prices)
     
     # Cabecera Sección
     ws_summary.merge_cells('B9:E9')
@@ -88,7 +214,7 @@ def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", compa
     
     # Fila Fórmula Texto
     # "(1253.26 + 100.26 + 0.00) x 15"
-    formula_text = f"({base:.2f} + {antiguedad:.2f} + {plus:.2f}) x 15"
+    formula_text = f"({base:.2f} + {antiguedad:.2f} + {plus:.2f}) x {report_rule['months']}"
     ws_summary.merge_cells('B11:E11')
     ws_summary['B11'] = formula_text
     ws_summary['B11'].alignment = align_center
@@ -137,11 +263,13 @@ def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", compa
     # En la versión actual codigo, prices tiene 'val_extra_pay'. 
     # El total de descansos se calcula en Main. Deberíamos pasarlo o recalcularlo aquí.
     # Recalculamos rápido del DF para ser precisos
-    total_horas_deuda = df['Deuda_Descanso_Horas'].sum()
+    if cube is None: cube = build_monthly_cube(df, holidays, precio_hora)
+    totals = report_totals(cube, prices)
+    total_horas_deuda = totals['total_horas_deuda']
     # Usamos el PRECIO DE FÓRMULA (1776)
-    importe_descansos = total_horas_deuda * precio_hora 
-    reclamacion_extra = prices.get('val_extra_pay', 0.0)
-    total_final = importe_descansos + reclamacion_extra
+    importe_descansos = totals['importe_descansos']
+    reclamacion_extra = totals['reclamacion_extra']
+    total_final = totals['total_final']
     
     # Filas Resumen
     rows_summary = [
@@ -185,10 +313,7 @@ def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", compa
     # HOJA 2: DETALLE MENSUAL (BLOQUES VISUALES)
     # ---------------------------------------------------------
     
-    # Preparar datos
-    df['Mes_Num'] = df['Fecha'].apply(lambda x: x.month)
-    meses_ordenados = sorted(df['Mes_Num'].unique())
-    
+    # Preparar datos (filas por mes ya ordenadas en el cubo)
     month_names = {
         1:"ENERO", 2:"FEBRERO", 3:"MARZO", 4:"ABRIL", 5:"MAYO", 6:"JUNIO", 
         7:"JULIO", 8:"AGOSTO", 9:"SEPTIEMBRE", 10:"OCTUBRE", 11:"NOVIEMBRE", 12:"DICIEMBRE"
@@ -196,7 +321,8 @@ def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", compa
     
     header_fill = PatternFill(start_color=COLOR_HEADER_BG, end_color=COLOR_HEADER_BG, fill_type='solid')
     header_font_style = Font(bold=True, color=COLOR_HEADER_FONT)
-    holidays_set = set(holidays)
+    yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+    black_bold_font = Font(color="000000", bold=True)
 
     # Crear única hoja
     ws_detail = wb.create_sheet("DETALLE MENSUAL")
@@ -207,7 +333,8 @@ def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", compa
     for i, w in enumerate(widths, 1):
         ws_detail.column_dimensions[get_column_letter(i)].width = w
 
-    for m_num in meses_ordenados:
+    rows = build_export_rows(df, shift_mapping, holidays, precio_hora, cube)
+    for m_num, month_rows in rows.iter_months():
         m_name = month_names.get(m_num, f"MES_{m_num}")
         
         # 1. SEPARADOR VISUAL (Bloque Azul)
@@ -230,45 +357,10 @@ def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", compa
             
         current_row += 1
         
-        # 3. DATOS
-        df_month = df[df['Mes_Num'] == m_num].sort_values('Fecha')
-        
-        for _, row in df_month.iterrows():
-            code = row.get('Codigo', '')
-            info = shift_mapping.get(code, {})
-            start = info.get('start', '-')
-            end = info.get('end', '-')
-            
-            es_vacation = info.get('is_vacation')
-            if es_vacation or code == 'V':
-                start = "-"; end = "-"
-                
-            debt_h = row.get('Deuda_Descanso_Horas', 0.0)
-            debt_minutes = int(round(debt_h * 60))
-            if debt_h > 0:
-                rest_str = f"{debt_minutes} min" 
-            else:
-                rest_str = "-"
-            
-            # Estado Logic
-            date_obj = row['Fecha']
-            is_holiday_manual = date_obj in holidays_set
-            tipo = row.get('Tipo_Jornada', 'Ordinario')
-            
-            estado_texto = "Ordinario"
-            if is_holiday_manual: estado_texto = "Festivo"
-            elif tipo == "Festivo": estado_texto = "Festivo"
-            elif es_vacation or code == 'V': estado_texto = "Vacaciones"
-            elif info.get('type') == 'Absentismo': estado_texto = info.get('description', 'Absentismo')
-            elif info.get('type') == 'Unknown': estado_texto = "Revisar"
-            
-            importe = debt_h * precio_hora
-            
-            # Escribir fila
-            vals = [
-                date_obj.strftime("%d/%m/%Y"), start, end, code, 
-                row.get('Horas_Totales', 0), debt_h, rest_str, estado_texto, importe
-            ]
+        # 3. DATOS (valores ya calculados en el modelo de filas: aquí solo se escribe)
+        for vals in month_rows:
+            debt_h = vals[5]
+            estado_texto = vals[7]
             
             for c_idx, val in enumerate(vals, 1):
                 cell = ws_detail.cell(row=current_row, column=c_idx, value=val)
@@ -282,9 +374,6 @@ def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", compa
                 
                 # Colores Condicionales
                 
-                # Definir amarillo
-                yellow_fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-                
                 # 6: Deuda (H), 7: Tiempo Descanso -> ROJO si hay deuda
                 if c_idx in [6, 7] and debt_h > 0:
                     cell.fill = red_fill
@@ -292,9 +381,7 @@ def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", compa
                     
                 # ESTADOS (Verde Festivo / Amarillo Vacaciones)
                 if estado_texto == "Festivo":
-                     # Toda la fila verde en texto o solo celda estado?
                      # Usuario dijo: "igual que festivo esta coloreado de verde... vacaciones amarillo"
-                     # Si 'Festivo' ya se coloreaba:
                      if c_idx == 8: # Columna Estado
                          cell.fill = green_fill
                          cell.font = green_font
@@ -302,11 +389,10 @@ def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", compa
                          cell.fill = green_fill
                          
                 elif estado_texto == "Vacaciones":
-                     # Aplicar Amarillo a toda la fila o celdas clave
                      # "vacaciones lo quiero coloreado de amarillo" -> Aplicaremos a Fecha, Codigo y Estado
                      if c_idx in [1, 4, 8]:
                          cell.fill = yellow_fill
-                         cell.font = Font(color="000000", bold=True) # Texto negro para contraste
+                         cell.font = black_bold_font # Texto negro para contraste
 
             current_row += 1
             
@@ -316,3 +402,187 @@ def generate_excel(df, shift_mapping, prices, holidays, worker_name="N/D", compa
     wb.save(output)
     output.seek(0)
     return output
+
+
+# ---------------------------------------------------------
+# FORMATOS RÁPIDOS (SIN ESTILOS): CSV / PARQUET / XLSX EN STREAMING
+# ---------------------------------------------------------
+# Mismo modelo de filas que generate_excel, pensados para ingesta de datos.
+
+def _detail_frame(df, shift_mapping, prices, holidays, worker_name, company_name, cube):
+    rows = build_export_rows(df, shift_mapping, holidays, report_hourly_rate(prices), cube)
+    detail = rows.to_frame(typed=True)
+    detail.insert(0, 'Empresa', company_name)
+    detail.insert(0, 'Trabajador', worker_name)
+    return detail
+
+def export_csv(df, shift_mapping, prices, holidays, worker_name="N/D", company_name="N/D", cube=None):
+    """Detalle diario en CSV (UTF-8, separador ';' y coma decimal, como Excel en español)."""
+    output = BytesIO()
+    detail = _detail_frame(df, shift_mapping, prices, holidays, worker_name, company_name, cube)
+    detail.to_csv(output, sep=';', decimal=',', index=False, date_format='%Y-%m-%d', encoding='utf-8')
+    output.seek(0)
+    return output
+
+def export_parquet(df, shift_mapping, prices, holidays, worker_name="N/D", company_name="N/D", cube=None):
+    """Detalle diario en Parquet (requiere pyarrow, incluido en requirements.txt)."""
+    output = BytesIO()
+    detail = _detail_frame(df, shift_mapping, prices, holidays, worker_name, company_name, cube)
+    try:
+        detail.to_parquet(output, index=False)
+    except ImportError as e:
+        raise ImportError("La exportación a Parquet requiere 'pyarrow' (pip install pyarrow)") from e
+    output.seek(0)
+    return output
+
+def export_xlsx_fast(df, shift_mapping, prices, holidays, worker_name="N/D", company_name="N/D", cube=None):
+    """Detalle diario en XLSX sin estilos, escrito en streaming (openpyxl write_only)."""
+    output = BytesIO()
+    detail = _detail_frame(df, shift_mapping, prices, holidays, worker_name, company_name, cube)
+    detail['Fecha'] = detail['Fecha'].dt.date
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("DETALLE")
+    ws.append(list(detail.columns))
+    for row in detail.itertuples(index=False, name=None):
+        ws.append(row)
+    wb.save(output)
+    output.seek(0)
+    return output
+
+EXPORT_BACKENDS = {
+    'xlsx': (generate_excel, 'xlsx'),
+    'xlsx_fast': (export_xlsx_fast, 'xlsx'),
+    'csv': (export_csv, 'csv'),
+    'parquet': (export_parquet, 'parquet'),
+}
+
+# ---------------------------------------------------------
+# EXPORTACIÓN MASIVA (MULTI-TRABAJADOR)
+# ---------------------------------------------------------
+
+CONSOLIDATED_FILENAME = "RESUMEN_CONSOLIDADO.xlsx"
+
+def _safe_filename(name):
+    clean = re.sub(r'[^A-Za-z0-9_-]+', '_', unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode())
+    return clean.strip('_') or "trabajador"
+
+def _render_worker_report(job):
+    """
+    Genera el informe de UN trabajador (se ejecuta en un proceso del pool).
+    job: dict con df, shift_mapping, prices, holidays, worker_name, company_name.
+    Retorna (bytes del xlsx, resumen con los totales del trabajador).
+    """
+    prices = job['prices']
+    export_fn, _ = EXPORT_BACKENDS[job.get('format', 'xlsx')]
+    cube = build_monthly_cube(job['df'], job['holidays'], report_hourly_rate(prices))
+    output = export_fn(
+        job['df'], job['shift_mapping'], prices, job['holidays'],
+        job.get('worker_name', "N/D"), job.get('company_name', "N/D"), cube=cube
+    )
+    summary = {'worker': job.get('worker_name', "N/D"), 'company': job.get('company_name', "N/D")}
+    summary.update(report_totals(cube, prices))
+    return output.getvalue(), summary
+
+def generate_consolidated_excel(summaries):
+    """Libro consolidado con los totales de cada trabajador (a partir de los agregados)."""
+    output = BytesIO()
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "CONSOLIDADO"
+
+    header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type='solid')
+    header_font = Font(bold=True, color="FFFFFF")
+    border_thin = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    money_fmt = '#,##0.00 €'
+
+    headers = ["TRABAJADOR", "EMPRESA", "HORAS DESCANSO", "PRECIO HORA", "IMPORTE DESCANSOS", "3ª PAGA EXTRA", "TOTAL A RECLAMAR"]
+    widths = [35, 30, 16, 14, 20, 16, 20]
+    for col, (header, w) in enumerate(zip(headers, widths), 1):
+        cell = ws.cell(row=1, column=col, value=header)
+        cell.font = header_font; cell.fill = header_fill; cell.border = border_thin
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+        ws.column_dimensions[get_column_letter(col)].width = w
+
+    for r, s in enumerate(summaries, 2):
+        vals = [s['worker'], s['company'], s['total_horas_deuda'], s['precio_hora'],
+                s['importe_descansos'], s['reclamacion_extra'], s['total_final']]
+        for col, val in enumerate(vals, 1):
+            cell = ws.cell(row=r, column=col, value=val)
+            cell.border = border_thin
+            if col == 3: cell.number_format = '#,##0.00'
+            elif col == 4: cell.number_format = '#,##0.0000 €'
+            elif col > 4: cell.number_format = money_fmt
+
+    total_row = len(summaries) + 2
+    ws.cell(row=total_row, column=1, value="TOTAL").font = Font(bold=True)
+    # Suma exacta en centésimas de hora / céntimos
+    for col, key in ((3, 'total_horas_deuda'), (5, 'importe_descansos'), (6, 'reclamacion_extra'), (7, 'total_final')):
+        column = np.array([s[key] for s in summaries], dtype=float)
+        total = to_hours(to_hundredths(column).sum()) if col == 3 else to_euros(to_cents(column).sum())
+        cell = ws.cell(row=total_row, column=col, value=float(total))
+        cell.font = Font(bold=True); cell.border = border_thin
+        cell.number_format = '#,##0.00' if col == 3 else money_fmt
+
+    wb.save(output)
+    output.seek(0)
+    return output
+
+def jobs_from_partitions(partitions, shift_mapping, prices, holidays, company_name="N/D"):
+    """
+    Trabajos para generate_excel_batch a partir de un cuadrante con varios
+    trabajadores leído una sola vez (ver parser.partition_by_worker), ya calculado.
+    """
+    return [{'df': part, 'shift_mapping': shift_mapping, 'prices': prices, 'holidays': holidays,
+             'worker_name': worker or "N/D", 'company_name': company_name}
+            for worker, part in partitions.items()]
+
+def generate_excel_batch(jobs, output_dir=None, zip_stream=None, max_workers=None, fmt='xlsx', pool=None):
+    """
+    Genera los informes individuales de muchos trabajadores en un pool de procesos
+    y un libro consolidado con los totales de todos ellos.
+
+    jobs: lista de dicts (df, shift_mapping, prices, holidays, worker_name, company_name).
+    output_dir: carpeta donde escribir los .xlsx, y/o
+    zip_stream: fichero binario abierto (o BytesIO) donde escribir un .zip.
+    max_workers: procesos del pool (1 = en el propio proceso).
+    fmt: formato de los informes individuales (ver EXPORT_BACKENDS). El consolidado siempre es xlsx.
+    pool: WarmWorkerPool ya arrancado (src.worker_pool) que se reutiliza en lugar de crear uno.
+    Retorna la lista de resúmenes por trabajador (mismo orden que jobs).
+    """
+    if fmt not in EXPORT_BACKENDS:
+        raise ValueError(f"Formato no soportado: {fmt} (opciones: {', '.join(EXPORT_BACKENDS)})")
+    if output_dir is None and zip_stream is None:
+        raise ValueError("Indica output_dir o zip_stream")
+    jobs = [dict(job, format=fmt) for job in jobs]
+    extension = EXPORT_BACKENDS[fmt][1]
+
+    if pool is not None:
+        results = pool.map('export', jobs)
+        pool = None   # No es nuestro: no se cierra
+    elif max_workers == 1:
+        results = map(_render_worker_report, jobs)
+    else:
+        pool = ProcessPoolExecutor(max_workers=max_workers)
+        results = pool.map(_render_worker_report, jobs, chunksize=max(1, len(jobs) // (4 * (max_workers or os.cpu_count() or 1))))
+
+    out_dir = Path(output_dir) if output_dir is not None else None
+    if out_dir is not None: out_dir.mkdir(parents=True, exist_ok=True)
+    zf = zipfile.ZipFile(zip_stream, 'w', zipfile.ZIP_DEFLATED) if zip_stream is not None else None
+
+    summaries = []
+    try:
+        for i, (data, summary) in enumerate(results, 1):
+            filename = f"{i:04d}_{_safe_filename(summary['worker'])}.{extension}"
+            summary['file'] = filename
+            if out_dir is not None: (out_dir / filename).write_bytes(data)
+            if zf is not None: zf.writestr(filename, data)
+            summaries.append(summary)
+
+        consolidated = generate_consolidated_excel(summaries).getvalue()
+        if out_dir is not None: (out_dir / CONSOLIDATED_FILENAME).write_bytes(consolidated)
+        if zf is not None: zf.writestr(CONSOLIDATED_FILENAME, consolidated)
+    finally:
+        if zf is not None: zf.close()
+        if pool is not None: pool.shutdown()
+    return summaries
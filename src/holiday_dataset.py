@@ -0,0 +1,122 @@
+import csv
+import threading
+import unicodedata
+from datetime import date
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from src.calendar_index import CalendarIndex, get_calendar
+
+# Dataset offline incluido con la aplicación
+DEFAULT_DATASET_PATH = Path(__file__).with_name("data") / "festivos.csv"
+
+AMBITOS = ("nacional", "autonomico", "local")
+
+# Clave del índice: (comunidad, municipio, año) normalizados. Los festivos
+# nacionales cuelgan de ("", "", año) y los autonómicos de (comunidad, "", año).
+HolidayKey = Tuple[str, str, int]
+
+class HolidayDataset:
+    """Festivos oficiales indexados por (comunidad autónoma, municipio, año)."""
+    def __init__(self, index: Dict[HolidayKey, FrozenSet[date]], names: Dict[str, str],
+                 municipalities: Dict[str, List[str]], descriptions: Dict[Tuple[HolidayKey, date], str]):
+        self._index = index
+        self._names = names                  # clave normalizada -> nombre para mostrar
+        self._municipalities = municipalities
+        self._descriptions = descriptions
+
+    def communities(self) -> List[str]:
+        return sorted(self._names[k] for k in self._municipalities)
+
+    def municipalities(self, comunidad: str) -> List[str]:
+        return self._municipalities.get(_norm(comunidad), [])
+
+    def years(self) -> List[int]:
+        return sorted({k[2] for k in self._index})
+
+    def lookup(self, year: int, comunidad: Optional[str] = None, municipio: Optional[str] = None) -> Dict[str, FrozenSet[date]]:
+        """Festivos aplicables separados por ámbito: {'nacional', 'autonomico', 'local'}."""
+        com = _norm(comunidad); mun = _norm(municipio)
+        empty: FrozenSet[date] = frozenset()
+        return {
+            'nacional': self._index.get(("", "", year), empty),
+            'autonomico': self._index.get((com, "", year), empty) if com else empty,
+            'local': self._index.get((com, mun, year), empty) if com and mun else empty,
+        }
+
+    def description(self, d: date, comunidad: Optional[str] = None, municipio: Optional[str] = None) -> str:
+        com = _norm(comunidad); mun = _norm(municipio)
+        for key in ((com, mun, d.year), (com, "", d.year), ("", "", d.year)):
+            desc = self._descriptions.get((key, d))
+            if desc: return desc
+        return "Festivo"
+
+def _norm(name: Optional[str]) -> str:
+    # Comparación sin acentos ni mayúsculas ("Cataluña" == "CATALUNA")
+    if not name: return ""
+    stripped = unicodedata.normalize("NFKD", name.strip()).encode("ascii", "ignore").decode()
+    return stripped.upper()
+
+def _read_dataset(path: Path) -> HolidayDataset:
+    buckets: Dict[HolidayKey, set] = {}
+    names: Dict[str, str] = {}
+    municipalities: Dict[str, set] = {}
+    descriptions: Dict[Tuple[HolidayKey, date], str] = {}
+
+    with open(path, encoding="utf-8", newline="") as fh:
+        rows = csv.DictReader(line for line in fh if line.strip() and not line.startswith("#"))
+        for row in rows:
+            ambito = (row.get("ambito") or "").strip().lower()
+            if ambito not in AMBITOS: continue
+            try:
+                d = date.fromisoformat(row["fecha"].strip())
+            except (KeyError, ValueError):
+                continue
+
+            com = _norm(row.get("comunidad")) if ambito != "nacional" else ""
+            mun = _norm(row.get("municipio")) if ambito == "local" else ""
+            if ambito != "nacional" and not com: continue
+            if com:
+                names.setdefault(com, row["comunidad"].strip())
+                municipalities.setdefault(com, set())
+            if mun:
+                names.setdefault(f"{com}|{mun}", row["municipio"].strip())
+                municipalities[com].add(mun)
+
+            key = (com, mun, d.year)
+            buckets.setdefault(key, set()).add(d)
+            descriptions[(key, d)] = (row.get("descripcion") or "").strip()
+
+    index = {k: frozenset(v) for k, v in buckets.items()}
+    mun_names = {com: sorted(names[f"{com}|{m}"] for m in muns) for com, muns in municipalities.items()}
+    return HolidayDataset(index, names, mun_names, descriptions)
+
+# --- CARGA PEREZOSA Y MEMOIZADA ---
+_datasets: Dict[Path, HolidayDataset] = {}
+_datasets_lock = threading.Lock()
+
+def load_holiday_dataset(path: Optional[Path] = None) -> HolidayDataset:
+    """Carga el dataset la primera vez que se pide y lo reutiliza en el resto del proceso."""
+    key = Path(path or DEFAULT_DATASET_PATH).resolve()
+    with _datasets_lock:
+        dataset = _datasets.get(key)
+        if dataset is None:
+            dataset = _read_dataset(key)
+            _datasets[key] = dataset
+    return dataset
+
+def get_official_holidays(year: int, comunidad: Optional[str] = None, municipio: Optional[str] = None) -> List[date]:
+    found = load_holiday_dataset().lookup(year, comunidad, municipio)
+    return sorted(set().union(*found.values()))
+
+def merge_holidays(detected: Iterable[date], year: int, comunidad: Optional[str] = None,
+                   municipio: Optional[str] = None) -> List[date]:
+    """Une los festivos detectados en el cuadrante con los oficiales del dataset."""
+    return sorted(set(detected or ()) | set(get_official_holidays(year, comunidad, municipio)))
+
+def get_worker_calendar(detected: Iterable[date], year: int, comunidad: Optional[str] = None,
+                        municipio: Optional[str] = None) -> CalendarIndex:
+    """Calendario (memoizado) con cada festivo marcado en su ámbito correcto."""
+    found = load_holiday_dataset().lookup(year, comunidad, municipio)
+    local = set(detected or ()) | found['local']
+    return get_calendar(local, regional=found['autonomico'], national=found['nacional'])
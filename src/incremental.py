@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from src.aggregation import build_monthly_cube
+from src.calendar_index import get_calendar
+from src.rules import compile_rules
+
+# --- RECÁLCULO INCREMENTAL ---
+# Editar las horas de un código en el formulario solo afecta a las filas con ese
+# código. Se guardan los índices de fila por código y el cubo mensual: una edición
+# recalcula esas filas y ajusta los totales mensuales y generales por diferencia,
+# con un coste proporcional a la edición y no al tamaño del cuadrante.
+
+class IncrementalCalculation:
+    """
+    Horas, nocturnas y deuda de descanso por jornada (y euros si se pasan precios),
+    con índice de filas por código y cubo mensual actualizables.
+
+    df: DataFrame con 'Codigo' y 'Fecha'
+    mapping: Dict { 'Code': {'total': float, 'nocturnal': float} }
+    shift_info: Dict { 'Code': {'type': str, 'is_vacation': bool, ...} }
+    """
+    def __init__(self, df: pd.DataFrame, mapping: Mapping[str, Dict], shift_info: Mapping[str, Dict],
+                 holidays: Iterable[Any] = (), price_hour: Optional[float] = None,
+                 prices: Optional[Mapping[str, Any]] = None, rules=None):
+        self.rules = compile_rules(rules)
+        self.prices = prices
+
+        # Índice de filas por código: un argsort estable + offsets
+        self._code_idx, uniques = pd.factorize(df['Codigo'].astype(str).to_numpy())
+        self.codes: List[str] = uniques.tolist()
+        order = np.argsort(self._code_idx, kind='stable')
+        bounds = np.searchsorted(self._code_idx[order], np.arange(len(self.codes) + 1))
+        self._rows = [order[bounds[k]:bounds[k + 1]] for k in range(len(self.codes))]
+        self._day_codes = self.rules.day_type_codes(get_calendar(holidays).flags_for(df['Fecha'])) if prices is not None else None
+
+        self._total_k, self._noct_k = self._tables(mapping)
+        self._eligible_k = self._eligibility(shift_info)
+
+        self.frame = df.copy(deep=False)
+        for m, v in self._values(np.arange(len(df))).items(): self.frame[m] = v
+        self.cube = build_monthly_cube(self.frame, holidays, price_hour)
+
+    def _tables(self, mapping: Mapping[str, Dict]):
+        total_k = np.array([float(mapping.get(c, {}).get('total', 0.0)) for c in self.codes])
+        noct_k = np.array([float(mapping.get(c, {}).get('nocturnal', 0.0)) for c in self.codes])
+        return total_k, noct_k
+
+    def _eligibility(self, shift_info: Mapping[str, Dict]) -> np.ndarray:
+        infos = [shift_info.get(c, {}) for c in self.codes]
+        return self.rules.debt_eligible(np.array([info.get('type') or "" for info in infos], dtype=object),
+                                        np.array([bool(info.get('is_vacation')) for info in infos], dtype=bool))
+
+    def _values(self, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        k = self._code_idx[rows]
+        total, noct = self._total_k[k], self._noct_k[k]
+        values = {
+            'Horas_Totales': total,
+            'Horas_Nocturnas': noct,
+            'Deuda_Descanso_Horas': np.where(self._eligible_k[k] & (total > 0), self.rules.rest_debt(total), 0.0),
+        }
+        if self.prices is not None:
+            values['Total_Euros'] = self.rules.day_amounts(total, noct, self._day_codes[rows], self.prices)
+        return values
+
+    def update_mapping(self, mapping: Mapping[str, Dict], shift_info: Optional[Mapping[str, Dict]] = None) -> List[str]:
+        """
+        Aplica un nuevo mapeo (y, si se indica, nuevos tipos de turno). Solo se
+        recalculan las filas de los códigos que cambian. Retorna esos códigos.
+        """
+        total_k, noct_k = self._tables(mapping)
+        changed = (total_k != self._total_k) | (noct_k != self._noct_k)
+        if shift_info is not None:
+            eligible_k = self._eligibility(shift_info)
+            changed |= eligible_k != self._eligible_k
+            self._eligible_k = eligible_k
+        self._total_k, self._noct_k = total_k, noct_k
+
+        changed_k = np.flatnonzero(changed)
+        if len(changed_k) == 0: return []
+        rows = np.concatenate([self._rows[k] for k in changed_k])
+        values = self._values(rows)
+        for m, v in values.items():
+            self.frame.iloc[rows, self.frame.columns.get_loc(m)] = v
+        self.cube.update_rows(self.cube.positions[rows], values)
+        return [self.codes[k] for k in changed_k]
+
+    def update_code(self, code: str, total: Optional[float] = None, nocturnal: Optional[float] = None) -> List[str]:
+        """Edición de un único código (atajo de update_mapping)."""
+        if code not in self.codes: return []
+        mapping = {c: {'total': t, 'nocturnal': n} for c, t, n in zip(self.codes, self._total_k, self._noct_k)}
+        if total is not None: mapping[code]['total'] = float(total)
+        if nocturnal is not None: mapping[code]['nocturnal'] = float(nocturnal)
+        return self.update_mapping(mapping)
@@ -0,0 +1,50 @@
+import numpy as np
+from typing import Any
+
+# --- IMPORTES EN PUNTO FIJO ---
+# Importes como enteros int64 en céntimos y horas de deuda en centésimas de hora.
+# Las sumas sobre enteros son exactas (sin deriva de float en cuadrantes grandes
+# o con muchos trabajadores) y la conversión a euros / horas con decimales se hace
+# solo al mostrar o escribir el informe.
+
+CENTS = 100        # Céntimos por euro
+HUNDREDTHS = 100   # Centésimas por hora
+
+def round_half_up(values: Any) -> np.ndarray:
+    """
+    Redondeo comercial a entero (la mitad se aleja de cero) como int64. El redondeo
+    previo a 6 decimales absorbe el error de representación del float
+    (761.7349999... -> 761.735 -> 762).
+    """
+    x = np.round(np.asarray(values, dtype=float), 6)
+    return (np.sign(x) * np.floor(np.abs(x) + 0.5)).astype(np.int64)
+
+def to_fixed(values: Any, scale: int) -> np.ndarray:
+    """Valores con decimales -> enteros en unidades de 1/scale."""
+    return round_half_up(np.asarray(values, dtype=float) * scale)
+
+def to_cents(euros: Any) -> np.ndarray:
+    return to_fixed(euros, CENTS)
+
+def to_hundredths(hours: Any) -> np.ndarray:
+    return to_fixed(hours, HUNDREDTHS)
+
+def to_euros(cents: Any) -> Any:
+    """Céntimos -> euros (float) para mostrar o escribir."""
+    return np.asarray(cents, dtype=np.int64) / CENTS
+
+def to_hours(hundredths: Any) -> Any:
+    return np.asarray(hundredths, dtype=np.int64) / HUNDREDTHS
+
+def amount_cents(hundredths: Any, price_hour: Any) -> np.ndarray:
+    """
+    Importe en céntimos de `hundredths` centésimas de hora a `price_hour` €/h.
+    centésimas x €/h = céntimos: el precio no se redondea y hay un único redondeo.
+    """
+    return round_half_up(np.asarray(hundredths, dtype=np.int64) * np.asarray(price_hour, dtype=float))
+
+def group_sum(idx: np.ndarray, values: np.ndarray, size: int) -> np.ndarray:
+    """Suma por grupo exacta en int64 (np.bincount acumula en float64)."""
+    out = np.zeros(size, dtype=np.int64)
+    np.add.at(out, idx, np.asarray(values, dtype=np.int64))
+    return out
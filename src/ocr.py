@@ -0,0 +1,146 @@
+import io
+import os
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# --- OCR OPCIONAL PARA CUADRANTES ESCANEADOS ---
+# Solo se usa en páginas sin capa de texto. Requiere Tesseract instalado en el
+# sistema y el paquete 'pytesseract'; si no están, el parser sigue como siempre.
+
+OCR_RESOLUTION = 300          # DPI de renderizado de la página
+OCR_LANG = "spa"
+OCR_MIN_CONFIDENCE = 30.0     # Palabras con menos confianza se descartan
+OCR_MAX_WORKERS = max(1, min(4, (os.cpu_count() or 1) // 2))
+OCR_CACHE_MAX = 128
+
+# Palabra OCR en coordenadas PDF (puntos): (texto, x0, top, x1, bottom)
+OcrWord = Tuple[str, float, float, float, float]
+
+@lru_cache(maxsize=1)
+def ocr_available() -> bool:
+    try:
+        import pytesseract
+    except ImportError:
+        return False
+    return shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+def needs_ocr(page: Any) -> bool:
+    """Página escaneada: no tiene ningún carácter en la capa de texto."""
+    return not page.chars
+
+# --- CACHÉ POR HASH DE IMAGEN ---
+_ocr_cache: "OrderedDict[str, List[OcrWord]]" = OrderedDict()
+_ocr_cache_lock = threading.Lock()
+
+def clear_ocr_cache() -> None:
+    with _ocr_cache_lock: _ocr_cache.clear()
+
+def _cache_get(key: str) -> Optional[List[OcrWord]]:
+    with _ocr_cache_lock:
+        words = _ocr_cache.get(key)
+        if words is not None: _ocr_cache.move_to_end(key)
+        return words
+
+def _cache_put(key: str, words: List[OcrWord]) -> None:
+    with _ocr_cache_lock:
+        _ocr_cache[key] = words
+        _ocr_cache.move_to_end(key)
+        while len(_ocr_cache) > OCR_CACHE_MAX: _ocr_cache.popitem(last=False)
+
+# --- POOL DE PROCESOS ACOTADO (COMPARTIDO POR TODAS LAS EXTRACCIONES) ---
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+_ocr_pool_lock = threading.Lock()
+
+def get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None: _ocr_pool = ProcessPoolExecutor(max_workers=OCR_MAX_WORKERS)
+        return _ocr_pool
+
+def shutdown_ocr_pool() -> None:
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is not None: _ocr_pool.shutdown(wait=True)
+        _ocr_pool = None
+
+def _ocr_png(png: bytes, lang: str, min_conf: float) -> List[Tuple[str, int, int, int, int]]:
+    """Ejecuta Tesseract sobre una imagen PNG (en un proceso del pool). Coordenadas en píxeles."""
+    import pytesseract
+    from PIL import Image
+
+    data = pytesseract.image_to_data(Image.open(io.BytesIO(png)), lang=lang, output_type=pytesseract.Output.DICT)
+    words = []
+    for text, conf, left, top, width, height in zip(data['text'], data['conf'], data['left'], data['top'], data['width'], data['height']):
+        text = (text or "").strip()
+        if not text or float(conf) < min_conf: continue
+        words.append((text, left, top, left + width, top + height))
+    return words
+
+def _render_png(page: Any, resolution: int) -> bytes:
+    buf = io.BytesIO()
+    page.render(resolution).save(buf, format="PNG")
+    return buf.getvalue()
+
+OCR_UNAVAILABLE = "Página sin texto y OCR no disponible (instale Tesseract y 'pytesseract')"
+
+def ocr_pages(pages: Sequence[Any], indices: Sequence[int], lang: str = OCR_LANG,
+              resolution: int = OCR_RESOLUTION, recorder: Any = None, doc: int = -1) -> Dict[int, List[OcrWord]]:
+    """
+    OCR de las páginas indicadas. Las imágenes se renderizan aquí y se reconocen en
+    el pool acotado; los resultados se cachean por hash de la imagen.
+    recorder: ExtractionRecorder (src.diagnostics) del documento `doc`. Las páginas
+    sin OCR disponible quedan como avisos y los fallos de OCR como errores de página.
+    Retorna {índice de página: palabras en coordenadas PDF}.
+    """
+    if not indices: return {}
+    if not ocr_available():
+        if recorder is not None:
+            for i in indices: recorder.record_warning(doc, OCR_UNAVAILABLE, i)
+        return {}
+
+    scale = 72.0 / resolution
+    results: Dict[int, List[OcrWord]] = {}
+    pending = {}
+    for i in indices:
+        png = _render_png(pages[i], resolution)
+        key = f"{lang}:{resolution}:{hashlib.sha1(png).hexdigest()}"
+        cached = _cache_get(key)
+        if cached is not None: results[i] = cached
+        else: pending[i] = (key, get_ocr_pool().submit(_ocr_png, png, lang, OCR_MIN_CONFIDENCE))
+
+    for i, (key, future) in pending.items():
+        try:
+            raw = future.result()
+        except Exception as e:
+            if recorder is not None: recorder.record_error(doc, e, i)
+            continue
+        words = [(t, x0 * scale, top * scale, x1 * scale, bottom * scale) for t, x0, top, x1, bottom in raw]
+        _cache_put(key, words)
+        results[i] = words
+    return results
+
+# --- RECONSTRUCCIÓN DE LÍNEAS ---
+
+def group_ocr_lines(words: Sequence[OcrWord]) -> List[List[OcrWord]]:
+    """Agrupa palabras en líneas por solape vertical; cada línea ordenada de izquierda a derecha."""
+    lines: List[List[OcrWord]] = []
+    bounds: List[Tuple[float, float]] = []
+    for w in sorted(words, key=lambda w: (w[2], w[1])):
+        mid = (w[2] + w[4]) / 2
+        if bounds and bounds[-1][0] <= mid <= bounds[-1][1]:
+            lines[-1].append(w)
+            top, bottom = bounds[-1]
+            bounds[-1] = (min(top, w[2]), max(bottom, w[4]))
+        else:
+            lines.append([w])
+            bounds.append((w[2], w[4]))
+    return [sorted(line, key=lambda w: w[1]) for line in lines]
+
+def ocr_words_to_text(words: Sequence[OcrWord]) -> str:
+    """Texto plano equivalente a extract_text() (una línea por renglón)."""
+    return "\n".join(" ".join(w[0] for w in line) for line in group_ocr_lines(words))
@@ -1,9 +1,116 @@
-import pdfplumber
+import numpy as np
 import pandas as pd
 import re
+import io
+import os
+import mmap
 import calendar
+import hashlib
+import threading
+from bisect import bisect_right
+from time import perf_counter_ns
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
-from typing import Dict, Any, List, Optional, Tuple, Set
+from typing import Dict, Any, List, Optional, Tuple, Set, Iterator, Union
+
+from src.calendar_index import get_calendar, to_day_numbers, from_day_numbers
+from src.ocr import OcrWord, group_ocr_lines, needs_ocr, ocr_pages, ocr_words_to_text
+from src.diagnostics import ExtractionRecorder, SOURCE_OCR, SOURCE_TEXT
+from src.pdf_backend import PDF_BACKENDS, PdfPage, get_backend
+from src.text_scan import EV_AMOUNT, EV_CODE, EV_DATE, EV_TIME_RANGE, amount_value, last_amount, scan_text
+
+# Tipos de entrada admitidos por los puntos de entrada del parser
+PdfSource = Union[str, os.PathLike, bytes, bytearray, memoryview, mmap.mmap, Any]
+
+# --- 0. ENTRADA DE PDFs (SIN COPIAS) ---
+
+class _BufferStream(io.RawIOBase):
+    """
+    Stream de solo lectura sobre un buffer en memoria (bytes, memoryview, mmap).
+    A diferencia de BytesIO, no copia el buffer completo: solo se copian los
+    fragmentos que pdfminer va leyendo.
+    """
+    def __init__(self, buffer: Any):
+        super().__init__()
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def readable(self) -> bool: return True
+    def seekable(self) -> bool: return True
+    def tell(self) -> int: return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET: new_pos = offset
+        elif whence == io.SEEK_CUR: new_pos = self._pos + offset
+        elif whence == io.SEEK_END: new_pos = len(self._view) + offset
+        else: raise ValueError(f"whence inválido: {whence}")
+        if new_pos < 0: raise ValueError("Posición negativa")
+        self._pos = new_pos
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        chunk = self._view[self._pos:end].tobytes()
+        self._pos = max(self._pos, end)
+        return chunk
+
+    def readinto(self, b: Any) -> int:
+        chunk = self.read(len(b))
+        b[:len(chunk)] = chunk
+        return len(chunk)
+
+    def close(self) -> None:
+        if not self.closed: self._view.release()
+        super().close()
+
+@contextmanager
+def open_pdf_source(source: PdfSource, backend: Any = None) -> Iterator[List[PdfPage]]:
+    """
+    Abre un PDF con el motor indicado (por defecto pdfplumber; ver src.pdf_backend)
+    y devuelve sus páginas. Acepta de forma uniforme:
+    - Rutas (str / PathLike) -> se mapean en memoria (mmap), sin leerlas enteras.
+    - bytes / bytearray / memoryview / mmap -> se leen sin copiar el buffer.
+    - Ficheros abiertos o subidos (st.file_uploader, BytesIO) -> se reutiliza su
+      buffer interno si existe; si tienen descriptor real, se mapean en memoria.
+    """
+    engine = get_backend(backend)
+    owned = []  # Recursos que abrimos nosotros y debemos cerrar
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            f = open(source, 'rb'); owned.append(f)
+            stream = _mmap_file(f, owned) or f
+        elif isinstance(source, mmap.mmap):
+            stream = _BufferStream(source); owned.append(stream)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            stream = _BufferStream(source); owned.append(stream)
+        elif hasattr(source, 'getbuffer'):
+            # BytesIO / UploadedFile: vista directa sobre su buffer interno
+            stream = _BufferStream(source.getbuffer()); owned.append(stream)
+        else:
+            stream = _mmap_file(source, owned) or source
+            if hasattr(stream, 'seek'): stream.seek(0)
+
+        with engine.open(stream) as pages:
+            yield pages
+    finally:
+        for res in reversed(owned):
+            try: res.close()
+            except (BufferError, ValueError, OSError): pass
+
+def _mmap_file(f: Any, owned: List[Any]) -> Optional[_BufferStream]:
+    """Mapea en memoria un fichero con descriptor real. None si no es posible."""
+    try:
+        fileno = f.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    try:
+        mm = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        return None  # Fichero vacío o no mapeable
+    owned.append(mm)
+    stream = _BufferStream(mm); owned.append(stream)
+    return stream
 
 # --- 1. LIMPIEZA Y UTILIDADES ---
 
@@ -12,11 +119,7 @@ def extract_last_amount(text: str) -> float:
     clean_text = text.replace("€", "").strip()
     matches = re.findall(r"(?:\d{1,3}(?:\.\d{3})*,\d{2})", clean_text)
     if not matches: matches = re.findall(r"(?:\d{1,3}(?:,\d{3})*\.\d{2})", clean_text)
-    if matches:
-        last_val = matches[-1]
-        if "," in last_val and "." in last_val: return float(last_val.replace('.', '').replace(',', '.'))
-        elif "," in last_val: return float(last_val.replace(',', '.'))
-        else: return float(last_val)
+    if matches: return amount_value(matches[-1])
     return 0.0
 
 def clean_code_universal(text: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
@@ -94,28 +197,51 @@ def get_unique_codes(df: pd.DataFrame) -> List[str]:
     codes = df['Codigo'].unique().tolist()
     return sorted([str(c) for c in codes if c and str(c).strip()])
 
+# Regla usuario: un bloque de vacaciones debe tener MÁS de 14 días
+VACATION_MIN_BLOCK = 14
+
+def run_lengths(days: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Bloques de días consecutivos en un array ORDENADO de días (int).
+    Retorna (id de bloque por elemento, tamaño de cada bloque).
+    """
+    if len(days) == 0: return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    new_block = np.ones(len(days), dtype=bool)
+    new_block[1:] = np.diff(days) != 1
+    block_id = np.cumsum(new_block) - 1
+    return block_id, np.bincount(block_id)
+
 def get_vacation_periods(df: pd.DataFrame) -> Tuple[int, List[Tuple[date, date]]]:
     if df.empty or 'Codigo' not in df.columns: return 0, []
     # SOLO cuenta como periodo de vacaciones si es explícitamente V o VAC
-    v_days_df = df[df['Codigo'].isin(['V', 'VAC'])]
-    if v_days_df.empty: return 0, []
-    
-    dates = sorted(v_days_df['Fecha'].unique())
-    if not dates: return 0, []
-    periods = []
-    curr_start = dates[0]; curr_end = dates[0]
-    for i in range(1, len(dates)):
-        if (dates[i] - dates[i-1]).days == 1: curr_end = dates[i]
-        else: periods.append((curr_start, curr_end)); curr_start = dates[i]; curr_end = dates[i]
-    periods.append((curr_start, curr_end))
-    return len(dates), periods
+    v_dates = df.loc[df['Codigo'].isin(['V', 'VAC']), 'Fecha']
+    if v_dates.empty: return 0, []
+
+    days = np.unique(to_day_numbers(v_dates))
+    block_id, sizes = run_lengths(days)
+    ends = np.cumsum(sizes) - 1
+    starts = ends - sizes + 1
+    periods = list(zip(from_day_numbers(days[starts]), from_day_numbers(days[ends])))
+    return len(days), periods
+
+def assign_vacation_periods(dates: Any, periods: List[Tuple[date, date]]) -> np.ndarray:
+    """
+    Cruce por intervalos: índice del periodo de vacaciones que contiene cada fecha
+    (-1 si ninguno). Los periodos deben estar ordenados y no solaparse.
+    """
+    days = to_day_numbers(dates)
+    if not periods: return np.full(len(days), -1, dtype=np.int64)
+    starts = to_day_numbers([p[0] for p in periods])
+    ends = to_day_numbers([p[1] for p in periods])
+    idx = np.searchsorted(starts, days, side='right') - 1
+    inside = (idx >= 0) & (days <= ends[np.clip(idx, 0, None)])
+    return np.where(inside, idx, -1)
 
 def extract_holidays_from_text(text_content: str, year: int) -> Set[date]:
     holidays = set()
-    pattern_strict = r"(\d{2}/\d{2}/\d{4})"
-    for match in re.finditer(pattern_strict, text_content):
+    for ev in scan_text(text_content).of(EV_DATE):
         try:
-            d = datetime.strptime(match.group(1), "%d/%m/%Y").date()
+            d = datetime.strptime(ev.value, "%d/%m/%Y").date()
             if d.year == year: holidays.add(d)
         except ValueError: pass
     return holidays
@@ -128,30 +254,32 @@ def parse_dynamic_legend(text: str) -> Dict[str, Any]:
     # 1. ESCANEO ROBUSTO POR PROXIMIDAD
     # En lugar de un solo regex gigante, buscamos códigos y rangos por separado y los casamos por distancia.
 
-    # A. Buscar todos los códigos potenciales (3-4 dígitos aislados)
+    # Ambos salen del mismo escaneo del texto (ver src/text_scan.py)
+    scan = scan_text(text)
+
+    # A. Todos los códigos potenciales (3-4 dígitos aislados)
     # Preferimos los que tengan ":" después, pero aceptamos sin ":" si no hay mejor opción
-    code_matches = list(re.finditer(r"\b(?P<code>\d{3,4})\b", text))
+    code_matches = scan.of(EV_CODE)
     
-    # B. Buscar todos los rangos horarios robustos
+    # B. Todos los rangos horarios robustos
     # 13:00-21:00, 8.00 - 15.00
-    range_pat = r"(?P<rng>(?P<start>\d{1,2}[:.]\d{2})\s*[-–—]\s*(?P<end>\d{1,2}[:.]\d{2}))"
-    range_matches = list(re.finditer(range_pat, text))
+    range_matches = scan.of(EV_TIME_RANGE)
     
     PROXIMITY_LIMIT = 350 # Caracteres máx de distancia
     
     processed_codes = set()
     
     for cm in code_matches:
-        code = cm.group("code")
+        code = cm.value
         if code in processed_codes: continue # Ya procesado
-        c_end = cm.end()
+        c_end = cm.end
         
         # Buscar el rango que empiece DESPUÉS del código y esté más cerca
         best_rng = None
         min_dist = 9999
         
         for rm in range_matches:
-            r_start = rm.start()
+            r_start = rm.start
             if r_start > c_end:
                 dist = r_start - c_end
                 
@@ -167,8 +295,8 @@ def parse_dynamic_legend(text: str) -> Dict[str, Any]:
         
         if best_rng:
             try:
-                s = best_rng.group("start").replace('.', ':')
-                e = best_rng.group("end").replace('.', ':')
+                s = best_rng.value[0].replace('.', ':')
+                e = best_rng.value[1].replace('.', ':')
                 
                 fmt = "%H:%M"
                 t_s = datetime.strptime(s, fmt); t_e = datetime.strptime(e, fmt)
@@ -236,127 +364,451 @@ def parse_dynamic_legend(text: str) -> Dict[str, Any]:
 
 # --- 3. EXTRACCIÓN ESPACIAL ---
 
-def extract_data_from_pdf(pdf_path: str, year: Optional[int] = None) -> Tuple[pd.DataFrame, Dict[str, Any], List[date]]:
+MONTH_MAP = {
+    "ENE": 1, "FEB": 2, "MAR": 3, "ABR": 4, "MAY": 5, "JUN": 6,
+    "JUL": 7, "AGO": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DIC": 12,
+    "ENERO": 1, "FEBRERO": 2, "MARZO": 3, "ABRIL": 4, "MAYO": 5, "JUNIO": 6,
+    "JULIO": 7, "AGOSTO": 8, "SEPTIEMBRE": 9, "OCTUBRE": 10, "NOVIEMBRE": 11, "DICIEMBRE": 12
+}
+
+BBox = Tuple[float, float, float, float]
+MonthRow = Tuple[int, Tuple[Optional[BBox], ...]]
+
+# --- CACHÉ DE PLANTILLAS DE MAQUETACIÓN ---
+# Los cuadrantes de una misma empresa comparten rejilla (mismas columnas por día,
+# mismas filas por mes). Guardamos las filas detectadas por huella de página para
+# saltarnos find_tables() en los siguientes PDFs de la misma fuente.
+LAYOUT_CACHE_MAX = 256
+_layout_cache: "OrderedDict[str, List[MonthRow]]" = OrderedDict()
+_layout_cache_lock = threading.Lock()
+
+def clear_layout_cache() -> None:
+    with _layout_cache_lock: _layout_cache.clear()
+
+def match_month(text: Optional[str]) -> Optional[int]:
+    if not text: return None
+    clean = text.strip().upper()
+    for m_name, m_num in MONTH_MAP.items():
+        if clean.startswith(m_name): return m_num
+    return None
+
+def page_fingerprint(page: Any) -> str:
+    """
+    Huella de la geometría de la página: tamaño, líneas de la rejilla y texto de
+    cabecera (franja superior). No depende del contenido de las celdas.
+    """
+    h = hashlib.sha1()
+    h.update(f"{round(page.width)}x{round(page.height)}|".encode())
+    edges = sorted(
+        (e['orientation'], round(e['x0']), round(e['top']), round(e['x1']), round(e['bottom']))
+        for e in page.edges
+    )
+    h.update(repr(edges).encode())
+    header_limit = page.height * 0.1
+    header_text = "".join(c['text'] for c in page.chars if c['top'] < header_limit)
+    h.update(header_text.encode('utf-8', 'replace'))
+    return h.hexdigest()
+
+def detect_month_rows(page: Any) -> List[MonthRow]:
+    """Detección completa: find_tables() y filas cuya primera celda es un mes."""
+    rows: List[MonthRow] = []
+    for table in page.find_tables():
+        for row in table.rows:
+            if not row.cells[0]: continue
+            found_month = match_month(page.crop_text(row.cells[0]))
+            if found_month: rows.append((found_month, tuple(row.cells)))
+    return rows
+
+def _validate_template(page: Any, rows: List[MonthRow]) -> bool:
+    # La primera celda de cada fila debe seguir conteniendo el mismo mes
+    try:
+        return all(match_month(page.crop_text(cells[0])) == m for m, cells in rows)
+    except ValueError:
+        return False  # BBox fuera de la página
+
+def get_month_rows(page: Any, use_cache: bool = True) -> List[MonthRow]:
+    if not use_cache: return detect_month_rows(page)
+
+    key = page_fingerprint(page)
+    with _layout_cache_lock:
+        template = _layout_cache.get(key)
+        if template is not None: _layout_cache.move_to_end(key)
+
+    if template is not None and _validate_template(page, template):
+        return template
+
+    rows = detect_month_rows(page)
+    with _layout_cache_lock:
+        if rows:
+            _layout_cache[key] = rows
+            _layout_cache.move_to_end(key)
+            while len(_layout_cache) > LAYOUT_CACHE_MAX: _layout_cache.popitem(last=False)
+        else:
+            _layout_cache.pop(key, None)
+    return rows
+
+def is_roster_page(page: Any, text: str) -> bool:
+    """
+    Preclasificación barata de una página con capa de texto: la rejilla del
+    cuadrante tiene líneas que empiezan por un mes y líneas de tabla horizontales y
+    verticales. Portadas, firmas y anexos se descartan sin llamar a find_tables().
+    """
+    if not any(match_month(line) for line in text.splitlines()): return False
+    n_h = n_v = 0
+    for e in page.edges:
+        if e['orientation'] == 'h': n_h += 1
+        elif e['orientation'] == 'v': n_v += 1
+        if n_h >= 2 and n_v >= 2: return True
+    return False
+
+def _month_days(year: int, month: int) -> int:
+    try: return calendar.monthrange(year, month)[1]
+    except: return 31
+
+def _row_cells(page: Any, found_month: int, cells: Tuple[Optional[BBox], ...], year: int) -> Iterator[Tuple[int, str]]:
+    num_days = _month_days(year, found_month)
+    for day_idx, cell in enumerate(cells):
+        if day_idx == 0: continue 
+        if day_idx > num_days: break 
+        if not cell: continue
+
+        x0, top, x1, bottom = cell
+        expanded_bbox = (x0, top, x1, bottom + 15) 
+        yield day_idx, page.crop_text(expanded_bbox)
+
+def iter_text_layer_cells(page: Any, year: int, use_cache: bool = True) -> Iterator[Tuple[int, int, str]]:
+    """Celdas (mes, día, texto) de una página con capa de texto, según la rejilla detectada."""
+    for found_month, cells in get_month_rows(page, use_cache):
+        for day_idx, text in _row_cells(page, found_month, cells, year):
+            yield found_month, day_idx, text
+
+# --- CUADRANTES CON VARIOS TRABAJADORES ---
+WORKER_COLUMN = 'Trabajador'
+WORKER_LABEL_RE = re.compile(r"^\s*(?:TRABAJADOR(?:/A)?|EMPLEADO(?:/A)?|AGENTE|NOMBRE)\b\s*[:.\-]?\s*(.+)$", re.IGNORECASE)
+
+def worker_label(text: Optional[str]) -> Optional[str]:
+    """Nombre de una línea 'TRABAJADOR: NOMBRE' (hasta el siguiente 'CAMPO:'), o None."""
+    m = WORKER_LABEL_RE.match(text or "")
+    if not m: return None
+    name = re.split(r"\s+\S+:", m.group(1))[0].strip(" :.-")
+    return name or None
+
+def _word_lines(words: List[Dict[str, Any]]) -> List[Tuple[float, str]]:
+    """Palabras (dicts de extract_words) agrupadas en líneas (top, texto)."""
+    lines: List[Tuple[float, List[str]]] = []
+    for w in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if lines and abs(w['top'] - lines[-1][0]) <= 3: lines[-1][1].append(w['text'])
+        else: lines.append((w['top'], [w['text']]))
+    return [(top, " ".join(parts)) for top, parts in lines]
+
+def _is_day_header(row_text: str) -> bool:
+    # "ENERO 1 2 3 ... 31": fila de cabecera del mes, no de turnos
+    tokens = row_text.split()[1:]
+    return len(tokens) >= 28 and all(t.isdigit() and 1 <= int(t) <= 31 for t in tokens)
+
+def detect_worker_rows(page: Any) -> List[Tuple[int, Tuple[Optional[BBox], ...], Optional[str], float]]:
+    """
+    Filas (mes, celdas, trabajador, top) de un cuadrante con varios trabajadores:
+    - Rotulado: 'TRABAJADOR: NOMBRE' (fila de la rejilla o línea de texto) encima de
+      sus filas de mes. El trabajador se resuelve después por posición (None aquí).
+    - Por meses: cabecera 'MES 1 2 ... 31' seguida de una fila por trabajador con
+      el nombre en la primera celda.
+    """
+    rows = []
+    for table in page.find_tables():
+        header_month = None
+        for row in table.rows:
+            first = row.cells[0]
+            if not first: continue
+            text = page.crop_text(first)
+            found_month = match_month(text)
+            if found_month:
+                header_month = found_month if _is_day_header(page.crop_text(row.bbox)) else None
+                if header_month is None: rows.append((found_month, tuple(row.cells), None, first[1]))
+            elif header_month is not None and text.strip() and worker_label(text) is None:
+                rows.append((header_month, tuple(row.cells), " ".join(text.split()), first[1]))
+    return rows
+
+def worker_page_cells(page: Any, year: int, current: Optional[str] = None) -> Tuple[List[Tuple[int, int, str, Optional[str]]], Optional[str]]:
+    """
+    Celdas (mes, día, texto, trabajador) de una página con varios trabajadores.
+    current: último trabajador rotulado en páginas anteriores (filas sin rótulo encima).
+    Retorna (celdas, trabajador vigente al final de la página).
+    """
+    labels = [(top, name) for top, line in _word_lines(page.extract_words()) if (name := worker_label(line))]
+    label_tops = [top for top, _ in labels]
+    cells_out = []
+    for found_month, cells, worker, top in detect_worker_rows(page):
+        if worker is None:
+            k = bisect_right(label_tops, top) - 1   # Rótulo más cercano por encima
+            worker = labels[k][1] if k >= 0 else current
+        for day_idx, text in _row_cells(page, found_month, cells, year):
+            cells_out.append((found_month, day_idx, text, worker))
+    if labels: current = labels[-1][1]
+    return cells_out, current
+
+def _ocr_day_columns(lines: List[List[OcrWord]], month_lines: List[Tuple[int, List[OcrWord]]]) -> Optional[np.ndarray]:
+    """Centro x de las columnas de los días 1..31 en una página escaneada."""
+    # 1. Cabecera de días: la línea con más números 1..31 en orden creciente de x
+    centers: Dict[int, float] = {}
+    for line in lines:
+        found = {}
+        for text, x0, _, x1, _ in line:
+            if text.isdigit() and 1 <= int(text) <= 31: found.setdefault(int(text), (x0 + x1) / 2)
+        xs = [found[d] for d in sorted(found)]
+        if len(found) > len(centers) and all(a < b for a, b in zip(xs, xs[1:])): centers = found
+    if len(centers) >= 28:
+        known = sorted(centers)
+        return np.interp(np.arange(1, 32), known, [centers[d] for d in known])
+
+    # 2. Sin cabecera: columnas regulares a partir de los centros de las palabras
+    # de las filas de mes (el día 1 es la primera columna con contenido)
+    row_words = [w for _, line in month_lines for w in line[1:]]
+    if len(row_words) < 2: return None
+    xs = np.sort([(w[1] + w[3]) / 2 for w in row_words])
+    width = float(np.median([w[3] - w[1] for w in row_words]))
+    cluster_id = np.concatenate(([0], np.cumsum(np.diff(xs) > width)))
+    col_centers = np.bincount(cluster_id, weights=xs) / np.bincount(cluster_id)
+    if len(col_centers) < 2: return None
+    pitch = float(np.median(np.diff(col_centers)))
+    return col_centers[0] + pitch * np.arange(31)
+
+def iter_ocr_cells(words: List[OcrWord], year: int) -> Iterator[Tuple[int, int, str]]:
+    """
+    Celdas (mes, día, texto) de una página escaneada. Sin rejilla vectorial, las
+    filas salen de las líneas que empiezan por un mes y las columnas de la cabecera
+    de días (o, si no hay, de la separación entre columnas); cada palabra cae en la
+    celda que contiene su centro.
+    """
+    lines = group_ocr_lines(words)
+    month_lines = [(m, line) for line in lines if (m := match_month(line[0][0]))]
+    col_x = _ocr_day_columns(lines, month_lines)
+    if col_x is None: return
+
+    step = (col_x[-1] - col_x[0]) / 30
+    # Límites entre columnas: día d ocupa [bounds[d-1], bounds[d])
+    bounds = np.concatenate(([col_x[0] - step / 2], (col_x[:-1] + col_x[1:]) / 2, [col_x[-1] + step / 2]))
+
+    for k, (found_month, line) in enumerate(month_lines):
+        # Banda de la fila: hasta la siguiente fila de mes (máx. 15 pt bajo la línea, como en la rejilla)
+        top = min(w[2] for w in line)
+        limit = max(w[4] for w in line) + 15
+        if k + 1 < len(month_lines): limit = min(limit, min(w[2] for w in month_lines[k + 1][1]))
+
+        cell_words: Dict[int, List[OcrWord]] = {}
+        for w in words:
+            mid_y = (w[2] + w[4]) / 2
+            if not (top <= mid_y < limit): continue
+            day_idx = int(np.searchsorted(bounds, (w[1] + w[3]) / 2, side='right'))
+            if 1 <= day_idx <= 31: cell_words.setdefault(day_idx, []).append(w)
+
+        num_days = _month_days(year, found_month)
+        for day_idx in sorted(cell_words):
+            if day_idx > num_days: break
+            yield found_month, day_idx, ocr_words_to_text(cell_words[day_idx])
+
+def _source_name(source: PdfSource) -> str:
+    if isinstance(source, (str, os.PathLike)): return os.fspath(source)
+    return str(getattr(source, 'name', None) or type(source).__name__)
+
+def extract_data_from_pdf(pdf_path: PdfSource, year: Optional[int] = None, use_layout_cache: bool = True,
+                          ocr: bool = True, recorder: Optional[ExtractionRecorder] = None,
+                          backend: Any = None, prune_pages: bool = True,
+                          split_workers: bool = False) -> Tuple[pd.DataFrame, Dict[str, Any], List[date]]:
+    """
+    split_workers: cuadrante con varios trabajadores (ver detect_worker_rows). Se
+    lee una sola vez y se añade la columna 'Trabajador' (ver partition_by_worker).
+    Las páginas escaneadas se asignan al último trabajador rotulado.
+    prune_pages: solo buscar la rejilla en páginas candidatas (ver is_roster_page).
+    La leyenda y los festivos se leen siempre del texto completo.
+    backend: motor de lectura del PDF ('pdfplumber' por defecto o 'pdfium').
+    ocr: si hay páginas sin capa de texto (escaneadas), reconocerlas con Tesseract
+    (si está instalado) y procesarlas con el mismo reparto por celdas.
+    recorder: registro opcional de diagnóstico (texto, clasificación y tiempo por celda; errores).
+    """
     if year is None: year = datetime.now().year
     data: List[Dict[str, Any]] = []
     detected_codes_info = {} 
-    
-    month_map = {
-        "ENE": 1, "FEB": 2, "MAR": 3, "ABR": 4, "MAY": 5, "JUN": 6,
-        "JUL": 7, "AGO": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DIC": 12,
-        "ENERO": 1, "FEBRERO": 2, "MARZO": 3, "ABRIL": 4, "MAYO": 5, "JUNIO": 6,
-        "JULIO": 7, "AGOSTO": 8, "SEPTIEMBRE": 9, "OCTUBRE": 10, "NOVIEMBRE": 11, "DICIEMBRE": 12
-    }
+    doc_id = recorder.begin_document(_source_name(pdf_path)) if recorder is not None else -1
+    page_idx = None
+    current_worker = None
 
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            full_text = ""
-            for page in pdf.pages: full_text += (page.extract_text() or "") + "\n"
+        with open_pdf_source(pdf_path, backend) as pages:
+            page_texts = [page.extract_text() or "" for page in pages]
+            ocr_words = ocr_pages(pages, [i for i, page in enumerate(pages) if needs_ocr(page)], recorder=recorder, doc=doc_id) if ocr else {}
+            for i, words in ocr_words.items(): page_texts[i] = ocr_words_to_text(words)
+            full_text = "".join(text + "\n" for text in page_texts)
             
             detected_holidays = sorted(list(extract_holidays_from_text(full_text, year)))
+            holiday_calendar = get_calendar(detected_holidays)
             legend_info = parse_dynamic_legend(full_text)
             detected_codes_info.update(legend_info)
 
-            for page in pdf.pages:
-                tables = page.find_tables()
-                for table in tables:
-                    for row in table.rows:
-                        if not row.cells[0]: continue
-                        
-                        first_cell_text = page.crop(row.cells[0]).extract_text()
-                        if not first_cell_text: continue
-                        first_cell_clean = first_cell_text.strip().upper()
-                        
-                        found_month = None
-                        for m_name, m_num in month_map.items():
-                            if first_cell_clean.startswith(m_name):
-                                found_month = m_num; break
-                        
-                        if found_month:
-                            try: _, num_days = calendar.monthrange(year, found_month)
-                            except: num_days = 31
+            for page_idx, page in enumerate(pages):
+                source = SOURCE_OCR if page_idx in ocr_words else SOURCE_TEXT
+                if recorder is not None: page_start = t0 = perf_counter_ns(); n_cells = 0
+                if source == SOURCE_OCR:
+                    page_cells = ((m, d, t, current_worker) for m, d, t in iter_ocr_cells(ocr_words[page_idx], year))
+                elif prune_pages and not is_roster_page(page, page_texts[page_idx]): page_cells = ()
+                elif split_workers: page_cells, current_worker = worker_page_cells(page, year, current_worker)
+                else: page_cells = ((m, d, t, None) for m, d, t in iter_text_layer_cells(page, year, use_layout_cache))
+
+                for found_month, day_idx, cell_raw_text, worker in page_cells:
+                    # --- PROCESADO MAESTRO (NUEVAS REGLAS) ---
+                    code_shift, code_acronym = clean_code_universal(cell_raw_text)
+                    if recorder is not None:
+                        # Tiempo desde la celda anterior: recorte + extracción de texto + clasificación
+                        t1 = perf_counter_ns(); n_cells += 1
+                        recorder.record_cell(doc_id, page_idx, found_month, day_idx, source, cell_raw_text, code_shift, code_acronym, t1 - t0)
+                        t0 = t1
+                            
+                    # Si code_shift es None (y no es V), es día libre -> IGNORAR
+                    if not code_shift:
+                        continue
+                            
+                    # --- FORMATEO DE SALIDA (CÓDIGO + SIGLAS) ---
+                            
+                    final_code = code_shift
+                    is_vacation = (code_shift == "V")
+                    hours = 0.0
+                            
+                    # 1. Horas: Solo si el código es numérico y está en leyenda
+                    if final_code.isdigit() and final_code in detected_codes_info:
+                        hours = detected_codes_info[final_code]['hours']
+                            
+                    # 2. Descripción: "CÓDIGO SIGLAS"
+                    # Ejemplo: "708 ENF"
+                    # Si es V: "V" (o V Vacaciones si preferimos, pero V es el código)
+                            
+                    parts = [final_code]
+                    if code_acronym:
+                        parts.append(code_acronym)
+                        # Ojo: Si las siglas indican vacación pero el código no era V? 
+                        # (Raro con esta lógica estricta, pero posible si V está en siglas y codigo es 708)
+                        if code_acronym in ["V", "VAC"]: is_vacation = True
+                            
+                    # Buscar descripción textual en leyenda de las siglas
+                    if code_acronym and code_acronym in detected_codes_info:
+                         # Opcional: ¿Queremos poner "ENF (Baja)" o solo "ENF"?
+                         # Usuario dijo: "pondremos el código y a continuación las siglas" -> Literal
+                         pass
+
+                    final_desc = " ".join(parts) # Resultados tipo: "708 ENF", "1308", "V"
+
+                    # Registrar código compuesto si es nuevo
+                    if final_code not in detected_codes_info:
+                        detected_codes_info[final_code] = {
+                            'hours': hours,
+                            'is_vacation': is_vacation,
+                            'description': f"Turno {final_code}" if final_code.isdigit() else "Vacaciones"
+                        }
+
+                    start_t = None
+                    end_t = None
+                            
+                    # Recuperar horas de inicio/fin si existen en la leyenda
+                    if final_code in detected_codes_info:
+                        start_t = detected_codes_info[final_code].get('start_time')
+                        end_t = detected_codes_info[final_code].get('end_time')
+
+                    current_date = date(year, found_month, day_idx)
+                    is_holiday = holiday_calendar.is_holiday(current_date)
                             
-                            for day_idx, cell in enumerate(row.cells):
-                                if day_idx == 0: continue 
-                                if day_idx > num_days: break 
-                                if not cell: continue
-
-                                x0, top, x1, bottom = cell
-                                expanded_bbox = (x0, top, x1, bottom + 15) 
-                                cell_raw_text = page.crop(expanded_bbox).extract_text() or ""
-                                # --- PROCESADO MAESTRO (NUEVAS REGLAS) ---
-                                code_shift, code_acronym = clean_code_universal(cell_raw_text)
-                                
-                                # Si code_shift es None (y no es V), es día libre -> IGNORAR
-                                if not code_shift:
-                                    continue
-                                
-                                # --- FORMATEO DE SALIDA (CÓDIGO + SIGLAS) ---
-                                
-                                final_code = code_shift
-                                is_vacation = (code_shift == "V")
-                                hours = 0.0
-                                
-                                # 1. Horas: Solo si el código es numérico y está en leyenda
-                                if final_code.isdigit() and final_code in detected_codes_info:
-                                    hours = detected_codes_info[final_code]['hours']
-                                
-                                # 2. Descripción: "CÓDIGO SIGLAS"
-                                # Ejemplo: "708 ENF"
-                                # Si es V: "V" (o V Vacaciones si preferimos, pero V es el código)
-                                
-                                parts = [final_code]
-                                if code_acronym:
-                                    parts.append(code_acronym)
-                                    # Ojo: Si las siglas indican vacación pero el código no era V? 
-                                    # (Raro con esta lógica estricta, pero posible si V está en siglas y codigo es 708)
-                                    if code_acronym in ["V", "VAC"]: is_vacation = True
-                                
-                                # Buscar descripción textual en leyenda de las siglas
-                                if code_acronym and code_acronym in detected_codes_info:
-                                     # Opcional: ¿Queremos poner "ENF (Baja)" o solo "ENF"?
-                                     # Usuario dijo: "pondremos el código y a continuación las siglas" -> Literal
-                                     pass
-
-                                final_desc = " ".join(parts) # Resultados tipo: "708 ENF", "1308", "V"
-
-                                # Registrar código compuesto si es nuevo
-                                if final_code not in detected_codes_info:
-                                    detected_codes_info[final_code] = {
-                                        'hours': hours,
-                                        'is_vacation': is_vacation,
-                                        'description': f"Turno {final_code}" if final_code.isdigit() else "Vacaciones"
-                                    }
-
-                                start_t = None
-                                end_t = None
-                                
-                                # Recuperar horas de inicio/fin si existen en la leyenda
-                                if final_code in detected_codes_info:
-                                    start_t = detected_codes_info[final_code].get('start_time')
-                                    end_t = detected_codes_info[final_code].get('end_time')
-
-                                current_date = date(year, found_month, day_idx)
-                                is_holiday = current_date in detected_holidays
-                                
-                                entry = {
-                                    "Fecha": current_date, "Mes": found_month, "Dia": day_idx,
-                                    "Codigo": final_desc, # Ponemos la descripción compuesta en la columna Código para ver "708 ENF"
-                                    "Tipo_Jornada": "Festivo" if is_holiday else "Ordinario",
-                                    "is_vacation": is_vacation, # Flag para post-procesado
-                                    "Hora_Inicio": start_t,
-                                    "Hora_Fin": end_t
-                                }
-                                data.append(entry)
+                    entry = {
+                        "Fecha": current_date, "Mes": found_month, "Dia": day_idx,
+                        "Codigo": final_desc, # Ponemos la descripción compuesta en la columna Código para ver "708 ENF"
+                        "Tipo_Jornada": "Festivo" if is_holiday else "Ordinario",
+                        "is_vacation": is_vacation, # Flag para post-procesado
+                        "Hora_Inicio": start_t,
+                        "Hora_Fin": end_t
+                    }
+                    if split_workers: entry[WORKER_COLUMN] = worker or ""
+                    data.append(entry)
+
+                if recorder is not None: recorder.record_page(doc_id, page_idx, source, n_cells, perf_counter_ns() - page_start)
 
     except Exception as e:
         print(f"Error parsing PDF: {e}")
+        if recorder is not None: recorder.record_error(doc_id, e, page_idx)
         return pd.DataFrame(), {}, []
     
     # --- POST-PROCESADO: FILTRO DE VACACIONES ---
-    data = filter_short_vacations(data)
+    if not data: return pd.DataFrame(), detected_codes_info, detected_holidays
+    df = filter_short_vacations_frame(pd.DataFrame(data), by=WORKER_COLUMN if split_workers else None)
+
+    return df, detected_codes_info, detected_holidays
 
-    return pd.DataFrame(data), detected_codes_info, detected_holidays
+def benchmark_backends(sources: List[PdfSource], year: Optional[int] = None, backends: Optional[List[str]] = None,
+                       repeat: int = 1) -> pd.DataFrame:
+    """
+    Ejecuta extract_data_from_pdf con cada motor sobre el mismo corpus (sin caché
+    de plantillas). Una fila por (documento, motor): tiempo medio, filas extraídas
+    y si el resultado coincide con el del primer motor.
+    """
+    backends = backends or list(PDF_BACKENDS)
+    rows = []
+    for source in sources:
+        reference = None
+        for name in backends:
+            elapsed = []
+            for _ in range(max(1, repeat)):
+                t0 = perf_counter_ns()
+                result = extract_data_from_pdf(source, year, use_layout_cache=False, ocr=False, backend=name)
+                elapsed.append(perf_counter_ns() - t0)
+            df, info, holidays = result
+            if reference is None: reference = result
+            same = df.equals(reference[0]) and info == reference[1] and holidays == reference[2]
+            rows.append({'Documento': _source_name(source), 'Motor': name, 'Tiempo_ms': float(np.mean(elapsed)) / 1e6,
+                         'Filas': len(df), 'Coincide': same})
+    return pd.DataFrame(rows, columns=['Documento', 'Motor', 'Tiempo_ms', 'Filas', 'Coincide'])
+
+def short_vacation_mask(days: np.ndarray, is_vac: np.ndarray) -> np.ndarray:
+    """
+    Máscara de filas a ELIMINAR: vacaciones que no forman un bloque de más de
+    VACATION_MIN_BLOCK días. `days` debe venir ordenado cronológicamente.
+    """
+    remove = np.zeros(len(days), dtype=bool)
+    vac_pos = np.flatnonzero(is_vac)
+    if not len(vac_pos): return remove
+    block_id, sizes = run_lengths(days[vac_pos])
+    remove[vac_pos[sizes[block_id] <= VACATION_MIN_BLOCK]] = True
+    return remove
+
+def _vacation_flags(is_vacation: pd.Series, codes: pd.Series) -> np.ndarray:
+    return is_vacation.fillna(False).astype(bool).to_numpy() | codes.str.startswith('V', na=False).to_numpy(dtype=bool)
+
+def filter_short_vacations_frame(df: pd.DataFrame, by: Optional[str] = None) -> pd.DataFrame:
+    """
+    Versión vectorizada de filter_short_vacations sobre un DataFrame.
+    by: columna de trabajador; los bloques se cuentan por trabajador (orden: trabajador, fecha).
+    """
+    if df.empty: return df
+    df = df.sort_values('Fecha' if by is None else [by, 'Fecha'], kind='stable').reset_index(drop=True)
+    is_vac = _vacation_flags(
+        df['is_vacation'] if 'is_vacation' in df.columns else pd.Series(False, index=df.index),
+        df['Codigo'].astype(object) if 'Codigo' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    )
+    days = to_day_numbers(df['Fecha'])
+    # Desplazar cada trabajador para que sus bloques nunca sean consecutivos con los de otro
+    if by is not None: days = days + pd.factorize(df[by])[0].astype(np.int64) * 1_000_000
+    remove = short_vacation_mask(days, is_vac)
+    return df[~remove].reset_index(drop=True)
+
+def partition_by_worker(df: pd.DataFrame, by: str = WORKER_COLUMN) -> Dict[str, pd.DataFrame]:
+    """
+    Particiones {trabajador: filas} de un cuadrante leído con split_workers=True.
+    Con el DataFrame ya ordenado por trabajador son cortes contiguos (un solo orden).
+    """
+    if df.empty or by not in df.columns: return {}
+    codes, uniques = pd.factorize(df[by])
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    contiguous = bool(np.all(np.diff(codes) >= 0))
+    return {
+        str(name): df.iloc[bounds[k]:bounds[k + 1]] if contiguous else df.iloc[order[bounds[k]:bounds[k + 1]]]
+        for k, name in enumerate(uniques)
+    }
 
 def filter_short_vacations(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
@@ -368,38 +820,12 @@ def filter_short_vacations(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     # Ordenar cronológicamente para detectar secuencias
     data.sort(key=lambda x: x['Fecha'])
     
-    # Identificar índices que son vacaciones
-    vac_indices = [i for i, x in enumerate(data) if x.get('is_vacation') or cast_to_str(x.get('Codigo')).startswith('V')]
-    
-    if not vac_indices: return data
-    
-    to_remove = set()
-    current_block = []
-    
-    for i, idx in enumerate(vac_indices):
-        if not current_block:
-            current_block.append(idx)
-        else:
-            prev_idx = current_block[-1]
-            prev_date = data[prev_idx]['Fecha']
-            curr_date = data[idx]['Fecha']
-            
-            # Chequeamos continuidad (diferencia de 1 día)
-            if (curr_date - prev_date).days == 1:
-                current_block.append(idx)
-            else:
-                # Fin del bloque anterior
-                # Si longitud <= 14, eliminar (debe ser > 14)
-                if len(current_block) <= 14:
-                     to_remove.update(current_block)
-                current_block = [idx] # Iniciar nuevo bloque
-    
-    # Procesar último bloque
-    if current_block and len(current_block) <= 14:
-        to_remove.update(current_block)
-    
-    # Retornar lista filtrada
-    return [x for i, x in enumerate(data) if i not in to_remove]
+    is_vac = _vacation_flags(
+        pd.Series([x.get('is_vacation') for x in data], dtype=object),
+        pd.Series([x.get('Codigo') for x in data], dtype=object)
+    )
+    remove = short_vacation_mask(to_day_numbers([x['Fecha'] for x in data]), is_vac)
+    return [x for x, drop in zip(data, remove) if not drop]
 
 def cast_to_str(val: Any) -> str:
     return str(val) if val is not None else ""
@@ -413,9 +839,16 @@ def parse_payroll_text(text: str, tables: List[List[List[str]]] = None) -> Dict[
         'company': "N/D", 'worker': "N/D", 'categoria': "N/D", 'antiguedad_fecha': "N/D",
         'tercera_paga': 0.0, 'is_prorated': False
     }
-    lines = [l.strip() for l in text.split('\n') if l.strip()]
-    match_year = re.search(r"\b(202\d)\b", text)
-    if match_year: results['year'] = int(match_year.group(1))
+    # Un único escaneo del texto: fechas, códigos (años), importes y palabras clave por línea
+    scan = scan_text(text)
+    raw_lines = text.split('\n')
+    line_ids = [i for i, l in enumerate(raw_lines) if l.strip()]
+    keywords = scan.keywords_by_line()
+    amounts = scan.by_line(EV_AMOUNT)
+    no_keywords: Set[str] = set()
+
+    match_year = next((ev.value for ev in scan.of(EV_CODE) if len(ev.value) == 4 and ev.value.startswith("202")), None)
+    if match_year: results['year'] = int(match_year)
 
     if tables:
         for table in tables:
@@ -449,9 +882,9 @@ def parse_payroll_text(text: str, tables: List[List[List[str]]] = None) -> Dict[
                                     results['antiguedad_fecha'] = date_match.group(1); break
 
     if results['company'] == "N/D":
-        for line in lines[:25]:
-            if "AMBULANCIAS" in line.upper():
-                results['company'] = line.strip()
+        for i in line_ids[:25]:
+            if "AMBULANCIAS" in keywords.get(i, no_keywords):
+                results['company'] = raw_lines[i].strip()
                 break
 
     results['paga_beneficios'] = 0.0 
@@ -459,30 +892,30 @@ def parse_payroll_text(text: str, tables: List[List[List[str]]] = None) -> Dict[
     
     # Intentar detectar mes por fechas en el texto (ej: "01/03/2025", "MARZO")
     # Buscamos rango liquidación o fechas generales
-    fechas_found = re.findall(r"(\d{2})/(\d{2})/(\d{4})", text)
+    fechas_found = scan.of(EV_DATE)
     if fechas_found:
         # Usamos la primera fecha o la más frecuente como referencia de mes
         # Generalmente la fecha de inicio/fin del periodo está arriba
         try:
-             _, m, _ = fechas_found[0]
+             _, m, _ = fechas_found[0].value.split("/")
              results['month'] = int(m)
         except: pass
         
-    for line in lines:
-        upper = line.upper()
-        if "TOTAL" in upper or ("BASE" in upper and "COTIZACION" in upper): continue
-        amount = extract_last_amount(line)
+    for i in line_ids:
+        kw = keywords.get(i, no_keywords) # Palabras clave presentes en la línea
+        if "TOTAL" in kw or ("BASE" in kw and "COTIZACION" in kw): continue
+        amount = last_amount(amounts.get(i, []))
         if amount == 0.0: continue
         
         # Detección específica por NOMBRE
         # Usuario: "el concepto que viene es PAGA MARZO"
         # También mantenemos BENEFICIOS por si acaso
-        if ("PAGA" in upper and "MARZO" in upper) or "BENEFICIOS" in upper or "Bº" in upper or "BENEF." in upper:
+        if ("PAGA" in kw and "MARZO" in kw) or "BENEFICIOS" in kw or "Bº" in kw or "BENEF." in kw:
             results['paga_beneficios'] += amount
             continue
             
         # Detección general con lógica de MES si no se detectó por nombre
-        es_paga_extra = any(x in upper for x in ["PAGA", "EXTRA", "ATRASOS", "NAVIDAD", "LIQUIDACION"])
+        es_paga_extra = any(x in kw for x in ["PAGA", "EXTRA", "ATRASOS", "NAVIDAD", "LIQUIDACION"])
         
         if es_paga_extra: 
             # Si estamos en MARZO y es una paga extra (y no hemos sumado ya beneficios por nombre explícito)
@@ -493,31 +926,32 @@ def parse_payroll_text(text: str, tables: List[List[List[str]]] = None) -> Dict[
                  results['paga_extra'] += amount
             continue 
         
-        if "SALARIO BASE" in upper: results['salario_base'] = amount
-        elif "ANTIGUEDAD" in upper: results['antiguedad'] = amount
-        elif "CONVENIO" in upper: 
-            if "SEGURO" not in upper: results['plus_convenio'] = amount
-        elif "NOCTURN" in upper: results['nocturnidad'] += amount
-        elif "FESTIV" in upper: results['festividad'] += amount
-        elif "DIETA" in upper or "MANUTENCION" in upper: results['dietas'] += amount
+        if "SALARIO BASE" in kw: results['salario_base'] = amount
+        elif "ANTIGUEDAD" in kw: results['antiguedad'] = amount
+        elif "CONVENIO" in kw: 
+            if "SEGURO" not in kw: results['plus_convenio'] = amount
+        elif "NOCTURN" in kw: results['nocturnidad'] += amount
+        elif "FESTIV" in kw: results['festividad'] += amount
+        elif "DIETA" in kw or "MANUTENCION" in kw: results['dietas'] += amount
 
     base_calc = results['salario_base'] + results['antiguedad'] + results['plus_convenio']
     results['tercera_paga'] = base_calc 
     return results
 
-def extract_payroll_data(pdf_path: str) -> Dict[str, Any]:
+def extract_payroll_data(pdf_path: PdfSource, backend: Any = None) -> Dict[str, Any]:
     text = ""
     tables = []
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for p in pdf.pages: 
+        with open_pdf_source(pdf_path, backend) as pages:
+            for p in pages: 
                 text += (p.extract_text() or "") + "\n"
                 extracted_tables = p.extract_tables()
                 if extracted_tables: tables.extend(extracted_tables)
     except: return {}
     return parse_payroll_text(text, tables)
 
-def analyze_annual_payroll(pdf_files: List[Any]) -> Dict[str, Any]:
+def analyze_annual_payroll(pdf_files: List[Any], backend: Any = None, pool: Any = None) -> Dict[str, Any]:
+    """pool: WarmWorkerPool (src.worker_pool) para leer las nóminas en paralelo."""
     aggregated = {
         'salario_base': 0.0, 'antiguedad': 0.0, 'plus_convenio': 0.0, 
         'nocturnidad': 0.0, 'festividad': 0.0, 'dietas': 0.0, 
@@ -528,8 +962,9 @@ def analyze_annual_payroll(pdf_files: List[Any]) -> Dict[str, Any]:
     }
     
     # 1. Analizar cada nómina
-    for pdf_file in pdf_files:
-        data = extract_payroll_data(pdf_file)
+    if pool is not None: parsed = pool.map('payroll', pdf_files, backend)
+    else: parsed = (extract_payroll_data(pdf_file, backend) for pdf_file in pdf_files)
+    for data in parsed:
         
         # Conceptos Estructurales (Maximizamos porque suelen ser fijos anuales, salvo subidas)
         if data['salario_base'] > aggregated['salario_base']: aggregated['salario_base'] = data['salario_base']
@@ -0,0 +1,224 @@
+import numpy as np
+import pdfplumber
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pdfplumber import utils as plumber_utils
+from pdfplumber.page import test_proposed_bbox
+from pdfplumber.table import TableFinder, TableSettings
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# --- MOTORES DE LECTURA DE PDF ---
+# El parser solo usa esta interfaz de página: tamaño, caracteres y palabras con
+# su caja, líneas de la rejilla (edges), texto completo o de un recorte, tablas y
+# renderizado para OCR. pdfplumber (pdfminer, Python puro) es el motor por
+# defecto; 'pdfium' lee texto, cajas y trazados con PDFium (pypdfium2) y reutiliza
+# las utilidades de texto y tablas de pdfplumber sobre esos objetos.
+
+BBox = Tuple[float, float, float, float]
+
+class PdfPage(ABC):
+    """
+    Página de un motor. Coordenadas en puntos PDF con origen arriba a la izquierda (como pdfplumber).
+    Un motor que no implemente algún método falla al crear la página, no a mitad de lectura.
+    """
+    width: float
+    height: float
+
+    @property
+    def bbox(self) -> BBox:
+        return (0, 0, self.width, self.height)
+
+    @property
+    @abstractmethod
+    def chars(self) -> List[Dict[str, Any]]: ...
+    @property
+    @abstractmethod
+    def edges(self) -> List[Dict[str, Any]]: ...
+    @abstractmethod
+    def extract_text(self) -> str: ...
+    @abstractmethod
+    def extract_words(self) -> List[Dict[str, Any]]: ...
+    @abstractmethod
+    def crop_text(self, bbox: BBox) -> str:
+        """Texto de los caracteres que solapan bbox. ValueError si bbox se sale de la página."""
+    @abstractmethod
+    def find_tables(self) -> List[Any]:
+        """Tablas por líneas de la rejilla (objetos con .rows[i].cells, como pdfplumber)."""
+    @abstractmethod
+    def extract_tables(self) -> List[List[List[Optional[str]]]]: ...
+    @abstractmethod
+    def render(self, resolution: int) -> Any:
+        """Imagen PIL de la página a `resolution` DPI."""
+
+class PlumberPage(PdfPage):
+    def __init__(self, page: Any):
+        self._page = page
+        self.width, self.height = page.width, page.height
+
+    @property
+    def chars(self): return self._page.chars
+    @property
+    def edges(self): return self._page.edges
+    def extract_text(self): return self._page.extract_text() or ""
+    def extract_words(self): return self._page.extract_words()
+    def crop_text(self, bbox): return self._page.crop(bbox).extract_text() or ""
+    def find_tables(self): return self._page.find_tables()
+    def extract_tables(self): return self._page.extract_tables()
+    def render(self, resolution): return self._page.to_image(resolution=resolution).original
+
+class PdfiumPage(PdfPage):
+    """
+    Página leída con PDFium. Caracteres (caja "loose", basada en la fuente, como
+    pdfminer) y segmentos horizontales/verticales de los trazados se leen una vez.
+    """
+    def __init__(self, page: Any):
+        self._page = page
+        self.width, self.height = page.get_size()
+        self._chars: Optional[List[Dict[str, Any]]] = None
+        self._edges: Optional[List[Dict[str, Any]]] = None
+        self._boxes: Optional[np.ndarray] = None
+
+    @property
+    def chars(self):
+        if self._chars is None: self._chars = self._read_chars()
+        return self._chars
+
+    def _char_boxes(self) -> np.ndarray:
+        # (N, 4) x0, top, x1, bottom: preselección vectorizada de los recortes
+        if self._boxes is None:
+            self._boxes = np.array([(c['x0'], c['top'], c['x1'], c['bottom']) for c in self.chars], dtype=float).reshape(-1, 4)
+        return self._boxes
+
+    @property
+    def edges(self):
+        if self._edges is None: self._edges = self._read_edges()
+        return self._edges
+
+    def _read_chars(self) -> List[Dict[str, Any]]:
+        import pypdfium2.raw as pdfium_c
+
+        textpage = self._page.get_textpage()
+        try:
+            chars = []
+            for i in range(textpage.count_chars()):
+                if pdfium_c.FPDFText_IsGenerated(textpage.raw, i) == 1: continue
+                text = chr(pdfium_c.FPDFText_GetUnicode(textpage.raw, i))
+                if text in "\r\n\x00": continue
+                left, bottom, right, top = textpage.get_charbox(i, loose=True)
+                top, bottom = self.height - top, self.height - bottom
+                chars.append({
+                    'text': text, 'x0': left, 'x1': right, 'top': top, 'bottom': bottom, 'doctop': top,
+                    'width': right - left, 'height': bottom - top, 'upright': True,
+                    'size': pdfium_c.FPDFText_GetFontSize(textpage.raw, i), 'object_type': 'char',
+                })
+            return chars
+        finally:
+            textpage.close()
+
+    def _read_edges(self) -> List[Dict[str, Any]]:
+        import ctypes
+        import pypdfium2.raw as pdfium_c
+
+        edges: List[Dict[str, Any]] = []
+
+        def add(x0, y0, x1, y1):
+            if abs(y0 - y1) < 0.01: orientation = 'h'
+            elif abs(x0 - x1) < 0.01: orientation = 'v'
+            else: return  # Diagonales y curvas no forman rejilla
+            left, right = min(x0, x1), max(x0, x1)
+            top, bottom = self.height - max(y0, y1), self.height - min(y0, y1)
+            edges.append({'orientation': orientation, 'x0': left, 'x1': right, 'top': top, 'bottom': bottom,
+                          'width': right - left, 'height': bottom - top, 'object_type': 'line'})
+
+        def walk(obj, parent: Tuple[float, ...]):
+            m = pdfium_c.FS_MATRIX()
+            if not pdfium_c.FPDFPageObj_GetMatrix(obj, m): return
+            # Matriz acumulada (objetos dentro de formularios XObject)
+            pa, pb, pc, pd, pe, pf = parent
+            a, b = m.a * pa + m.b * pc, m.a * pb + m.b * pd
+            c, d = m.c * pa + m.d * pc, m.c * pb + m.d * pd
+            e, f = m.e * pa + m.f * pc + pe, m.e * pb + m.f * pd + pf
+            kind = pdfium_c.FPDFPageObj_GetType(obj)
+            if kind == pdfium_c.FPDF_PAGEOBJ_FORM:
+                for k in range(pdfium_c.FPDFFormObj_CountObjects(obj)):
+                    walk(pdfium_c.FPDFFormObj_GetObject(obj, k), (a, b, c, d, e, f))
+                return
+            if kind != pdfium_c.FPDF_PAGEOBJ_PATH: return
+            x, y = ctypes.c_float(), ctypes.c_float()
+            start = prev = None
+            for k in range(pdfium_c.FPDFPath_CountSegments(obj)):
+                seg = pdfium_c.FPDFPath_GetPathSegment(obj, k)
+                pdfium_c.FPDFPathSegment_GetPoint(seg, x, y)
+                point = (a * x.value + c * y.value + e, b * x.value + d * y.value + f)
+                seg_type = pdfium_c.FPDFPathSegment_GetType(seg)
+                if seg_type == pdfium_c.FPDF_SEGMENT_MOVETO: start = point
+                elif seg_type == pdfium_c.FPDF_SEGMENT_LINETO and prev is not None: add(*prev, *point)
+                prev = point
+                if pdfium_c.FPDFPathSegment_GetClose(seg) and start is not None and prev != start:
+                    add(*prev, *start)
+                    prev = start
+
+        for k in range(pdfium_c.FPDFPage_CountObjects(self._page.raw)):
+            walk(pdfium_c.FPDFPage_GetObject(self._page.raw, k), (1.0, 0.0, 0.0, 1.0, 0.0, 0.0))
+        return edges
+
+    def extract_text(self): return plumber_utils.extract_text(self.chars)
+    def extract_words(self): return plumber_utils.extract_words(self.chars)
+
+    def crop_text(self, bbox):
+        test_proposed_bbox(bbox, self.bbox)   # Mismo ValueError que pdfplumber
+        x0, top, x1, bottom = bbox
+        boxes = self._char_boxes()
+        near = np.flatnonzero((boxes[:, 0] <= x1) & (boxes[:, 2] >= x0) & (boxes[:, 1] <= bottom) & (boxes[:, 3] >= top))
+        # El recorte exacto (mismas reglas de solape que pdfplumber) solo sobre los candidatos
+        chars = self.chars
+        return plumber_utils.extract_text(plumber_utils.crop_to_bbox([chars[i] for i in near], bbox))
+
+    def find_tables(self):
+        # TableFinder solo necesita .edges y .bbox de la página
+        return TableFinder(self, TableSettings.resolve(None)).tables
+
+    def extract_tables(self):
+        return [table.extract() for table in self.find_tables()]
+
+    def render(self, resolution):
+        return self._page.render(scale=resolution / 72.0).to_pil()
+
+# --- MOTORES ---
+
+class PlumberBackend:
+    name = "pdfplumber"
+
+    @contextmanager
+    def open(self, stream: Any) -> Iterator[List[PdfPage]]:
+        with pdfplumber.open(stream) as pdf:
+            yield [PlumberPage(page) for page in pdf.pages]
+
+class PdfiumBackend:
+    name = "pdfium"
+
+    @contextmanager
+    def open(self, stream: Any) -> Iterator[List[PdfPage]]:
+        import pypdfium2 as pdfium
+
+        doc = pdfium.PdfDocument(stream)
+        try:
+            yield [PdfiumPage(doc[i]) for i in range(len(doc))]
+        finally:
+            doc.close()
+
+PDF_BACKENDS = {b.name: b for b in (PlumberBackend(), PdfiumBackend())}
+DEFAULT_BACKEND = "pdfplumber"
+
+def get_backend(backend: Any = None) -> Any:
+    """Acepta None (motor por defecto), el nombre de un motor o un objeto motor."""
+    if backend is None: backend = DEFAULT_BACKEND
+    if not isinstance(backend, str): return backend
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Motor PDF desconocido: {backend} (disponibles: {', '.join(PDF_BACKENDS)})")
+    if backend == "pdfium":
+        try:
+            import pypdfium2
+        except ImportError as e:
+            raise ImportError("El motor 'pdfium' requiere el paquete 'pypdfium2'") from e
+    return PDF_BACKENDS[backend]
@@ -0,0 +1,146 @@
+import numpy as np
+from typing import Any, Dict, Mapping, Union
+
+from src.calendar_index import DOMINGO, FESTIVO, FESTIVO_NACIONAL, FESTIVO_AUTONOMICO, FESTIVO_LOCAL, SABADO
+from src.money import to_cents, to_euros
+
+# --- REGLAS DE CONVENIO DECLARADAS COMO DATOS ---
+# Cambiar de convenio (o simular escenarios) = pasar otro diccionario con esta forma.
+DEFAULT_AGREEMENT: Dict[str, Any] = {
+    'name': "Convenio por defecto",
+
+    # Precio hora = (suma de conceptos) x meses / divisor
+    'hourly_rates': {
+        'dashboard': {'concepts': ['base_salary', 'seniority', 'plus_agreement'], 'months': 1, 'divisor': 160},
+        'report':    {'concepts': ['base_salary', 'seniority', 'plus_agreement'], 'months': 15, 'divisor': 1776},
+    },
+
+    # Tipos de jornada por prioridad (el primero que aplica gana). 'plus' es la
+    # clave de `prices` con el plus por hora que se suma al precio normal.
+    'day_types': [
+        {'label': "Festivo", 'when': "holiday", 'plus': 'plus_holiday'},
+        {'label': "Domingo", 'when': "sunday", 'plus': 'plus_sunday'},
+    ],
+    'default_day_type': "Normal",
+    'nocturnal_plus': 'plus_nocturnal',
+
+    # Deuda de descanso por jornada según horas trabajadas
+    'rest_debt': {
+        'bands': [
+            {'min': 7.5, 'max': 8.5, 'debt': 0.5},
+            {'min': 11.5, 'max': 12.5, 'debt': 1.0},
+            {'min': 23.5, 'max': 24.5, 'debt': 2.0},
+        ],
+        'fallback_ratio': 1 / 12,   # Fuera de bandas: horas x ratio
+        'round': 2,
+        'exempt_types': ['Absentismo'],
+        'exempt_vacation': True,
+    },
+}
+
+# Condiciones de día disponibles para 'when' -> máscara de flags del calendario
+DAY_CONDITIONS = {
+    'holiday': FESTIVO,
+    'national_holiday': FESTIVO_NACIONAL,
+    'regional_holiday': FESTIVO_AUTONOMICO,
+    'local_holiday': FESTIVO_LOCAL,
+    'sunday': DOMINGO,
+    'saturday': SABADO,
+}
+
+class CompiledRules:
+    """
+    Reglas de convenio compiladas una vez a tablas NumPy. Todas las funciones
+    operan sobre arrays completos (filas, trabajadores o escenarios).
+    """
+    def __init__(self, rules: Mapping[str, Any]):
+        self.rules = rules
+        self.name = rules.get('name', "")
+        self.hourly_rates = {k: dict(v) for k, v in rules['hourly_rates'].items()}
+
+        day_types = list(rules.get('day_types', []))
+        for dt in day_types:
+            if dt['when'] not in DAY_CONDITIONS:
+                raise ValueError(f"Condición de día desconocida: {dt['when']}")
+        # Código 0 = tipo por defecto; 1..n = tipos en orden de prioridad
+        self.day_type_labels = np.array([rules.get('default_day_type', "Normal")] + [dt['label'] for dt in day_types], dtype=object)
+        self._day_masks = [DAY_CONDITIONS[dt['when']] for dt in day_types]
+        self._day_plus_keys = [None] + [dt.get('plus') for dt in day_types]
+        self.nocturnal_plus = rules.get('nocturnal_plus')
+
+        debt = rules['rest_debt']
+        bands = debt.get('bands', [])
+        self._band_min = np.array([b['min'] for b in bands], dtype=float)
+        self._band_max = np.array([b['max'] for b in bands], dtype=float)
+        self._band_debt = np.array([b['debt'] for b in bands], dtype=float)
+        self._fallback_ratio = debt.get('fallback_ratio', 0.0)
+        self._round = debt.get('round', 2)
+        self.exempt_types = frozenset(debt.get('exempt_types', []))
+        self.exempt_vacation = bool(debt.get('exempt_vacation', True))
+
+    # --- PRECIO HORA ---
+    def hourly_rate(self, prices: Mapping[str, Any], which: str = 'dashboard') -> Any:
+        """Precio hora según la fórmula `which`. Acepta escalares o arrays en `prices`."""
+        formula = self.hourly_rates[which]
+        total = sum(prices.get(c, 0.0) for c in formula['concepts'])
+        return total * formula['months'] / formula['divisor']
+
+    # --- TIPOS DE JORNADA ---
+    def day_type_codes(self, flags: np.ndarray) -> np.ndarray:
+        """Flags del calendario -> código de tipo de jornada (0 = por defecto)."""
+        flags = np.asarray(flags)
+        codes = np.zeros(flags.shape, dtype=np.int8)
+        # Se recorren de menor a mayor prioridad para que la mayor sobrescriba
+        for code in range(len(self._day_masks), 0, -1):
+            codes[(flags & self._day_masks[code - 1]) != 0] = code
+        return codes
+
+    def day_plus_table(self, prices: Mapping[str, Any]) -> np.ndarray:
+        """Plus por hora de cada tipo de jornada (indexable por day_type_codes)."""
+        return np.array([0.0 if k is None else prices.get(k, 0.0) for k in self._day_plus_keys], dtype=float)
+
+    def day_amounts_cents(self, total_hours: np.ndarray, nocturnal_hours: np.ndarray, day_codes: np.ndarray,
+                          prices: Mapping[str, Any]) -> np.ndarray:
+        """
+        Importe por jornada en céntimos (int64, redondeado una vez por jornada).
+        Diurnas a precio (normal + plus del tipo de día); nocturnas al mismo
+        precio + plus de nocturnidad.
+        """
+        rate = prices.get('price_normal', 0.0) + self.day_plus_table(prices)[day_codes]
+        plus_n = prices.get(self.nocturnal_plus, 0.0) if self.nocturnal_plus else 0.0
+        h_diurnas = np.maximum(0.0, total_hours - nocturnal_hours)
+        return to_cents(h_diurnas * rate + nocturnal_hours * (rate + plus_n))
+
+    def day_amounts(self, total_hours: np.ndarray, nocturnal_hours: np.ndarray, day_codes: np.ndarray,
+                    prices: Mapping[str, Any]) -> np.ndarray:
+        """Importe por jornada en euros (céntimos exactos, ver day_amounts_cents)."""
+        return to_euros(self.day_amounts_cents(total_hours, nocturnal_hours, day_codes, prices))
+
+    # --- DEUDA DE DESCANSO ---
+    def rest_debt(self, hours: np.ndarray) -> np.ndarray:
+        """Deuda de descanso por jornada (bandas; fuera de ellas horas x ratio redondeado)."""
+        hours = np.asarray(hours, dtype=float)
+        # El redondeo se hace con round() de Python sobre los valores únicos
+        # (pocos) para conservar exactamente el redondeo decimal de siempre.
+        uniq, inv = np.unique(hours, return_inverse=True)
+        fallback = np.array([round(h * self._fallback_ratio, self._round) for h in uniq.tolist()], dtype=float)
+        in_band = (uniq[:, None] >= self._band_min) & (uniq[:, None] <= self._band_max)
+        has_band = in_band.any(axis=1)
+        band_debt = self._band_debt[np.argmax(in_band, axis=1)] if len(self._band_debt) else np.zeros(len(uniq))
+        return np.where(has_band, band_debt, fallback)[inv].reshape(hours.shape)
+
+    def debt_eligible(self, code_types: np.ndarray, code_is_vacation: np.ndarray) -> np.ndarray:
+        """Máscara de jornadas que generan deuda (excluye absentismo y vacaciones)."""
+        exempt = np.isin(code_types, list(self.exempt_types))
+        if self.exempt_vacation: exempt |= code_is_vacation
+        return ~exempt
+
+RulesLike = Union[None, Mapping[str, Any], CompiledRules]
+
+DEFAULT_RULES = CompiledRules(DEFAULT_AGREEMENT)
+
+def compile_rules(rules: RulesLike = None) -> CompiledRules:
+    """Acepta None (convenio por defecto), un diccionario de reglas o reglas ya compiladas."""
+    if rules is None: return DEFAULT_RULES
+    if isinstance(rules, CompiledRules): return rules
+    return CompiledRules(rules)
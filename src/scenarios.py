@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from src.calculator import group_code_day_pairs
+from src.rules import compile_rules
+from src.money import amount_cents, to_cents, to_euros, to_hours, to_hundredths
+
+# Precios que pueden variar por escenario (vectorizados como arrays de longitud S)
+SCENARIO_PRICE_KEYS = ['base_salary', 'seniority', 'plus_agreement', 'plus_holiday', 'plus_sunday', 'plus_nocturnal', 'val_extra_pay']
+
+SCENARIO_COLUMNS = ['Escenario', 'Precio_Hora', 'Horas_Totales', 'Horas_Nocturnas', 'Total_Euros',
+                    'Deuda_Descanso_Horas', 'Importe_Deuda', 'Reclamacion_Extra', 'Total_Reclamacion', 'Diferencia']
+
+def _scenario_mapping(base_mapping: Mapping[str, Dict], overrides: Optional[Mapping[str, Dict]]) -> Dict[str, Dict]:
+    if not overrides: return base_mapping
+    merged = dict(base_mapping)
+    for code, values in overrides.items():
+        merged[code] = {**base_mapping.get(code, {}), **values}
+    return merged
+
+def evaluate_scenarios(df: pd.DataFrame, shift_info: Mapping[str, Dict], base_mapping: Mapping[str, Dict],
+                       base_prices: Mapping[str, Any], holidays: Iterable[Any], scenarios: List[Dict[str, Any]],
+                       rules=None) -> pd.DataFrame:
+    """
+    Evalúa N escenarios "qué pasaría si" en una sola pasada vectorizada (matriz escenarios x pares
+    (código, tipo de jornada), ponderada por el número de jornadas de cada par).
+
+    Cada escenario es un dict con claves opcionales:
+    - 'name': nombre a mostrar
+    - 'prices': precios que sustituyen a base_prices (ver SCENARIO_PRICE_KEYS, o 'price_normal')
+    - 'mapping': { 'Code': {'total': float, 'nocturnal': float} } que sustituye al mapeo base
+    - 'rate_formula': fórmula de precio hora del convenio ('dashboard' = /160, 'report' = x15/1776)
+    - 'include_extra_pay': si se reclama la 3ª paga (por defecto base_prices['include_extra_pay'])
+
+    Devuelve una tabla comparativa con una fila por escenario.
+    """
+    if not scenarios: raise ValueError("Se necesita al menos un escenario")
+    rules = compile_rules(rules)
+    n_scen = len(scenarios)
+    names = [s.get('name') or f"Escenario {i + 1}" for i, s in enumerate(scenarios)]
+    scen_prices = [{**base_prices, **(s.get('prices') or {})} for s in scenarios]
+
+    # Precios como arrays (S,) para que las reglas se evalúen por escenario de una vez
+    prices = {k: np.array([float(p.get(k, 0.0)) for p in scen_prices]) for k in SCENARIO_PRICE_KEYS}
+    precio_hora = np.empty(n_scen)
+    for i, (s, p) in enumerate(zip(scenarios, scen_prices)):
+        explicit = (s.get('prices') or {}).get('price_normal')
+        if explicit is not None and not s.get('rate_formula'):
+            precio_hora[i] = float(explicit)
+        else:
+            precio_hora[i] = rules.hourly_rate(p, s.get('rate_formula') or 'dashboard')
+    prices['price_normal'] = precio_hora
+
+    include_extra = np.array([bool(s.get('include_extra_pay', base_prices.get('include_extra_pay', False))) for s in scenarios])
+    extra = np.where(include_extra, to_cents(prices['val_extra_pay']), 0)
+
+    # Euros en céntimos y deuda en centésimas de hora (int64): sumas exactas
+    if df.empty:
+        h_tot = h_noc = np.zeros(n_scen)
+        euros = debt_h = importe_deuda = np.zeros(n_scen, dtype=np.int64)
+    else:
+        # Comprimir en pares (código, tipo de jornada): tablas (S, P) ponderadas por nº de jornadas
+        pairs, _ = group_code_day_pairs(df, holidays, rules)
+        codes = [str(c) for c in pairs['Codigo'].tolist()]
+        weights = pairs['Jornadas'].to_numpy(dtype=np.int64)
+        day_codes = pairs['Dia_Tipo'].to_numpy(dtype=np.int64)
+        mappings = [_scenario_mapping(base_mapping, s.get('mapping')) for s in scenarios]
+        total_sp = np.array([[float(m.get(c, {}).get('total', 0.0)) for c in codes] for m in mappings])
+        noct_sp = np.array([[float(m.get(c, {}).get('nocturnal', 0.0)) for c in codes] for m in mappings])
+
+        plus_table = np.stack([rules.day_plus_table({k: v[i] for k, v in prices.items()}) for i in range(n_scen)])
+        rate_sp = prices['price_normal'][:, None] + plus_table[:, day_codes]
+        plus_n = prices.get(rules.nocturnal_plus, np.zeros(n_scen))[:, None] if rules.nocturnal_plus else 0.0
+        h_diurnas = np.maximum(0.0, total_sp - noct_sp)
+        euros_sp = to_cents(h_diurnas * rate_sp + noct_sp * (rate_sp + plus_n))
+
+        # Deuda de descanso: elegibilidad por código + bandas sobre toda la matriz
+        infos = [shift_info.get(c, {}) for c in codes]
+        eligible_p = rules.debt_eligible(np.array([info.get('type') or "" for info in infos], dtype=object),
+                                         np.array([bool(info.get('is_vacation')) for info in infos], dtype=bool))
+        eligible_sp = eligible_p[None, :] & (total_sp > 0)
+        debt_sp = to_hundredths(np.where(eligible_sp, rules.rest_debt(total_sp), 0.0))
+
+        h_tot, h_noc = total_sp @ weights, noct_sp @ weights
+        euros, debt_h = euros_sp @ weights, debt_sp @ weights
+        # Importe redondeado por jornada (como el detalle del informe) y luego sumado
+        importe_deuda = amount_cents(debt_sp, precio_hora[:, None]) @ weights
+
+    total_claim = importe_deuda + extra
+    return pd.DataFrame({
+        'Escenario': names,
+        'Precio_Hora': precio_hora,
+        'Horas_Totales': h_tot,
+        'Horas_Nocturnas': h_noc,
+        'Total_Euros': to_euros(euros),
+        'Deuda_Descanso_Horas': to_hours(debt_h),
+        'Importe_Deuda': to_euros(importe_deuda),
+        'Reclamacion_Extra': to_euros(extra),
+        'Total_Reclamacion': to_euros(total_claim),
+        'Diferencia': to_euros(total_claim - total_claim[0]),   # Respecto al primer escenario
+    }, columns=SCENARIO_COLUMNS)
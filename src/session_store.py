@@ -0,0 +1,213 @@
+import time
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# --- ALMACÉN COMPARTIDO DE CUADRANTES PARA LAS SESIONES DE STREAMLIT ---
+# Cada pestaña del navegador es una sesión. En lugar de guardar el DataFrame
+# completo en st.session_state, se guarda una clave de contenido: el DataFrame
+# compacto vive una sola vez en este almacén (por proceso), compartido por todas
+# las sesiones que suban el mismo cuadrante.
+
+SESSION_IDLE_TIMEOUT = 30 * 60           # Segundos sin actividad antes de liberar la sesión
+STORE_MAX_BYTES = 512 * 1024 * 1024      # Límite para cuadrantes no referenciados (LRU)
+
+# Columnas de texto muy repetidas -> category; contadores pequeños -> int8
+CATEGORY_COLUMNS = ('Codigo', 'Tipo_Jornada', 'Hora_Inicio', 'Hora_Fin')
+SMALL_INT_COLUMNS = ('Mes', 'Dia')
+
+PANDAS_MAJOR = int(pd.__version__.split('.')[0])
+
+def copy_on_write() -> bool:
+    """Copy-on-write activo: siempre en pandas >= 3; en 2.x solo si se activó la opción."""
+    return PANDAS_MAJOR >= 3 or pd.options.mode.copy_on_write is True
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Versión tipada del cuadrante: categorías, enteros pequeños y fechas datetime64."""
+    out = df.copy(deep=False)
+    for col in CATEGORY_COLUMNS:
+        if col in out.columns and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = out[col].astype('category')
+    for col in SMALL_INT_COLUMNS:
+        if col in out.columns and out[col].notna().all(): out[col] = out[col].astype(np.int8)
+    if 'Fecha' in out.columns: out['Fecha'] = pd.to_datetime(out['Fecha'])
+    if 'is_vacation' in out.columns: out['is_vacation'] = out['is_vacation'].astype(bool)
+    return out
+
+def frame_key(df: pd.DataFrame) -> str:
+    """Clave de contenido (columnas, tipos y valores)."""
+    h = hashlib.sha1()
+    h.update(repr([(c, str(t)) for c, t in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+class SharedFrameStore:
+    """
+    DataFrames compactos direccionados por contenido, con referencias por sesión.
+    - get() devuelve una copia superficial: con copy-on-write de pandas, modificar
+      la copia no altera el original compartido ni duplica los datos no tocados.
+      Sin copy-on-write (pandas 2.x con la opción desactivada) la copia es profunda.
+    - evict_idle() libera las sesiones inactivas y los cuadrantes que ya nadie usa.
+    """
+    def __init__(self, max_bytes: int = STORE_MAX_BYTES, idle_timeout: float = SESSION_IDLE_TIMEOUT):
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self._frames: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._sessions: Dict[str, Tuple[float, Optional[str]]] = {}   # id -> (última actividad, clave)
+        self._lock = threading.Lock()
+
+    def put(self, df: pd.DataFrame, session_id: Optional[str] = None) -> str:
+        """Guarda el cuadrante (si no estaba ya) y, si se indica, lo asocia a la sesión."""
+        compact = compact_frame(df)
+        key = frame_key(compact)
+        with self._lock:
+            if key not in self._frames:
+                self._frames[key] = compact
+                self._sizes[key] = frame_nbytes(compact)
+            self._frames.move_to_end(key)
+            if session_id is not None: self._sessions[session_id] = (time.monotonic(), key)
+            self._shrink()
+        return key
+
+    def get(self, key: Optional[str]) -> Optional[pd.DataFrame]:
+        if not key: return None
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is None: return None
+            self._frames.move_to_end(key)
+        return frame.copy(deep=not copy_on_write())
+
+    def touch(self, session_id: str, key: Optional[str], now: Optional[float] = None) -> None:
+        """Marca actividad de la sesión y el cuadrante que está usando."""
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic() if now is None else now, key)
+
+    def release(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._drop_unreferenced()
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """Libera las sesiones inactivas más de idle_timeout segundos. Retorna sus ids."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [sid for sid, (seen, _) in self._sessions.items() if now - seen > self.idle_timeout]
+            for sid in idle: del self._sessions[sid]
+            if idle: self._drop_unreferenced()
+        return idle
+
+    def _referenced(self) -> set:
+        return {key for _, key in self._sessions.values() if key}
+
+    def _drop_unreferenced(self) -> None:
+        referenced = self._referenced()
+        for key in [k for k in self._frames if k not in referenced]:
+            del self._frames[key]; del self._sizes[key]
+
+    def _shrink(self) -> None:
+        # LRU sobre los no referenciados mientras se supere el límite
+        referenced = self._referenced()
+        total = sum(self._sizes.values())
+        for key in list(self._frames):
+            if total <= self.max_bytes: break
+            if key in referenced: continue
+            total -= self._sizes.pop(key)
+            del self._frames[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'frames': len(self._frames), 'bytes': sum(self._sizes.values()), 'sessions': len(self._sessions)}
+
+_store: Optional[SharedFrameStore] = None
+_store_lock = threading.Lock()
+
+def get_frame_store() -> SharedFrameStore:
+    """Almacén único del proceso (compartido por todas las sesiones)."""
+    global _store
+    with _store_lock:
+        if _store is None: _store = SharedFrameStore()
+        return _store
+
+# --- CACHÉ COMPARTIDA DE CÁLCULOS DEL DASHBOARD ---
+# El cálculo del paso 3 (IncrementalCalculation: cuadrante con columnas calculadas
+# y cubo mensual) pesa tanto como el propio cuadrante. Igual que los cuadrantes,
+# vive una vez por proceso y la sesión solo guarda su clave
+# (clave del cuadrante, festivos, precio hora, mapeo...).
+
+CALC_MAX_ENTRIES = 32   # Cálculos no referenciados que se conservan (LRU)
+
+class CalculationCache:
+    """
+    Cálculos por clave con referencias por sesión (ver SharedFrameStore).
+    Las claves son tuplas (base, variante): si la sesión pide una variante nueva
+    de la misma base (p. ej. solo cambia el mapeo) y nadie más usa su cálculo
+    anterior, se actualiza ese en lugar de construir uno nuevo.
+    """
+    def __init__(self, max_entries: int = CALC_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._values: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._sessions: Dict[str, Tuple] = {}   # id -> clave en uso
+        self._lock = threading.Lock()
+
+    def get_or_build(self, session_id: str, key: Tuple, build: Callable[[], Any],
+                     update: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Valor de `key`. Si no está: update(valor anterior de la sesión) cuando la
+        base coincide y el valor no lo comparte otra sesión; si no, build().
+        """
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+                self._sessions[session_id] = key
+                return value
+            previous = self._sessions.get(session_id)
+            reuse = (update is not None and previous is not None and previous[0] == key[0]
+                     and previous in self._values and not self._shared(previous, session_id))
+            # El anterior se saca de la caché mientras se actualiza (nadie más lo ve)
+            base_value = self._values.pop(previous) if reuse else None
+        value = update(base_value) if reuse else build()
+        with self._lock:
+            self._values.setdefault(key, value)
+            self._values.move_to_end(key)
+            self._sessions[session_id] = key
+            self._shrink()
+            return self._values[key]
+
+    def release(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._shrink()
+
+    def _shared(self, key: Tuple, session_id: str) -> bool:
+        return any(k == key for sid, k in self._sessions.items() if sid != session_id)
+
+    def _shrink(self) -> None:
+        # LRU sobre los no referenciados por encima del límite
+        referenced = set(self._sessions.values())
+        excess = len(self._values) - self.max_entries
+        for key in list(self._values):
+            if excess <= 0: break
+            if key in referenced: continue
+            del self._values[key]
+            excess -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._values), 'sessions': len(self._sessions)}
+
+_calc_cache: Optional[CalculationCache] = None
+
+def get_calculation_cache() -> CalculationCache:
+    """Caché única del proceso (compartida por todas las sesiones)."""
+    global _calc_cache
+    with _store_lock:
+        if _calc_cache is None: _calc_cache = CalculationCache()
+        return _calc_cache
@@ -0,0 +1,122 @@
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Set
+
+# --- ANÁLISIS DE TEXTO EN UNA SOLA PASADA ---
+# Un único escáner compilado recorre el texto y emite eventos tipados (fechas,
+# rangos horarios, códigos de 3-4 dígitos, importes y palabras clave). Festivos,
+# leyenda y nómina leen de la misma lista de eventos en lugar de lanzar cada uno
+# sus propios regex sobre el texto completo.
+
+EV_DATE = "date"              # "dd/mm/aaaa"
+EV_TIME_RANGE = "time_range"  # ("8.00", "15.00")
+EV_CODE = "code"              # "708"
+EV_AMOUNT = "amount"          # ("eu" | "us", "1.253,26")
+EV_KEYWORD = "keyword"        # "NOCTURN"
+
+# Palabras clave de nómina (se buscan como subcadena, sin distinguir mayúsculas).
+# Las más largas primero para que la alternancia no corte prefijos comunes.
+KEYWORDS = [
+    "SALARIO BASE", "ANTIGUEDAD", "CONVENIO", "SEGURO", "NOCTURN", "FESTIV", "DIETA", "MANUTENCION",
+    "BENEFICIOS", "BENEF.", "Bº", "PAGA", "MARZO", "EXTRA", "ATRASOS", "NAVIDAD", "LIQUIDACION",
+    "TOTAL", "BASE", "COTIZACION", "AMBULANCIAS",
+]
+# Palabras clave que contienen a otras: se emiten también las contenidas
+KEYWORD_ALIASES = {"SALARIO BASE": ("SALARIO BASE", "BASE")}
+
+DATE_RE = re.compile(r"\d{2}/\d{2}/\d{4}")
+CODE_RE = re.compile(r"\b\d{3,4}\b")
+AMOUNT_EU_RE = re.compile(r"\d{1,3}(?:\.\d{3})*,\d{2}")
+AMOUNT_US_RE = re.compile(r"\d{1,3}(?:,\d{3})*\.\d{2}")
+RANGE_RE = re.compile(r"(?P<start>\d{1,2}[:.]\d{2})\s*[-–—]\s*(?P<end>\d{1,2}[:.]\d{2})")
+
+# Tramos numéricos (fechas, códigos, importes y comienzo de rangos) y palabras clave
+_SCANNER = re.compile(
+    r"(?P<nl>\n)"
+    r"|(?P<num>\d[\d.,/€]*)"
+    r"|(?P<kw>" + "|".join(re.escape(k) for k in KEYWORDS) + r")",
+    re.IGNORECASE,
+)
+
+class TextEvent(NamedTuple):
+    kind: str
+    start: int
+    end: int
+    line: int      # Índice de línea en text.split('\n')
+    value: Any
+
+class TextScan:
+    """Eventos de un texto agrupados por tipo (cada lista en orden de aparición)."""
+    def __init__(self, text: str, events: Dict[str, List[TextEvent]]):
+        self.text = text
+        self._events = events
+
+    def of(self, kind: str) -> List[TextEvent]:
+        return self._events.get(kind, [])
+
+    def by_line(self, kind: str) -> Dict[int, List[TextEvent]]:
+        grouped: Dict[int, List[TextEvent]] = {}
+        for ev in self.of(kind): grouped.setdefault(ev.line, []).append(ev)
+        return grouped
+
+    def keywords_by_line(self) -> Dict[int, Set[str]]:
+        grouped: Dict[int, Set[str]] = {}
+        for ev in self.of(EV_KEYWORD): grouped.setdefault(ev.line, set()).add(ev.value)
+        return grouped
+
+def _scan_numeric(text: str, s: int, e: int, line: int, events: Dict[str, List[TextEvent]]) -> None:
+    # Fechas, códigos e importes dentro de un tramo numérico. Se busca hasta e + 1
+    # para que los \b vean el carácter real que sigue al tramo.
+    for m in DATE_RE.finditer(text, s, e + 1):
+        events[EV_DATE].append(TextEvent(EV_DATE, m.start(), m.end(), line, m.group(0)))
+    for m in CODE_RE.finditer(text, s, e + 1):
+        events[EV_CODE].append(TextEvent(EV_CODE, m.start(), m.end(), line, m.group(0)))
+    chunk = text[s:e]
+    if "€" in chunk: chunk = chunk.replace("€", "")
+    for fmt, pattern in (("eu", AMOUNT_EU_RE), ("us", AMOUNT_US_RE)):
+        for m in pattern.finditer(chunk):
+            events[EV_AMOUNT].append(TextEvent(EV_AMOUNT, s + m.start(), s + m.end(), line, (fmt, m.group(0))))
+
+def _scan_ranges(text: str, s: int, e: int, range_pos: int, line: int, events: Dict[str, List[TextEvent]]) -> int:
+    # Rangos horarios que empiezan dentro del tramo [s, e). Un rango no puede
+    # solaparse con el anterior (range_pos = fin del último rango encontrado).
+    pos = max(s, range_pos)
+    while pos < e:
+        if text[pos].isdigit() and (text[pos + 1:pos + 2] in (":", ".") or text[pos + 2:pos + 3] in (":", ".")):
+            r = RANGE_RE.match(text, pos)
+            if r:
+                events[EV_TIME_RANGE].append(TextEvent(EV_TIME_RANGE, r.start(), r.end(), line, (r.group("start"), r.group("end"))))
+                range_pos = pos = r.end()
+                continue
+        pos += 1
+    return range_pos
+
+@lru_cache(maxsize=16)
+def scan_text(text: str) -> TextScan:
+    """Recorre el texto una vez. Memoizado: varios extractores sobre el mismo texto comparten el escaneo."""
+    events: Dict[str, List[TextEvent]] = {k: [] for k in (EV_DATE, EV_TIME_RANGE, EV_CODE, EV_AMOUNT, EV_KEYWORD)}
+    line = 0
+    range_pos = 0
+    for m in _SCANNER.finditer(text):
+        kind = m.lastgroup
+        if kind == "nl":
+            line += 1
+        elif kind == "num":
+            _scan_numeric(text, m.start(), m.end(), line, events)
+            range_pos = _scan_ranges(text, m.start(), m.end(), range_pos, line, events)
+        else:
+            for k in KEYWORD_ALIASES.get(m.group(0).upper(), (m.group(0).upper(),)):
+                events[EV_KEYWORD].append(TextEvent(EV_KEYWORD, m.start(), m.end(), line, k))
+    return TextScan(text, events)
+
+def amount_value(raw: str) -> float:
+    """Convierte un importe tal como aparece ('1.253,26', '253,26', '1,253.26')."""
+    if "," in raw and "." in raw: return float(raw.replace('.', '').replace(',', '.'))
+    elif "," in raw: return float(raw.replace(',', '.'))
+    else: return float(raw)
+
+def last_amount(events: List[TextEvent]) -> float:
+    """Último importe de una línea: formato europeo si lo hay; si no, anglosajón."""
+    eu = [ev.value[1] for ev in events if ev.value[0] == "eu"]
+    pool = eu or [ev.value[1] for ev in events if ev.value[0] == "us"]
+    return amount_value(pool[-1]) if pool else 0.0
@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# --- POOL DE PROCESOS PRECALENTADO PARA TRABAJOS DE LOTE ---
+# Cada proceso nuevo paga la importación de pandas, pdfplumber/pdfminer y openpyxl,
+# que en PDFs pequeños domina el tiempo del trabajo. Con 'forkserver' los módulos
+# se importan una vez en el servidor de fork y cada trabajador nace ya con ellos;
+# en 'spawn' (Windows / macOS) los importa el initializer una vez por trabajador.
+# Los trabajadores se reciclan cada max_tasks_per_child trabajos para acotar la
+# memoria que van reteniendo las cachés de pdfminer.
+
+WARM_MODULES = ['src.parser', 'src.calculator', 'src.exporter']
+WORKER_MAX_WORKERS = max(1, min(8, os.cpu_count() or 1))
+WORKER_MAX_TASKS = 100   # Trabajos por proceso antes de reciclarlo (None = sin límite)
+
+def _warm_up(modules: List[str]) -> None:
+    """Initializer: importa los módulos pesados al arrancar el trabajador (no por trabajo)."""
+    import importlib
+    for name in modules: importlib.import_module(name)
+
+# --- TIPOS DE TRABAJO (se ejecutan en el trabajador) ---
+
+def _job_roster(source: Any, year: Optional[int] = None, **kwargs: Any) -> Any:
+    from src.parser import extract_data_from_pdf
+    return extract_data_from_pdf(source, year, **kwargs)
+
+def _job_roster_arrow(source: Any, year: Optional[int] = None, directory: Optional[str] = None, **kwargs: Any) -> Any:
+    # El cuadrante vuelve como fichero Arrow en memoria compartida (ver src.arrow_transport)
+    from src.arrow_transport import write_frame
+    df, info, holidays = _job_roster(source, year, **kwargs)
+    return (write_frame(df, directory) if len(df) else None), info, holidays
+
+def _job_payroll(source: Any, backend: Any = None) -> Dict[str, Any]:
+    from src.parser import extract_payroll_data
+    return extract_payroll_data(source, backend)
+
+def _job_export(job: Dict[str, Any]) -> Any:
+    from src.exporter import _render_worker_report
+    return _render_worker_report(job)
+
+JOB_KINDS = {'roster': _job_roster, 'roster_arrow': _job_roster_arrow, 'payroll': _job_payroll, 'export': _job_export}
+
+def _run_job(kind: str, args: tuple, kwargs: Dict[str, Any]) -> Any:
+    return JOB_KINDS[kind](*args, **kwargs)
+
+def portable_source(source: Any) -> Any:
+    """
+    Entrada que se puede enviar a otro proceso: las rutas se mantienen (el
+    trabajador las mapea en memoria) y los ficheros subidos o BytesIO pasan a bytes.
+    """
+    if isinstance(source, (str, os.PathLike, bytes)): return source
+    if isinstance(source, (bytearray, memoryview)): return bytes(source)
+    if hasattr(source, 'getvalue'): return source.getvalue()
+    if hasattr(source, 'read'):
+        if hasattr(source, 'seek'): source.seek(0)
+        return source.read()
+    return source
+
+def _mp_context(modules: List[str]) -> Any:
+    # forkserver: los trabajadores se bifurcan de un proceso que ya importó los
+    # módulos. 'fork' no admite max_tasks_per_child y no es seguro con hilos.
+    if sys.platform != "win32" and "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(modules)
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+class WarmWorkerPool:
+    """
+    Pool persistente de trabajadores con los módulos del parser, calculador y
+    exportador ya importados. Los trabajos se encolan por tipo (ver JOB_KINDS):
+    - submit('roster', fuente, año, ...)  -> Future de extract_data_from_pdf
+    - submit('roster_arrow', fuente, año) -> igual, con el DataFrame como fichero Arrow
+    - submit('payroll', fuente, motor)    -> Future de extract_payroll_data
+    - submit('export', job)               -> Future de (bytes, resumen) del informe
+    Las fuentes se convierten con portable_source (rutas o bytes).
+    """
+    def __init__(self, max_workers: Optional[int] = None, max_tasks_per_child: Optional[int] = WORKER_MAX_TASKS,
+                 modules: Optional[List[str]] = None):
+        self.modules = list(WARM_MODULES if modules is None else modules)
+        self.max_workers = max_workers or WORKER_MAX_WORKERS
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=_mp_context(self.modules),
+            initializer=_warm_up, initargs=(self.modules,), max_tasks_per_child=max_tasks_per_child,
+        )
+
+    def submit(self, kind: str, *args: Any, **kwargs: Any) -> Future:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Tipo de trabajo desconocido: {kind} (opciones: {', '.join(JOB_KINDS)})")
+        if kind in ('roster', 'roster_arrow', 'payroll') and args:
+            args = (portable_source(args[0]),) + args[1:]
+        return self._executor.submit(_run_job, kind, args, kwargs)
+
+    def map(self, kind: str, items: Iterable[Any], *args: Any, **kwargs: Any) -> Iterator[Any]:
+        """Un trabajo por elemento (primer argumento) con el resto de argumentos comunes. Resultados en orden."""
+        futures = [self.submit(kind, item, *args, **kwargs) for item in items]
+        return (f.result() for f in futures)
+
+    def warm(self) -> None:
+        """Arranca todos los trabajadores ya (en lugar de al primer trabajo)."""
+        for f in [self._executor.submit(_warm_up, self.modules) for _ in range(self.max_workers)]: f.result()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def __enter__(self) -> "WarmWorkerPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.shutdown()
+
+# --- POOL COMPARTIDO DEL PROCESO ---
+_pool: Optional[WarmWorkerPool] = None
+_pool_lock = threading.Lock()
+
+def get_worker_pool() -> WarmWorkerPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None: _pool = WarmWorkerPool()
+        return _pool
+
+def shutdown_worker_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None: _pool.shutdown(wait=True)
+        _pool = None
@@ -0,0 +1,73 @@
+import os
+import sys
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MONTHS = ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO", "JULIO", "AGOSTO",
+          "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
+
+# Mapeo y leyenda de los cuadrantes sintéticos: 7 h y 10 h caen fuera de las
+# bandas de deuda (horas / 12 redondeado), 8 h y 12 h dentro
+MAPPING = {
+    '708': {'total': 7.0, 'nocturnal': 0.0},
+    '1308': {'total': 8.0, 'nocturnal': 1.0},
+    '2008': {'total': 12.0, 'nocturnal': 8.0},
+    '910': {'total': 10.0, 'nocturnal': 0.0},
+    'V': {'total': 0.0, 'nocturnal': 0.0},
+}
+SHIFT_INFO = {
+    '708': {'type': 'Turno', 'is_vacation': False},
+    '1308': {'type': 'Turno', 'is_vacation': False},
+    '2008': {'type': 'Turno', 'is_vacation': False},
+    '910': {'type': 'Turno', 'is_vacation': False},
+    'V': {'type': 'Vacaciones', 'is_vacation': True},
+}
+HOLIDAYS = [date(2025, 1, 6), date(2025, 8, 15), date(2025, 12, 25)]
+PRICES = {'base_salary': 1253.26, 'seniority': 100.26, 'plus_agreement': 10.0, 'plus_holiday': 2.0,
+          'plus_sunday': 1.0, 'plus_nocturnal': 0.5, 'val_extra_pay': 300.0, 'include_extra_pay': True}
+
+@pytest.fixture
+def roster():
+    """Cuadrante sintético de un año completo (una jornada por día, códigos aleatorios)."""
+    rng = random.Random(7)
+    days = [date(2025, 1, 1) + timedelta(days=i) for i in range(365)]
+    codes = [rng.choice(['708', '1308', '2008', '910', 'V', '708']) for _ in days]
+    return pd.DataFrame({'Fecha': days, 'Mes': [d.month for d in days], 'Dia': [d.day for d in days], 'Codigo': codes})
+
+def _grid(c, rows, y0, x0=20, colw0=80, colw=34, rowh=16):
+    for r in range(len(rows) + 1): c.line(x0, y0 - r * rowh, x0 + colw0 + 31 * colw, y0 - r * rowh)
+    xs = [x0] + [x0 + colw0 + i * colw for i in range(32)]
+    for x in xs: c.line(x, y0, x, y0 - len(rows) * rowh)
+    for r, (label, vals) in enumerate(rows):
+        y = y0 - r * rowh - 11
+        c.drawString(x0 + 2, y, label)
+        for d, v in enumerate(vals):
+            if v: c.drawString(xs[d + 1] + 3, y, v)
+
+LEGEND = "LEYENDA: 708: 08:00-15:00  1308: 13:00-21:00  2008: 20.00 - 08.00"
+
+@pytest.fixture
+def make_roster_pdf(tmp_path):
+    """Genera un cuadrante PDF sintético (rejilla de 12 meses x 31 días). Requiere reportlab."""
+    pytest.importorskip("reportlab")
+    from reportlab.lib.pagesizes import A3, landscape
+    from reportlab.pdfgen import canvas
+
+    def make(name="cuadrante.pdf", seed=0, legend=LEGEND):
+        rng = random.Random(seed)
+        path = tmp_path / name
+        width, height = landscape(A3)
+        c = canvas.Canvas(str(path), pagesize=(width, height))
+        c.setFont("Helvetica", 8)
+        c.drawString(20, height - 20, "CUADRANTE 2025  Festivos: 06/01/2025 15/08/2025")
+        rows = [(m, [rng.choice(["708", "1308", "2008", "", "V"]) for _ in range(31)]) for m in MONTHS]
+        _grid(c, rows, height - 40)
+        c.drawString(20, 40, legend)
+        c.save()
+        return path
+    return make
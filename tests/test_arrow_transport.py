@@ -0,0 +1,55 @@
+from concurrent.futures import Future
+
+import pandas as pd
+import pytest
+
+import src.arrow_transport as arrow_transport
+from src.parser import extract_data_from_pdf
+from src.worker_pool import JOB_KINDS
+
+class InlinePool:
+    """Pool que ejecuta los trabajos en el propio proceso (misma interfaz que WarmWorkerPool)."""
+    def submit(self, kind, *args, **kwargs):
+        f = Future()
+        f.set_result(JOB_KINDS[kind](*args, **kwargs))
+        return f
+
+    def map(self, kind, items, *args, **kwargs):
+        return (self.submit(kind, item, *args, **kwargs).result() for item in items)
+
+@pytest.fixture
+def sources(make_roster_pdf):
+    return [str(make_roster_pdf(f"c{seed}.pdf", seed)) for seed in (1, 2)]
+
+LONG_LEGEND = "LEYENDA: 708: 08:00-18:00  1308: 13:00-21:00  2008: 20.00 - 08.00"
+
+@pytest.fixture(params=["arrow", "pickle"])
+def transport(request, monkeypatch):
+    if request.param == "arrow": pytest.importorskip("pyarrow")
+    else: monkeypatch.setattr(arrow_transport, "arrow_available", lambda: False)
+    return request.param
+
+def _expected(sources):
+    parsed = [extract_data_from_pdf(s, 2025) for s in sources]
+    frame = pd.concat([df.assign(Trabajador=label) for (df, _, _), label in zip(parsed, "ab")], ignore_index=True)
+    return frame, {label: info for (_, info, _), label in zip(parsed, "ab")}, sorted({h for _, _, hol in parsed for h in hol})
+
+def test_collect_rosters(sources, transport):
+    frame, legends, holidays = arrow_transport.collect_rosters(sources, 2025, pool=InlinePool(), labels=["a", "b"])
+    expected, expected_legends, expected_holidays = _expected(sources)
+    assert frame.equals(expected)
+    assert legends == expected_legends
+    assert holidays == expected_holidays
+
+def test_conflicting_legends_stay_per_worker(make_roster_pdf, transport):
+    # 708 dura 7 h en un documento y 10 h en el otro: cada trabajador conserva la suya
+    sources = [str(make_roster_pdf("a.pdf", 1)), str(make_roster_pdf("b.pdf", 2, LONG_LEGEND))]
+    frame, legends, _ = arrow_transport.collect_rosters(sources, 2025, pool=InlinePool(), labels=["a", "b"])
+    assert sorted(legends) == sorted(frame['Trabajador'].unique()) == ["a", "b"]
+    assert legends["a"]['708']['hours'] == 7.0
+    assert legends["b"]['708']['hours'] == 10.0
+
+def test_conflicting_legends_for_same_worker_raise(make_roster_pdf, transport):
+    sources = [str(make_roster_pdf("a.pdf", 1)), str(make_roster_pdf("b.pdf", 2, LONG_LEGEND))]
+    with pytest.raises(ValueError, match="leyendas distintas"):
+        arrow_transport.collect_rosters(sources, 2025, pool=InlinePool(), labels=["a", "a"])
@@ -0,0 +1,96 @@
+import hashlib
+import io
+import json
+
+import pytest
+
+from src.batch import HASH_CHUNK, JOURNAL_FILENAME, STAGES, BatchJournal, input_hash, run_batch
+
+@pytest.fixture
+def items(make_roster_pdf):
+    return [{'worker': "Ana", 'roster': str(make_roster_pdf("ana.pdf", 1))},
+            {'worker': "Luis", 'roster': make_roster_pdf("luis.pdf", 2).read_bytes()}]
+
+def _journal_lines(directory):
+    return (directory / JOURNAL_FILENAME).read_text(encoding='utf-8').splitlines()
+
+def test_rerun_resumes_every_stage(items, tmp_path):
+    batch_dir = tmp_path / "lote"
+    first = run_batch(items, batch_dir, 2025)
+    assert [s['status'] for s in first] == ['ok', 'ok']
+    assert first[0]['computed'] == list(STAGES) and first[0]['resumed'] == []
+    # Sin nóminas, la etapa 'payroll' de Luis tiene la misma clave que la de Ana
+    assert first[1]['computed'] == ['roster', 'report'] and first[1]['resumed'] == ['payroll']
+    n_entries = len(_journal_lines(batch_dir))
+    assert n_entries == 2 * len(STAGES) - 1
+
+    second = run_batch(items, batch_dir, 2025)
+    assert all(s['resumed'] == list(STAGES) and s['computed'] == [] for s in second)
+    assert len(_journal_lines(batch_dir)) == n_entries
+    for a, b in zip(first, second):
+        with open(a['report'], 'rb') as f: assert f.read()[:2] == b"PK"
+        assert a['report'] == b['report']
+
+def test_truncated_last_line_is_ignored(items, tmp_path):
+    batch_dir = tmp_path / "lote"
+    run_batch(items[:1], batch_dir, 2025)
+    path = batch_dir / JOURNAL_FILENAME
+    lines = _journal_lines(batch_dir)
+    # Proceso muerto a mitad de escribir la última línea (etapa 'report')
+    path.write_text("\n".join(lines[:-1]) + "\n" + lines[-1][:len(lines[-1]) // 2], encoding='utf-8')
+    assert len(BatchJournal(batch_dir)) == len(STAGES) - 1
+
+    summary = run_batch(items[:1], batch_dir, 2025)[0]
+    assert summary['status'] == 'ok'
+    assert summary['resumed'] == ['roster', 'payroll'] and summary['computed'] == ['report']
+
+def test_deleted_stage_output_is_recomputed(items, tmp_path):
+    batch_dir = tmp_path / "lote"
+    run_batch(items[:1], batch_dir, 2025)
+    for output in (batch_dir / "stages" / "roster").iterdir(): output.unlink()
+
+    summary = run_batch(items[:1], batch_dir, 2025)[0]
+    assert summary['computed'] == ['roster']
+    assert summary['resumed'] == ['payroll', 'report']
+    assert len(list((batch_dir / "stages" / "roster").iterdir())) == 1
+
+def test_unreadable_roster_is_not_journaled(items, tmp_path, capsys):
+    batch_dir = tmp_path / "lote"
+    bad = {'worker': "Roto", 'roster': b"not a pdf"}
+    summaries = run_batch([bad, items[0]], batch_dir, 2025)
+    assert summaries[0]['status'] == "error en roster" and summaries[0]['error']
+    assert summaries[0]['computed'] == [] and summaries[0]['report'] is None
+    assert "Error en lote" not in capsys.readouterr().out   # El error va solo al resumen
+    assert summaries[1]['status'] == 'ok'
+    workers = [json.loads(line)['worker'] for line in _journal_lines(batch_dir)]
+    assert "Roto" not in workers and workers.count("Ana") == len(STAGES)
+
+    # Al relanzar se vuelve a intentar (y falla igual); el resto se reanuda
+    again = run_batch([bad, items[0]], batch_dir, 2025)
+    assert again[0]['status'] == "error en roster"
+    assert again[1]['resumed'] == list(STAGES)
+
+class ChunkSpy(io.RawIOBase):
+    """Fichero sin buffer interno que registra el tamaño de cada lectura."""
+    def __init__(self, data):
+        self._f = io.BytesIO(data)
+        self.reads = []
+
+    def readable(self): return True
+    def seek(self, *args): return self._f.seek(*args)
+    def read(self, size=-1):
+        self.reads.append(size)
+        return self._f.read(size)
+
+def test_input_hash_same_for_every_source_kind(tmp_path):
+    data = bytes(range(256)) * (3 * HASH_CHUNK // 256 + 7)
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(data)
+    # Misma clave que antes del hash por bloques (los diarios existentes siguen valiendo)
+    previous = hashlib.sha1(hashlib.sha1(data).digest() + repr([]).encode()).hexdigest()
+    spy = ChunkSpy(data)
+    with open(path, 'rb') as f:
+        keys = {input_hash([src]) for src in (str(path), path, data, memoryview(data), io.BytesIO(data), f, spy)}
+    assert keys == {previous}
+    assert spy.reads and all(0 < size <= HASH_CHUNK for size in spy.reads)
+    assert spy._f.tell() == 0
@@ -0,0 +1,17 @@
+from datetime import date
+
+import src.calendar_index as calendar_index
+from src.calendar_index import DOMINGO, FESTIVO_LOCAL, FESTIVO_NACIONAL, LABORABLE, SABADO, get_calendar
+
+def test_day_flags():
+    cal = get_calendar([date(2025, 1, 6)], national=["2025-12-25"])
+    flags = cal.flags_for([date(2025, 1, 6), "2025-03-08", "2025-03-09", "2025-12-25", None])
+    assert flags.tolist() == [LABORABLE | FESTIVO_LOCAL, SABADO, DOMINGO, LABORABLE | FESTIVO_NACIONAL, 0]
+    assert cal.is_holiday(date(2025, 12, 25)) and cal.is_sunday(date(2025, 3, 9))
+    assert cal.day_types(["2025-01-06", "2025-03-09", "2025-03-10"]).tolist() == [2, 1, 0]
+
+def test_calendar_is_memoized_and_has_no_vacation_flag():
+    assert get_calendar(["2025-01-06"]) is get_calendar([date(2025, 1, 6)])
+    # Las vacaciones van por fila en el cuadrante, no en el calendario
+    assert not hasattr(calendar_index, "VACACIONES")
+    assert not hasattr(get_calendar(), "is_vacation")
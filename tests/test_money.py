@@ -0,0 +1,72 @@
+import numpy as np
+import openpyxl
+
+from conftest import HOLIDAYS, MAPPING, PRICES, SHIFT_INFO
+from src.aggregation import build_monthly_cube
+from src.calculator import calculate_hours, calculate_rest_debt
+from src.exporter import build_export_rows, generate_excel, report_hourly_rate, report_totals
+from src.incremental import IncrementalCalculation
+from src.money import amount_cents, group_sum, round_half_up, to_cents, to_hundredths
+
+PRICE_NORMAL = 9.1
+
+def _calculated(roster):
+    df = calculate_hours(roster, MAPPING, {**PRICES, 'price_normal': PRICE_NORMAL}, HOLIDAYS)
+    df['Deuda_Descanso_Horas'] = calculate_rest_debt(df, SHIFT_INFO)
+    return df
+
+def test_round_half_up():
+    assert round_half_up([0.5, 1.5, 2.5, -0.5, -2.5]).tolist() == [1, 2, 3, -1, -3]
+    assert to_cents([2.675, 1.005, 0.1 + 0.2]).tolist() == [268, 101, 30]
+    assert to_hundredths(7 / 12).tolist() == 58
+
+def test_amount_cents_single_rounding():
+    # 0,5 h a 15,2347 €/h = 7,61735 € -> 762 céntimos
+    assert int(amount_cents(50, 15.2347)) == 762
+    assert amount_cents([0, 100, 58], 10.0).tolist() == [0, 1000, 580]
+
+def test_group_sum_exact_int64():
+    big = np.full(1000, 10**13, dtype=np.int64)
+    assert group_sum(np.zeros(1000, dtype=np.int64), big + 1, 1)[0] == 1000 * (10**13 + 1)
+
+def test_detail_summary_and_cube_reconcile(roster):
+    df = _calculated(roster)
+    precio_hora = report_hourly_rate(PRICES)
+    cube = build_monthly_cube(df, HOLIDAYS, precio_hora)
+    rows = build_export_rows(df, SHIFT_INFO, HOLIDAYS, precio_hora, cube)
+    detail = int(to_cents(rows.columns['Importe']).sum())
+    summary = int(to_cents(report_totals(cube, PRICES)['importe_descansos']))
+
+    assert (df['Deuda_Descanso_Horas'] > 0).sum() > 100
+    assert detail == summary == int(cube.units['Importe_Deuda']['grand'])
+    assert int(cube.units['Importe_Deuda']['month'].sum()) == detail
+    assert int(cube.units['Importe_Deuda']['type'].sum()) == detail
+    assert int(to_cents(cube.totals['Importe_Deuda']).sum()) == detail
+
+def test_summary_matches_detail_with_dashboard_price_cube(roster):
+    # El dashboard construye el cubo con price_normal; el informe usa el precio de fórmula
+    df = _calculated(roster)
+    cube = build_monthly_cube(df, HOLIDAYS, PRICE_NORMAL)
+    rows = build_export_rows(df, SHIFT_INFO, HOLIDAYS, report_hourly_rate(PRICES), cube)
+    totals = report_totals(cube, PRICES)
+    assert int(to_cents(rows.columns['Importe']).sum()) == int(to_cents(totals['importe_descansos']))
+    assert int(to_cents(totals['total_final'])) == int(to_cents(totals['importe_descansos'])) + 30000
+    # Importe del dashboard: suma por jornada a price_normal
+    debt = to_hundredths(df['Deuda_Descanso_Horas'].to_numpy())
+    assert int(cube.units['Importe_Deuda']['grand']) == int(amount_cents(debt, PRICE_NORMAL).sum())
+
+def test_excel_detail_column_adds_up_to_summary(roster):
+    df = _calculated(roster)
+    wb = openpyxl.load_workbook(generate_excel(df, SHIFT_INFO, PRICES, HOLIDAYS, "W", "C"))
+    detail = [c.value for c in wb['DETALLE MENSUAL']['I'] if isinstance(c.value, (int, float))]
+    summary = wb['RESUMEN EJECUTIVO']['D21'].value
+    assert int(to_cents(detail).sum()) == int(to_cents(summary))
+
+def test_incremental_update_keeps_cents_consistent(roster):
+    calc = IncrementalCalculation(roster, MAPPING, SHIFT_INFO, HOLIDAYS, PRICE_NORMAL)
+    edited = {**MAPPING, '708': {'total': 9.5, 'nocturnal': 0.0}}
+    calc.update_mapping(edited)
+    fresh = IncrementalCalculation(roster, edited, SHIFT_INFO, HOLIDAYS, PRICE_NORMAL)
+    for metric in ('Deuda_Descanso_Horas', 'Importe_Deuda'):
+        for level in ('month', 'type', 'grand'):
+            assert np.array_equal(calc.cube.units[metric][level], fresh.cube.units[metric][level])
@@ -0,0 +1,50 @@
+from concurrent.futures import Future
+
+import pytest
+
+import src.ocr as ocr
+from src.batch import _parse_roster
+from src.diagnostics import ExtractionRecorder
+from src.parser import extract_data_from_pdf
+
+class FailingPool:
+    def submit(self, *args, **kwargs):
+        f = Future()
+        f.set_exception(RuntimeError("tesseract murió"))
+        return f
+
+@pytest.fixture
+def scanned_pdf(tmp_path):
+    """PDF de dos páginas sin capa de texto (como un cuadrante escaneado)."""
+    pytest.importorskip("reportlab")
+    from reportlab.pdfgen import canvas
+    path = tmp_path / "escaneado.pdf"
+    c = canvas.Canvas(str(path))
+    for _ in range(2):
+        c.rect(50, 50, 200, 100)
+        c.showPage()
+    c.save()
+    return str(path)
+
+def test_unavailable_ocr_is_a_page_warning(scanned_pdf, monkeypatch, capsys):
+    monkeypatch.setattr(ocr, "ocr_available", lambda: False)
+    recorder = ExtractionRecorder(capacity=1)
+    df, _, _ = extract_data_from_pdf(scanned_pdf, 2025, recorder=recorder)
+    assert df.empty
+    assert [(w['document'], w['page'], w['warning']) for w in recorder.warnings] == \
+           [(scanned_pdf, 0, ocr.OCR_UNAVAILABLE), (scanned_pdf, 1, ocr.OCR_UNAVAILABLE)]
+    assert recorder.errors == []
+    assert capsys.readouterr().out == ""
+
+def test_ocr_failure_is_a_page_error(scanned_pdf, monkeypatch, capsys):
+    monkeypatch.setattr(ocr, "ocr_available", lambda: True)
+    monkeypatch.setattr(ocr, "get_ocr_pool", lambda: FailingPool())
+    monkeypatch.setattr(ocr, "_render_png", lambda page, resolution: bytes([len(ocr._ocr_cache)]) + b"png")
+    ocr.clear_ocr_cache()
+    recorder = ExtractionRecorder(capacity=1)
+    extract_data_from_pdf(scanned_pdf, 2025, recorder=recorder)
+    assert [(e['page'], e['error']) for e in recorder.errors] == [(0, "RuntimeError: tesseract murió"), (1, "RuntimeError: tesseract murió")]
+    assert capsys.readouterr().out == ""
+    # En un lote, el fallo de OCR hace fallar la etapa del cuadrante
+    with pytest.raises(RuntimeError, match="tesseract"):
+        _parse_roster(scanned_pdf, 2025, None)
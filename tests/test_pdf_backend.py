@@ -0,0 +1,35 @@
+import pytest
+
+from src.parser import extract_data_from_pdf
+from src.pdf_backend import PdfPage, get_backend
+
+pytest.importorskip("pypdfium2")
+
+def test_pdf_page_is_abstract():
+    class Incomplete(PdfPage):
+        def extract_text(self): return ""
+    with pytest.raises(TypeError):
+        Incomplete()
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_pdfium_matches_pdfplumber(make_roster_pdf, seed):
+    path = make_roster_pdf(f"cuadrante_{seed}.pdf", seed)
+    df_p, info_p, hol_p = extract_data_from_pdf(str(path), 2025, backend='pdfplumber')
+    df_i, info_i, hol_i = extract_data_from_pdf(str(path), 2025, backend='pdfium')
+    assert len(df_p) > 100
+    assert df_i.equals(df_p)
+    assert info_i == info_p
+    assert hol_i == hol_p
+
+def test_page_primitives_match(make_roster_pdf):
+    path = make_roster_pdf("cuadrante.pdf", 4)
+    results = {}
+    for name in ('pdfplumber', 'pdfium'):
+        with open(path, 'rb') as f, get_backend(name).open(f) as pages:
+            page = pages[0]
+            edges = sorted((round(e['x0'], 1), round(e['top'], 1), round(e['x1'], 1), round(e['bottom'], 1)) for e in page.edges)
+            cell = (120, 40, 300, 100)
+            results[name] = (tuple(round(v, 2) for v in page.bbox), page.extract_text(), edges, page.crop_text(cell))
+            with pytest.raises(ValueError):
+                page.crop_text((0, 0, page.width + 100, page.height))
+    assert results['pdfium'] == results['pdfplumber']
@@ -0,0 +1,88 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import HOLIDAYS, MAPPING, PRICES, SHIFT_INFO
+from src.calculator import calculate_hours, calculate_rest_debt
+from src.rules import DEFAULT_AGREEMENT, DEFAULT_RULES, compile_rules
+
+# Precio normal redondo para calcular los importes a mano
+HAND_PRICES = {**PRICES, 'price_normal': 10.0}
+
+def _day(fecha, code):
+    return {'Fecha': fecha, 'Mes': fecha.month, 'Dia': fecha.day, 'Codigo': code}
+
+def _calc(rows, mapping=MAPPING, shift_info=SHIFT_INFO, holidays=HOLIDAYS):
+    df = calculate_hours(pd.DataFrame(rows), mapping, HAND_PRICES, holidays)
+    df['Deuda_Descanso_Horas'] = calculate_rest_debt(df, shift_info)
+    return df
+
+def test_working_day():
+    # Martes, 7 h diurnas a 10 €/h; 7 h fuera de bandas -> 7/12 = 0,58 h
+    df = _calc([_day(date(2025, 3, 4), '708')])
+    assert df['Tipo_Jornada'].tolist() == ["Normal"]
+    assert df['Total_Euros'].tolist() == [70.0]
+    assert df['Deuda_Descanso_Horas'].tolist() == [0.58]
+
+def test_sunday():
+    # Domingo: precio 10 + 1 de plus; 12 h con 8 nocturnas = 4 x 11 + 8 x 11,5
+    df = _calc([_day(date(2025, 3, 9), '708'), _day(date(2025, 3, 9), '2008')])
+    assert df['Tipo_Jornada'].tolist() == ["Domingo", "Domingo"]
+    assert df['Total_Euros'].tolist() == [77.0, 136.0]
+    assert df['Deuda_Descanso_Horas'].tolist() == [0.58, 1.0]
+
+def test_holiday():
+    # Festivo (lunes de Reyes): precio 10 + 2; 8 h con 1 nocturna = 7 x 12 + 1 x 12,5; banda de 8 h -> 0,5
+    df = _calc([_day(date(2025, 1, 6), '1308')])
+    assert df['Tipo_Jornada'].tolist() == ["Festivo"]
+    assert df['Total_Euros'].tolist() == [96.5]
+    assert df['Deuda_Descanso_Horas'].tolist() == [0.5]
+
+def test_holiday_on_sunday_is_holiday():
+    df = _calc([_day(date(2025, 3, 9), '708')], holidays=[date(2025, 3, 9)])
+    assert df['Tipo_Jornada'].tolist() == ["Festivo"]
+    assert df['Total_Euros'].tolist() == [84.0]
+
+def test_nocturnal_hours():
+    # Martes, 12 h con 8 nocturnas: 4 x 10 + 8 x 10,5; banda de 12 h -> 1 h
+    df = _calc([_day(date(2025, 3, 4), '2008')])
+    assert df['Horas_Nocturnas'].tolist() == [8.0]
+    assert df['Total_Euros'].tolist() == [124.0]
+    assert df['Deuda_Descanso_Horas'].tolist() == [1.0]
+
+def test_vacation_and_absence_have_no_debt():
+    mapping = {**MAPPING, 'V': {'total': 7.0, 'nocturnal': 0.0}, 'BAJA': {'total': 8.0, 'nocturnal': 0.0}}
+    shift_info = {**SHIFT_INFO, 'BAJA': {'type': 'Absentismo', 'is_vacation': False}}
+    df = _calc([_day(date(2025, 3, 4), 'V'), _day(date(2025, 3, 5), 'BAJA'), _day(date(2025, 3, 6), 'XX')],
+               mapping, shift_info)
+    assert df['Total_Euros'].tolist() == [70.0, 80.0, 0.0]
+    assert df['Deuda_Descanso_Horas'].tolist() == [0.0, 0.0, 0.0]
+
+def test_rest_debt_bands_and_fallback():
+    hours = np.array([7.5, 8.5, 9.0, 10.0, 11.5, 12.5, 24.0, 16.0, 0.0])
+    assert DEFAULT_RULES.rest_debt(hours).tolist() == [0.5, 0.5, 0.75, 0.83, 1.0, 1.0, 2.0, 1.33, 0.0]
+
+def test_debt_eligible():
+    types = np.array(["Turno", "Absentismo", "Vacaciones", ""], dtype=object)
+    vacation = np.array([False, False, True, False])
+    assert DEFAULT_RULES.debt_eligible(types, vacation).tolist() == [True, False, False, True]
+
+def test_hourly_rate_formulas():
+    # (1253,26 + 100,26 + 10) = 1363,52
+    assert DEFAULT_RULES.hourly_rate(PRICES, 'dashboard') == pytest.approx(1363.52 / 160)
+    assert DEFAULT_RULES.hourly_rate(PRICES, 'report') == pytest.approx(1363.52 * 15 / 1776)
+    assert DEFAULT_RULES.hourly_rate(PRICES) == DEFAULT_RULES.hourly_rate(PRICES, 'dashboard')
+    # Vectorizado por escenarios
+    rates = DEFAULT_RULES.hourly_rate({'base_salary': np.array([1600.0, 1776.0])}, 'report')
+    assert rates.tolist() == pytest.approx([1600 * 15 / 1776, 15.0])
+
+def test_custom_agreement():
+    rules = compile_rules({**DEFAULT_AGREEMENT, 'day_types': [{'label': "Sábado", 'when': "saturday", 'plus': 'plus_sunday'}]})
+    df = calculate_hours(pd.DataFrame([_day(date(2025, 3, 8), '708'), _day(date(2025, 3, 9), '708')]),
+                         MAPPING, HAND_PRICES, HOLIDAYS, rules)
+    assert df['Tipo_Jornada'].tolist() == ["Sábado", "Normal"]
+    assert df['Total_Euros'].tolist() == [77.0, 70.0]
+    with pytest.raises(ValueError):
+        compile_rules({**DEFAULT_AGREEMENT, 'day_types': [{'label': "X", 'when': "lunes"}]})
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from conftest import HOLIDAYS, MAPPING, PRICES, SHIFT_INFO
+from src.aggregation import build_monthly_cube
+from src.calculator import calculate_hours, calculate_rest_debt
+from src.exporter import report_hourly_rate, report_totals
+from src.money import to_cents
+from src.scenarios import SCENARIO_COLUMNS, evaluate_scenarios
+
+BASE = {'name': "Base", 'rate_formula': 'report', 'include_extra_pay': True}
+
+def _report(roster, mapping=MAPPING):
+    precio_hora = report_hourly_rate(PRICES)
+    df = calculate_hours(roster, mapping, {**PRICES, 'price_normal': precio_hora}, HOLIDAYS)
+    df['Deuda_Descanso_Horas'] = calculate_rest_debt(df, SHIFT_INFO)
+    return df, report_totals(build_monthly_cube(df, HOLIDAYS, precio_hora), PRICES)
+
+def test_base_scenario_matches_report(roster):
+    df, totals = _report(roster)
+    table = evaluate_scenarios(roster, SHIFT_INFO, MAPPING, PRICES, HOLIDAYS, [BASE])
+    row = table.iloc[0]
+    assert row['Precio_Hora'] == totals['precio_hora']
+    assert row['Deuda_Descanso_Horas'] == totals['total_horas_deuda']
+    assert int(to_cents(row['Importe_Deuda'])) == int(to_cents(totals['importe_descansos']))
+    assert int(to_cents(row['Total_Reclamacion'])) == int(to_cents(totals['total_final']))
+    assert int(to_cents(row['Total_Euros'])) == int(to_cents(df['Total_Euros']).sum())
+
+def test_mapping_scenario_matches_recalculated_report(roster):
+    edited = {**MAPPING, '2008': {'total': 10.0, 'nocturnal': 6.0}}
+    _, totals = _report(roster, edited)
+    table = evaluate_scenarios(roster, SHIFT_INFO, MAPPING, PRICES, HOLIDAYS,
+                               [BASE, {**BASE, 'mapping': {'2008': {'total': 10.0, 'nocturnal': 6.0}}}])
+    assert int(to_cents(table.iloc[1]['Total_Reclamacion'])) == int(to_cents(totals['total_final']))
+    claims = to_cents(table['Total_Reclamacion'])
+    assert int(to_cents(table.iloc[1]['Diferencia'])) == int(claims[1] - claims[0])
+
+def test_empty_roster():
+    table = evaluate_scenarios(pd.DataFrame(), SHIFT_INFO, MAPPING, PRICES, HOLIDAYS, [BASE, {'include_extra_pay': False}])
+    assert list(table.columns) == SCENARIO_COLUMNS
+    assert table['Importe_Deuda'].tolist() == [0.0, 0.0]
+    assert np.allclose(table['Total_Reclamacion'], [300.0, 0.0])
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+import src.session_store as session_store
+from conftest import HOLIDAYS, MAPPING, SHIFT_INFO
+from src.incremental import IncrementalCalculation
+from src.session_store import CalculationCache, SharedFrameStore
+
+@pytest.mark.parametrize("cow", [True, False])
+def test_edits_to_returned_frame_do_not_reach_store(roster, monkeypatch, cow):
+    # Sin copy-on-write (pandas 2.x) get() debe devolver una copia profunda
+    monkeypatch.setattr(session_store, "copy_on_write", lambda: cow)
+    store = SharedFrameStore()
+    key = store.put(roster, "s1")
+    before = store.get(key).copy(deep=True)
+
+    df = store.get(key)
+    df.loc[0, 'Dia'] = 31
+    df.iloc[1, df.columns.get_loc('Codigo')] = 'V'
+    df['Fecha'] = df['Fecha'] + np.timedelta64(1, 'D')
+    df['Nueva'] = 1
+
+    assert store.get(key).equals(before)
+    assert 'Nueva' not in store.get(key).columns
+
+class Counter:
+    def __init__(self):
+        self.builds = self.updates = 0
+
+    def build(self, value):
+        def _build():
+            self.builds += 1
+            return [value]
+        return _build
+
+    def update(self, value):
+        def _update(entry):
+            self.updates += 1
+            entry[0] = value
+            return entry
+        return _update
+
+def test_sessions_share_entry_by_key():
+    cache, n = CalculationCache(), Counter()
+    a = cache.get_or_build("s1", ("base", "v1"), n.build(1), n.update(1))
+    b = cache.get_or_build("s2", ("base", "v1"), n.build(1), n.update(1))
+    assert a is b and n.builds == 1 and n.updates == 0
+
+def test_new_variant_updates_previous_entry_in_place():
+    cache, n = CalculationCache(), Counter()
+    first = cache.get_or_build("s1", ("base", "v1"), n.build(1), n.update(1))
+    second = cache.get_or_build("s1", ("base", "v2"), n.build(2), n.update(2))
+    assert second is first and second == [2]
+    assert (n.builds, n.updates) == (1, 1)
+    assert cache.stats() == {'entries': 1, 'sessions': 1}
+
+def test_shared_entry_is_not_updated():
+    cache, n = CalculationCache(), Counter()
+    shared = cache.get_or_build("s1", ("base", "v1"), n.build(1), n.update(1))
+    cache.get_or_build("s2", ("base", "v1"), n.build(1), n.update(1))
+    own = cache.get_or_build("s1", ("base", "v2"), n.build(2), n.update(2))
+    assert shared == [1] and own == [2] and own is not shared
+    assert (n.builds, n.updates) == (2, 0)
+
+def test_other_base_builds_from_scratch():
+    cache, n = CalculationCache(), Counter()
+    cache.get_or_build("s1", ("base", "v1"), n.build(1), n.update(1))
+    cache.get_or_build("s1", ("other", "v1"), n.build(2), n.update(2))
+    assert (n.builds, n.updates) == (2, 0)
+
+def test_lru_keeps_referenced_entries():
+    cache, n = CalculationCache(max_entries=2), Counter()
+    for i in range(4):
+        cache.get_or_build(f"s{i}", (i, "v"), n.build(i), n.update(i))
+    cache.release("s0"); cache.release("s1")
+    assert cache.stats() == {'entries': 2, 'sessions': 2}
+    cache.get_or_build("s9", (3, "v"), n.build(3), n.update(3))
+    assert n.builds == 4
+
+def test_incremental_calculation_through_cache(roster):
+    cache = CalculationCache()
+    def build(mapping): return lambda: IncrementalCalculation(roster, mapping, SHIFT_INFO, HOLIDAYS, 9.1)
+    def update(mapping):
+        def _update(calc):
+            calc.update_mapping(mapping, SHIFT_INFO)
+            return calc
+        return _update
+    edited = {**MAPPING, '910': {'total': 12.0, 'nocturnal': 2.0}}
+    calc = cache.get_or_build("s1", ("r", "m1"), build(MAPPING), update(MAPPING))
+    updated = cache.get_or_build("s1", ("r", "m2"), build(edited), update(edited))
+    fresh = IncrementalCalculation(roster, edited, SHIFT_INFO, HOLIDAYS, 9.1)
+    assert updated is calc
+    assert np.array_equal(updated.cube.units['Importe_Deuda']['month'], fresh.cube.units['Importe_Deuda']['month'])
+    assert updated.frame['Deuda_Descanso_Horas'].equals(fresh.frame['Deuda_Descanso_Horas'])
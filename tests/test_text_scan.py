@@ -0,0 +1,95 @@
+import re
+
+import pytest
+
+from src.parser import parse_payroll_text
+from src.text_scan import EV_AMOUNT, EV_CODE, EV_DATE, KEYWORDS, amount_value, last_amount, scan_text
+
+# Nómina representativa: miles con punto o coma, importes negativos, varios
+# importes y varias palabras clave en la misma línea
+PAYROLL_TEXT = """AMBULANCIAS DEL SUR S.L.
+PERIODO LIQUIDACION 01/03/2025 A 31/03/2025
+TRABAJADOR CATEGORIA ANTIGUEDAD 15/06/2012
+001 SALARIO BASE 30,00 41,7753 1.253,26
+002 ANTIGUEDAD 100,26 €
+003 PLUS CONVENIO 10,00
+004 SEGURO CONVENIO COLECTIVO -12,50
+005 NOCTURNIDAD 8 HORAS 0,50 4,00
+006 PLUS FESTIVO 2,00
+007 DIETA MANUTENCION 234.56
+REDONDEO 1,234.56
+008 PAGA MARZO BENEFICIOS 1.353,52
+009 ATRASOS CONVENIO 2024 -1.020,00
+010 Bº EXTRA 12.345,67 Y 8,90
+011 ANTICIPO -250,00-
+TOTAL DEVENGADO 2.734,86
+BASE COTIZACION CONT. COMUNES 2.011,39
+LIQUIDO A PERCIBIR 1.890,12
+"""
+
+def old_extract_last_amount(text):
+    # Implementación anterior a text_scan (referencia)
+    if not text: return 0.0
+    clean_text = text.replace("€", "").strip()
+    matches = re.findall(r"(?:\d{1,3}(?:\.\d{3})*,\d{2})", clean_text)
+    if not matches: matches = re.findall(r"(?:\d{1,3}(?:,\d{3})*\.\d{2})", clean_text)
+    if matches:
+        last_val = matches[-1]
+        if "," in last_val and "." in last_val: return float(last_val.replace('.', '').replace(',', '.'))
+        elif "," in last_val: return float(last_val.replace(',', '.'))
+        else: return float(last_val)
+    return 0.0
+
+def test_amounts_per_line_match_old_patterns():
+    scan = scan_text(PAYROLL_TEXT)
+    amounts = scan.by_line(EV_AMOUNT)
+    for i, line in enumerate(PAYROLL_TEXT.split('\n')):
+        assert last_amount(amounts.get(i, [])) == old_extract_last_amount(line), line
+
+@pytest.mark.parametrize("line, expected", [
+    ("SALARIO BASE 1.253,26", 1253.26),
+    ("IMPORTE 234.56", 234.56),
+    ("DESCUENTO -12,50", 12.5),
+    ("ATRASOS -1.020,00", 1020.0),
+    ("BENEF. 12.345,67 Y 8,90", 8.9),
+    ("MEZCLA 234.56 Y 3,00", 3.0),
+    ("1.000.000,00€", 1000000.0),
+    ("SIN IMPORTE 708 2025", 0.0),
+])
+def test_last_amount(line, expected):
+    assert last_amount(scan_text(line).of(EV_AMOUNT)) == old_extract_last_amount(line) == expected
+
+def test_amount_value_formats():
+    assert amount_value("1.253,26") == 1253.26
+    assert amount_value("253,26") == 253.26
+    assert amount_value("253.26") == 253.26
+
+def test_keywords_per_line_match_substring_checks():
+    keywords = scan_text(PAYROLL_TEXT).keywords_by_line()
+    for i, line in enumerate(PAYROLL_TEXT.split('\n')):
+        upper = line.upper()
+        found = keywords.get(i, set())
+        for kw in KEYWORDS:
+            assert (kw in found) == (kw in upper), (kw, line)
+
+def test_year_and_dates_match_old_patterns():
+    scan = scan_text(PAYROLL_TEXT)
+    old_year = re.search(r"\b(202\d)\b", PAYROLL_TEXT).group(1)
+    new_year = next(ev.value for ev in scan.of(EV_CODE) if len(ev.value) == 4 and ev.value.startswith("202"))
+    assert new_year == old_year == "2025"
+    old_dates = ["/".join(m) for m in re.findall(r"(\d{2})/(\d{2})/(\d{4})", PAYROLL_TEXT)]
+    assert [ev.value for ev in scan.of(EV_DATE)] == old_dates
+
+def test_parse_payroll_text_fields():
+    results = parse_payroll_text(PAYROLL_TEXT)
+    assert results['year'] == 2025 and results['month'] == 3
+    assert results['company'] == "AMBULANCIAS DEL SUR S.L."
+    assert results['salario_base'] == 1253.26
+    assert results['antiguedad'] == 100.26
+    assert results['plus_convenio'] == 10.0
+    assert results['nocturnidad'] == 4.0
+    assert results['festividad'] == 2.0
+    assert results['dietas'] == 234.56
+    # Marzo: PAGA MARZO, Bº y las pagas extra (atrasos) van a beneficios
+    assert results['paga_beneficios'] == pytest.approx(1353.52 + 1020.0 + 8.9)
+    assert results['paga_extra'] == 0.0